@@ -0,0 +1,330 @@
+"""
+Module name: Audio Processing
+
+Description: Offline renderers which synthesise the sonifications to WAV files without Pure Data.
+
+The elevation renderer reproduces the pulse voice of elevation_MAIN.pd. elevation_reader.pd steps through the pitches
+and rates every step_ms (100 ms by default, or as set by playback.txt), and pulses.pd plays a sine wave at the current pitch, which a metro retriggers every `rate` ms
+with a vline~ envelope that rises to 1.05 over 5 ms and then falls to 0 over 200 ms. The envelope is squared, multiplied
+by the sine wave, clipped to [-1, 1] and scaled by 0.4. The output continues for 1.5 s after the last data point, as in
+Pd. The whole signal is computed with NumPy arrays, so a 5k route renders far faster than real time.
+
+The pace renderer reproduces the drum track of pace_MAIN.pd. clock.pd ticks every 1/16 note at the current tempo, and
+pace_reader.pd moves on to the next BPM every 4 bars (64 ticks), stopping after the last one. drums.pd steps through the
+16-step patterns of drums_GUI.pd, which drum_sequencer.pd builds up every 4 bars, adding random extra hi-hats and claps,
+and a crash plays every 4 bars. The hit times of each drum are computed from the tempo map, then every hit of a drum is
+copied into the output at once. As with readsf~, a new hit of a drum cuts off the previous one.
+
+Usage, after running elevation_MAIN.py or pace_MAIN.py:
+    python audio_processing.py elevation elevation.wav
+    python audio_processing.py pace pace.wav
+
+Functions:
+    - pulse_times(rates, duration, step_ms): Returns the times at which the pulses are triggered.
+    - render_pulses(pitches, rates, sample_rate, step_ms, tail_ms): Synthesises the pulse voice.
+    - drum_hits(bpms, seed): Returns the times at which each drum is hit, and the end time of the track.
+    - render_drums(bpms, sample_rate, seed, samples_dir): Mixes the drum track.
+    - read_wav(file_path): Reads the first channel of a WAV file.
+    - write_wav(file_path, samples, sample_rate, channels): Writes samples to a 16-bit WAV file.
+    - main(): Command line interface to render the current Pd inputs to a WAV file.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import os
+import wave
+import numpy as np
+
+# Timing of elevation_reader.pd, in ms, unless playback.txt sets the step
+STEP_MS = 100
+TAIL_MS = 1500
+
+# The pulse envelope of pulses.pd: rise to ATTACK_LEVEL over ATTACK_MS, then fall to 0 over DECAY_MS
+ATTACK_LEVEL = 1.05
+ATTACK_MS = 5
+DECAY_MS = 200
+
+# Output gain of pulses.pd
+PULSE_GAIN = 0.4
+
+DEFAULT_SAMPLE_RATE = 44100
+
+SAMPLES_DIR = os.path.join(os.path.dirname(__file__), '../pd/samples')
+
+# Ticks of clock.pd: 16 per bar, and each BPM lasts 4 bars
+TICKS_PER_BEAT = 4
+TICKS_PER_BPM = 64
+
+# pace_MAIN.pd stops recording 2 s after the last tick
+DRUM_TAIL = 2.0
+
+# Gain of each drum sample in drums.pd
+DRUM_GAINS = {
+    'kick': 1.25,
+    'snare': 1.8,
+    'hi-hat': 0.75,
+    'cymbal': 0.55,
+    'crash': 0.6,
+}
+
+# Default drum and master faders of mixer.pd, which square their values
+DRUM_MIX_GAIN = 0.85**2 * 0.7**2
+
+# Parts of the drum patterns in drums_GUI.pd: (drum, steps of the 16-step bar, tick from which drum_sequencer.pd
+# switches the part on, probability). Parts with a probability below 1 are redrawn every 1/8 note.
+DRUM_PARTS = [
+    ('kick', (0, 4, 8, 12), 0, 1),
+    ('hi-hat', (2, 6, 10, 14), 64, 1),
+    ('hi-hat', (1, 3, 13, 15), 64, 0.37),
+    ('cymbal', (2, 6, 10, 14), 128, 1),
+    ('snare', (4, 12), 128, 1),
+    ('snare', (1, 6, 9, 14, 15), 192, 0.14),
+]
+
+# Decoded drum samples, keyed by directory and sample rate
+_drum_samples = {}
+
+def pulse_times(rates, duration, step_ms=STEP_MS):
+    """
+    Returns the times at which the metro in pulses.pd triggers a pulse.
+
+    The metro starts at 0 ms, and after each pulse waits for the rate received most recently, i.e. the rate of the
+    data point being played at the time of the pulse.
+
+    Args:
+        rates (np.ndarray): The time between pulses (ms) at each data point.
+        duration (float): The length of the output (ms).
+        step_ms (float): The time each data point is played for (ms).
+
+    Returns:
+        np.ndarray: The pulse times (ms).
+    """
+    rates = [float(rate) for rate in rates]
+    last_index = len(rates) - 1
+
+    times = []
+    time = 0.0
+    while time < duration:
+        times.append(time)
+        time += max(rates[min(int(time // step_ms), last_index)], 1)  # Pd's metro never waits less than 1 ms
+
+    return np.array(times)
+
+def render_pulses(pitches, rates, sample_rate=DEFAULT_SAMPLE_RATE, step_ms=STEP_MS, tail_ms=TAIL_MS):
+    """
+    Synthesises the pulse voice of elevation_MAIN.pd.
+
+    Args:
+        pitches (np.ndarray): The pitch (Hz) at each data point.
+        rates (np.ndarray): The time between pulses (ms) at each data point.
+        sample_rate (int): The sample rate of the output.
+        step_ms (float): The time each data point is played for (ms).
+        tail_ms (float): How long the last data point is held for after its step, as Pd stops 1.5 s after the end.
+
+    Returns:
+        np.ndarray: The mono signal, as float32 samples in [-1, 1].
+    """
+    pitches = np.asarray(pitches, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    if len(pitches) != len(rates) or not len(pitches):
+        raise ValueError('pitches and rates must be non-empty and the same length')
+
+    duration = len(pitches) * step_ms + tail_ms
+    n_samples = int(round(duration * sample_rate / 1000))
+    sample_times = np.arange(n_samples) * (1000 / sample_rate)
+
+    # The data point being played at each sample, holding the last one during the tail
+    step_starts = np.round(np.arange(len(pitches)) * (step_ms * sample_rate / 1000)).astype(int)
+    point_indices = np.repeat(np.arange(len(pitches)), np.diff(step_starts, append=n_samples))
+
+    # osc~ is a cosine oscillator whose phase carries on smoothly when its frequency changes
+    frequencies = pitches[point_indices]
+    phases = (np.cumsum(frequencies) - frequencies) / sample_rate
+    phases -= np.floor(phases)
+    signal = np.cos((2 * np.pi * phases).astype(np.float32))
+
+    # The pulse each sample belongs to, and the time since it was triggered
+    times = pulse_times(rates, duration, step_ms)
+    pulse_samples = np.ceil(times * sample_rate / 1000).astype(int)
+    pulse_indices = np.repeat(np.arange(len(times)), np.diff(pulse_samples, append=n_samples))
+    elapsed = sample_times - times[pulse_indices]
+
+    # vline~ starts each attack from wherever the previous envelope had got to
+    start_levels = [0.0]
+    for gap in np.diff(times).tolist():
+        start_levels.append(float(_envelope(gap, start_levels[-1])))
+
+    envelope = _envelope(elapsed, np.array(start_levels)[pulse_indices])
+
+    # Squared envelope, clipped and scaled as in pulses.pd
+    samples = PULSE_GAIN * np.clip(signal * envelope**2, -1, 1)
+
+    return samples.astype(np.float32)
+
+def _envelope(elapsed, start_level):
+    """
+    Returns the level of a pulse envelope, `elapsed` ms after it was triggered from `start_level`.
+    """
+    attack = start_level + (ATTACK_LEVEL - start_level) * np.minimum(elapsed, ATTACK_MS) / ATTACK_MS
+    decay = ATTACK_LEVEL * np.maximum(1 - (elapsed - ATTACK_MS) / DECAY_MS, 0)
+    return np.where(elapsed < ATTACK_MS, attack, decay)
+
+def drum_hits(bpms, seed=None):
+    """
+    Returns the times at which each drum is hit, following the tempo map of pace_reader.pd and clock.pd.
+
+    Args:
+        bpms (np.ndarray): The tempos from `pace_to_bpm`, each of which is played for 4 bars.
+        seed (int): Seed for the random extra hi-hats and claps, so renders can be repeated.
+
+    Returns:
+        tuple: A dict of the sorted hit times (s) of each drum, and the time (s) of the last tick.
+    """
+    bpms = np.asarray(bpms, dtype=float)
+    if not len(bpms) or np.any(bpms <= 0):
+        raise ValueError('bpms must be non-empty and positive')
+
+    # The start time of every tick
+    n_ticks = len(bpms) * TICKS_PER_BPM
+    tick_lengths = 60 / (np.repeat(bpms, TICKS_PER_BPM) * TICKS_PER_BEAT)
+    tick_ends = np.cumsum(tick_lengths)
+    tick_times = tick_ends - tick_lengths
+
+    ticks = np.arange(n_ticks)
+    steps = ticks % 16
+
+    # One random draw per part every 1/8 note, i.e. every other tick
+    rng = np.random.default_rng(seed)
+
+    hit_ticks = {'crash': [ticks[ticks % TICKS_PER_BPM == 0]]}
+    for drum, part_steps, first_tick, probability in DRUM_PARTS:
+        hit = np.isin(steps, part_steps) & (ticks >= first_tick)
+        if probability < 1:
+            hit &= (rng.random(n_ticks // 2 + 1) < probability)[ticks // 2]
+        hit_ticks.setdefault(drum, []).append(ticks[hit])
+
+    hits = {drum: tick_times[np.unique(np.concatenate(drum_ticks))] for drum, drum_ticks in hit_ticks.items()}
+    return hits, tick_ends[-1]
+
+def render_drums(bpms, sample_rate=DEFAULT_SAMPLE_RATE, seed=None, samples_dir=SAMPLES_DIR):
+    """
+    Mixes the drum track of pace_MAIN.pd, at the level of mixer.pd's default faders.
+
+    Args:
+        bpms (np.ndarray): The tempos from `pace_to_bpm`, each of which is played for 4 bars.
+        sample_rate (int): The sample rate of the output.
+        seed (int): Seed for the random extra hi-hats and claps, so renders can be repeated.
+        samples_dir (str): The directory of the drum samples.
+
+    Returns:
+        np.ndarray: The mono signal, as float32 samples.
+    """
+    hits, end_time = drum_hits(bpms, seed)
+    n_samples = int(round((end_time + DRUM_TAIL) * sample_rate))
+    output = np.zeros(n_samples, dtype=np.float32)
+
+    for drum, times in hits.items():
+        sample = _get_drum_sample(samples_dir, drum, sample_rate) * DRUM_GAINS[drum]
+
+        # Each hit plays until the sample ends, the next hit cuts it off or the output ends
+        starts = np.round(times * sample_rate).astype(int)
+        lengths = np.minimum(np.diff(starts, append=n_samples), len(sample))
+
+        # The output positions and sample offsets of every hit, which never overlap
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        output[np.repeat(starts, lengths) + offsets] += sample[offsets]
+
+    return output * np.float32(DRUM_MIX_GAIN)
+
+def _get_drum_sample(samples_dir, drum, sample_rate):
+    """
+    Returns a drum sample at the given sample rate, decoding it the first time it is used.
+    """
+    key = (samples_dir, drum, sample_rate)
+    if key not in _drum_samples:
+        sample, file_rate = read_wav(os.path.join(samples_dir, f'{drum}.wav'))
+        if file_rate != sample_rate:
+            duration = len(sample) / file_rate
+            sample = np.interp(np.arange(int(duration * sample_rate)) / sample_rate,
+                               np.arange(len(sample)) / file_rate, sample)
+        _drum_samples[key] = sample.astype(np.float32)
+    return _drum_samples[key]
+
+def read_wav(file_path):
+    """
+    Reads the first channel of a PCM WAV file, which is what readsf~ plays by default.
+
+    Args:
+        file_path (str): The WAV file to read.
+
+    Returns:
+        tuple: The samples as floats in [-1, 1], and the sample rate.
+    """
+    with wave.open(file_path) as f:
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        sample_rate = f.getframerate()
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.uint8)
+
+    # Take the bytes of the first channel of each frame
+    data = data.reshape(-1, channels, width)[:, 0, :]
+
+    if width == 1:
+        # 8-bit WAV files are unsigned
+        return (data[:, 0].astype(float) - 128) / 128, sample_rate
+
+    # Sign-extend little-endian samples of any width into 32-bit integers
+    padded = np.zeros((len(data), 4), dtype=np.uint8)
+    padded[:, 4 - width:] = data
+    samples = padded.view('<i4')[:, 0]
+
+    return samples / 2**31, sample_rate
+
+def write_wav(file_path, samples, sample_rate=DEFAULT_SAMPLE_RATE, channels=2):
+    """
+    Writes samples to a 16-bit PCM WAV file.
+
+    Args:
+        file_path (str): The WAV file to write.
+        samples (np.ndarray): Mono samples in [-1, 1], which are copied to every channel.
+        sample_rate (int): The sample rate of the samples.
+        channels (int): The number of channels, 2 to match Pd's recordings.
+    """
+    frames = np.round(np.clip(samples, -1, 1) * 32767).astype('<i2')
+
+    with wave.open(file_path, 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(np.repeat(frames, channels).tobytes())
+
+def main(args=None):
+    """
+    Command line interface to render the current Pd inputs to a WAV file.
+    """
+    from data_processing import read_from_file, read_playback
+
+    parser = argparse.ArgumentParser(description='Render a TrailSong sonification to a WAV file without Pure Data.')
+    parser.add_argument('sonification', choices=['elevation', 'pace'], help='which sonification to render')
+    parser.add_argument('output', help='the WAV file to write')
+    parser.add_argument('--input-dir', default=None, help='directory of the Pd input files (default: pd/inputs)')
+    parser.add_argument('--sample-rate', type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument('--seed', type=int, default=None, help='seed for the random drum fills of the pace sonification')
+    args = parser.parse_args(args)
+
+    if args.sonification == 'elevation':
+        pitches = read_from_file('pitches', args.input_dir)
+        rates = read_from_file('rates', args.input_dir)
+        _, _, step_ms = read_playback(args.input_dir)
+        samples = render_pulses(pitches, rates, args.sample_rate, step_ms)
+    else:
+        bpms = read_from_file('bpm', args.input_dir)
+        samples = render_drums(bpms, args.sample_rate, args.seed)
+
+    write_wav(args.output, samples, args.sample_rate)
+    print(f'Wrote {len(samples) / args.sample_rate:.1f} s of audio to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Module name: Audio Test
+
+Description: Unit tests for the `audio_processing` module.
+
+Tests include:
+- `test_pulse_times`: Checks that the metro follows the rate of the data point being played.
+- `test_render_pulses`: Checks the length, level and envelope of the rendered pulse voice.
+- `test_write_wav`: Checks that a rendered route is written as a stereo 16-bit WAV file.
+- `test_drum_hits`: Checks the tempo map, and that the drum patterns build up every 4 bars.
+- `test_render_drums`: Checks that the drum samples are mixed at their hit times, quickly and repeatably.
+- `test_read_wav`: Checks that 16-bit and 24-bit WAV files are decoded.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import time
+import unittest
+import wave
+import numpy as np
+from audio_processing import pulse_times, render_pulses, write_wav, drum_hits, render_drums, read_wav
+from audio_processing import SAMPLES_DIR, DRUM_GAINS, DRUM_MIX_GAIN
+
+class TestAudioProcessing(unittest.TestCase):
+
+    def test_pulse_times(self):
+        # 250 ms between pulses for the first point, then 50 ms
+        times = pulse_times([250, 50, 50], 400)
+
+        np.testing.assert_array_equal(times, [0, 250, 300, 350])
+
+    def test_render_pulses(self):
+        sample_rate = 8000
+        samples = render_pulses([440, 440], [1000, 1000], sample_rate)
+
+        # Two 100 ms data points plus the 1.5 s tail, with pulses at 0 s and 1 s
+        self.assertEqual(len(samples), int(1.7 * sample_rate))
+        self.assertEqual(samples.dtype, np.float32)
+        self.assertAlmostEqual(float(np.abs(samples).max()), 0.4, places=3)
+
+        # Each pulse dies away 205 ms after it starts
+        self.assertTrue(np.all(samples[int(0.21 * sample_rate):sample_rate] == 0))
+        self.assertGreater(np.abs(samples[:int(0.1 * sample_rate)]).max(), 0.3)
+        self.assertGreater(np.abs(samples[sample_rate:int(1.1 * sample_rate)]).max(), 0.3)
+
+    def test_write_wav(self):
+        rng = np.random.default_rng(0)
+        pitches = rng.uniform(110, 880, 500)
+        rates = rng.uniform(50, 250, 500)
+
+        # A 5k route lasts 51.5 s, which should render many times faster than real time
+        start_time = time.perf_counter()
+        samples = render_pulses(pitches, rates)
+        self.assertLess(time.perf_counter() - start_time, 51.5 / 10)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'elevation.wav')
+            write_wav(file_path, samples)
+
+            with wave.open(file_path) as f:
+                self.assertEqual(f.getnchannels(), 2)
+                self.assertEqual(f.getsampwidth(), 2)
+                self.assertEqual(f.getnframes(), len(samples))
+                frames = np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+
+        np.testing.assert_array_equal(frames[0::2], frames[1::2])
+        np.testing.assert_allclose(frames[0::2] / 32767, samples, atol=1e-4)
+
+    def test_drum_hits(self):
+        hits, end_time = drum_hits([120, 60, 120, 120], seed=0)
+
+        # 64 ticks of 0.125 s, 64 of 0.25 s, then 128 more of 0.125 s
+        self.assertAlmostEqual(end_time, 8 + 16 + 16)
+        np.testing.assert_allclose(hits['crash'], [0, 8, 24, 32])
+        np.testing.assert_allclose(hits['kick'][:4], [0, 0.5, 1, 1.5])
+
+        # Hi-hats start after 4 bars, cymbals and snares after 8 bars
+        self.assertGreaterEqual(hits['hi-hat'][0], 8)
+        self.assertGreaterEqual(hits['cymbal'][0], 24)
+        self.assertGreaterEqual(hits['snare'][0], 24)
+
+        # The random fills are repeatable with a seed
+        np.testing.assert_array_equal(drum_hits([120] * 4, seed=1)[0]['snare'], drum_hits([120] * 4, seed=1)[0]['snare'])
+
+    def test_render_drums(self):
+        bpms = [150, 140, 160, 130, 155]
+
+        # A whole run should render in well under a second
+        start_time = time.perf_counter()
+        samples = render_drums(bpms, seed=0)
+        self.assertLess(time.perf_counter() - start_time, 1)
+
+        hits, end_time = drum_hits(bpms, seed=0)
+        self.assertEqual(len(samples), int(round((end_time + 2) * 44100)))
+        np.testing.assert_array_equal(samples, render_drums(bpms, seed=0))
+
+        # Only the kick and crash play at the start, until the second kick
+        kick, _ = read_wav(os.path.join(SAMPLES_DIR, 'kick.wav'))
+        crash, _ = read_wav(os.path.join(SAMPLES_DIR, 'crash.wav'))
+        n = int(hits['kick'][1] * 44100) - 1
+        expected = (kick[:n] * DRUM_GAINS['kick'] + crash[:n] * DRUM_GAINS['crash']) * DRUM_MIX_GAIN
+        np.testing.assert_allclose(samples[:n], expected, atol=1e-5)
+
+    def test_read_wav(self):
+        # The kick is a 24-bit stereo file
+        kick, sample_rate = read_wav(os.path.join(SAMPLES_DIR, 'kick.wav'))
+        self.assertEqual(sample_rate, 44100)
+        self.assertLessEqual(np.abs(kick).max(), 1)
+        self.assertGreater(np.abs(kick).max(), 0.5)
+
+        samples = np.linspace(-1, 1, 101)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'test.wav')
+            write_wav(file_path, samples, 8000)
+            decoded, sample_rate = read_wav(file_path)
+
+        self.assertEqual(sample_rate, 8000)
+        np.testing.assert_allclose(decoded, samples, atol=1e-4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,299 @@
+"""
+Module name: Batch MAIN
+
+Description: Headless batch entry point for sonifying many routes at once.
+
+Takes directories and/or glob patterns of KML files, and runs the elevation pipeline from elevation_MAIN on each of
+them in a pool of worker processes. Each route is written to its own sub-directory of the output directory, named after
+the KML file, and a summary of the successes, failures and per-file timings is printed at the end. With --audio, each
+route's pulse voice is also rendered to a WAV file, without needing Pure Data. Files with the same name in different
+directories get distinct output directories (see `output_names`), so they never overwrite each other.
+
+Each worker memoizes elevations by grid cell (see elevation_memo), so routes which share ground only look it up once
+per worker. With --elevation-memo, the memo is also saved to a file and reused by later batches. With --tables, the Pd
+inputs are also written as float32 tables (see data_processing.write_table). --distance, --resolution and --duration
+process races other than a 5k (see elevation_MAIN.route_parameters).
+
+Usage:
+    python batch_MAIN.py ../example_data/elevation --output-dir ../batch_output --workers 4
+
+Functions:
+- find_route_files(inputs): Expands directories and glob patterns into a sorted list of KML files.
+- output_names(file_paths): Names the output directory of each route, telling apart files with the same name.
+- run_batch(kml_file_paths, output_dir, workers, hgt_dir, cache_dir, render_audio, simplification, memo_file, table_format, parameters): Processes the routes in a process pool and returns the results.
+- add_route_arguments(parser): Adds the race distance, resolution and duration options to a command line parser.
+- print_summary(results, elapsed_time): Prints the successes, failures and timings of a batch.
+- main(): Parses the command line arguments and runs the batch.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from simplify_processing import SIMPLIFICATION_METHODS
+from data_processing import TABLE_FORMATS
+from ANSI_formats import *
+
+# Result cache of the current worker process, if caching is enabled
+_worker_cache = None
+
+# (method, tolerance) with which the current worker process simplifies routes, if enabled
+_worker_simplification = None
+
+# Elevation memo of the current worker process
+_worker_memo = None
+
+# SONIFICATION_PARAMETERS the current worker process overrides, e.g. the race distance
+_worker_parameters = None
+
+def find_route_files(inputs):
+    """
+    Expands directories and glob patterns into a list of KML files.
+
+    Args:
+        inputs (list): Directories (all the KML files inside are used), glob patterns or file paths.
+
+    Returns:
+        list: The sorted paths of the KML files, resolved with os.path.realpath, so a file reached through several
+        inputs (e.g. a relative and an absolute path to the same directory) is only listed once.
+    """
+    kml_file_paths = set()
+
+    for path in inputs:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, '*.kml'))
+        else:
+            matches = glob.glob(path)
+        kml_file_paths.update(os.path.realpath(match) for match in matches)
+
+    return sorted(kml_file_paths)
+
+def output_names(file_paths):
+    """
+    Names the output directory of each route after its file, without the extension. Where several files would get the
+    same name (ignoring case), they are told apart by their extensions, or failing that by their directories, e.g.
+    'route.gpx' or 'route (week 2)'. Files which can't be told apart by their whole paths, e.g. the same file given
+    twice, are numbered instead, e.g. 'route (1)'.
+
+    Args:
+        file_paths (list): The route files.
+
+    Returns:
+        dict: The name of the output directory of each file path.
+    """
+    groups = {}
+    for file_path in file_paths:
+        groups.setdefault(os.path.splitext(os.path.basename(file_path))[0].lower(), []).append(file_path)
+
+    def label(file_path, depth):
+        # Depth 0 is the file name, and each further depth adds one more of its parent directories
+        if depth == 0:
+            return os.path.basename(file_path)
+        directories = os.path.dirname(os.path.abspath(file_path)).split(os.sep)[-depth:]
+        return f"{os.path.splitext(os.path.basename(file_path))[0]} ({' - '.join(directories)})"
+
+    names = {}
+    for group in groups.values():
+        if len(group) == 1:
+            names[group[0]] = os.path.splitext(os.path.basename(group[0]))[0]
+            continue
+
+        depth, max_depth = 0, max(len(os.path.abspath(file_path).split(os.sep)) for file_path in group)
+        while depth < max_depth and len({label(file_path, depth).lower() for file_path in group}) < len(group):
+            depth += 1
+
+        if depth < max_depth:
+            names.update((file_path, label(file_path, depth)) for file_path in group)
+        else:
+            stem = os.path.splitext(os.path.basename(group[0]))[0]
+            names.update((file_path, f'{stem} ({i + 1})') for i, file_path in enumerate(group))
+
+    return names
+
+def _init_worker(hgt_dir, cache_dir, simplification=None, memo_file=None, parameters=None):
+    """
+    Sets up each worker process, so elevation tiles, the elevation memo and the result cache are shared by every route
+    the worker processes.
+    """
+    global _worker_cache, _worker_simplification, _worker_memo, _worker_parameters
+    _worker_simplification = simplification
+    _worker_parameters = parameters
+
+    if cache_dir:
+        from result_cache import ResultCache
+        _worker_cache = ResultCache(cache_dir)
+
+    from geo_processing import SRTMBackend, set_elevation_backend
+    from elevation_memo import ElevationMemo
+
+    if hgt_dir:
+        from hgt_processing import HGTTileStore
+        backend = HGTTileStore(hgt_dir)
+    else:
+        backend = SRTMBackend()
+
+    _worker_memo = ElevationMemo(backend, memo_file)
+    set_elevation_backend(_worker_memo)
+
+    # Routes only save the memo now and then (see ElevationMemo.checkpoint), so it is saved once more when the worker exits
+    if memo_file:
+        from multiprocessing.util import Finalize
+        Finalize(_worker_memo, _worker_memo.save, exitpriority=10)
+
+def _process_file(kml_file_path, output_dir, render_audio=False, table_format=None, route_name=None):
+    """
+    Processes one route in a worker process, and writes its outputs (and audio, if render_audio is set, and tables, if
+    table_format is set) to its own directory, route_name (by default the file name without its extension).
+
+    Returns:
+        dict: The file, whether it succeeded, the error message if not, the time taken in seconds, and the number of
+        distinct elevation cells the route looked up ('memo_cells') and found in the worker's memo ('memo_hits').
+    """
+    from elevation_MAIN import process_route, write_outputs
+
+    start_time = time.perf_counter()
+    memo_before = _worker_memo.info() if _worker_memo is not None else None
+    route_name = route_name or os.path.splitext(os.path.basename(kml_file_path))[0]
+
+    try:
+        result = process_route(kml_file_path, cache=_worker_cache, simplification=_worker_simplification,
+                               parameters=_worker_parameters)
+        route_dir = os.path.join(output_dir, route_name)
+        write_outputs(result, route_dir, table_format)
+
+        if render_audio:
+            from audio_processing import render_pulses, write_wav
+            samples = render_pulses(result['pitches'], result['rates'], step_ms=result['step_ms'])
+            write_wav(os.path.join(route_dir, 'elevation.wav'), samples)
+        error = None
+    except Exception as e:
+        error = str(e)
+
+    result = {
+        'file': kml_file_path,
+        'success': error is None,
+        'error': error,
+        'time': time.perf_counter() - start_time,
+    }
+
+    if _worker_memo is not None:
+        _worker_memo.checkpoint()
+        memo_after = _worker_memo.info()
+        result['memo_hits'] = memo_after['hits'] - memo_before['hits']
+        result['memo_cells'] = result['memo_hits'] + memo_after['misses'] - memo_before['misses']
+
+    return result
+
+def run_batch(kml_file_paths, output_dir, workers=None, hgt_dir=None, cache_dir=None, render_audio=False,
+              simplification=None, memo_file=None, table_format=None, parameters=None):
+    """
+    Processes many routes in parallel.
+
+    Args:
+        kml_file_paths (list): The KML files to process.
+        output_dir (str): The directory in which each route gets its own output directory (see `output_names`).
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        hgt_dir (str): A local directory of .hgt tiles to use instead of downloading SRTM data.
+        cache_dir (str): If given, results are cached in this directory, so unchanged routes are not reprocessed.
+        render_audio (bool): Whether to also render each route's pulse voice to elevation.wav.
+        simplification (tuple): If given, a (method, tolerance in metres) pair with which dense routes are simplified.
+        memo_file (str): If given, a file the workers' elevation memos are loaded from and saved to.
+        table_format (str): If given, 'wav' or 'raw', to also write the Pd inputs as float32 tables.
+        parameters (dict): If given, the SONIFICATION_PARAMETERS to override, e.g. from elevation_MAIN.route_parameters.
+
+    Returns:
+        list: One result dict per file (see `_process_file`), in the same order as kml_file_paths.
+    """
+    route_names = output_names(kml_file_paths)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(hgt_dir, cache_dir, simplification, memo_file, parameters)) as executor:
+        futures = [executor.submit(_process_file, kml_file_path, output_dir, render_audio, table_format,
+                                   route_names[kml_file_path])
+                   for kml_file_path in kml_file_paths]
+        return [future.result() for future in futures]
+
+def print_summary(results, elapsed_time):
+    """
+    Prints the successes, failures and per-file timings of a batch.
+
+    Args:
+        results (list): The results returned by `run_batch`.
+        elapsed_time (float): The wall-clock time of the whole batch in seconds.
+    """
+    for result in results:
+        status = f'{GREEN}OK{RESET}  ' if result['success'] else f'{BOLD_RED}FAIL{RESET}'
+        details = f" - {result['error']}" if result['error'] else ''
+        print(f"{status} {result['time']:8.3f} s  {os.path.basename(result['file'])}{details}")
+
+    n_successes = sum(result['success'] for result in results)
+    n_failures = len(results) - n_successes
+    throughput = len(results) / elapsed_time if elapsed_time > 0 else 0
+
+    print(f'\n{n_successes} succeeded, {n_failures} failed in {elapsed_time:.3f} s ({throughput:.1f} routes/s)')
+
+    memo_cells = sum(result.get('memo_cells', 0) for result in results)
+    if memo_cells:
+        memo_hits = sum(result.get('memo_hits', 0) for result in results)
+        print(f'Elevation memo: {memo_hits} of {memo_cells} grid cells reused ({memo_hits / memo_cells:.1%})')
+
+def add_route_arguments(parser):
+    """
+    Adds the --distance, --resolution and --duration options, which are turned into SONIFICATION_PARAMETERS by
+    elevation_MAIN.route_parameters.
+    """
+    parser.add_argument('--distance', help="race distance in km, or 5k, 10k, half, marathon, 50k, 100k or 'any' (default: 5k)")
+    parser.add_argument('--resolution', help="metres per point, or 'auto' (default: 10, or 'auto' with --duration)")
+    parser.add_argument('--duration', help='for auto resolution, how long each route should play for in seconds')
+
+def main(args=None):
+    """
+    Parses the command line arguments and runs the batch. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description='Sonify the elevation profiles of many KML routes in parallel.')
+    parser.add_argument('inputs', nargs='+', help='directories or glob patterns of KML files')
+    parser.add_argument('-o', '--output-dir', required=True, help='directory in which each route gets its own output directory')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--hgt-dir', default=os.environ.get('TRAILSONG_HGT_DIR'), help='local directory of SRTM .hgt tiles')
+    parser.add_argument('--cache-dir', help='cache results in this directory, so unchanged routes are not reprocessed')
+    parser.add_argument('--audio', action='store_true', help="also render each route's pulse voice to elevation.wav")
+    parser.add_argument('--tables', choices=TABLE_FORMATS, help='also write the Pd inputs as float32 tables in this format')
+    parser.add_argument('--simplify', choices=SIMPLIFICATION_METHODS, help='simplify dense routes with this method')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='simplification tolerance in metres (default: 2)')
+    parser.add_argument('--elevation-memo', help='load and save the elevation memo in this .npz file between batches')
+    parser.add_argument('--summary-json', help='also write the per-file results to this JSON file')
+    add_route_arguments(parser)
+    args = parser.parse_args(args)
+
+    from elevation_MAIN import route_parameters
+    try:
+        parameters = route_parameters(args.distance, args.resolution, args.duration)
+    except ValueError as e:
+        parser.error(str(e))
+
+    kml_file_paths = find_route_files(args.inputs)
+    if not kml_file_paths:
+        print(f'{error_msg} No KML files found.')
+        return 1
+
+    start_time = time.perf_counter()
+    results = run_batch(kml_file_paths, args.output_dir, args.workers, args.hgt_dir, args.cache_dir, args.audio,
+                        (args.simplify, args.tolerance) if args.simplify else None, args.elevation_memo, args.tables,
+                        parameters)
+    elapsed_time = time.perf_counter() - start_time
+
+    print_summary(results, elapsed_time)
+
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump({'elapsed_time': elapsed_time, 'results': results}, f, indent=2)
+
+    return 0 if all(result['success'] for result in results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""
+Module name: Batch Test
+
+Description: Unit tests for the `batch_MAIN` module.
+
+Tests include:
+- `test_find_route_files`: Checks that directories and glob patterns are expanded into KML files, each listed once.
+- `test_output_names`: Checks that files with the same name get distinct output directories, even if their paths are
+  the same.
+- `test_run_batch`: Runs the example routes through a process pool using synthetic offline tiles,
+  and checks that each route gets its own outputs and audio, that elevation memo statistics are reported, and that
+  failures are reported.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+from batch_MAIN import find_route_files, output_names, run_batch
+from hgt_processing import write_synthetic_tile
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), '../example_data/elevation')
+
+class TestBatch(unittest.TestCase):
+
+    def test_find_route_files(self):
+        from_dir = find_route_files([EXAMPLE_DIR])
+        from_glob = find_route_files([os.path.join(EXAMPLE_DIR, 'T*.kml'), os.path.join(EXAMPLE_DIR, '*.kml')])
+
+        self.assertEqual(len(from_dir), 3)
+        self.assertEqual(from_dir, from_glob)
+
+        # The same directory given by a relative and an absolute path is only listed once
+        both = find_route_files([os.path.relpath(EXAMPLE_DIR), os.path.abspath(EXAMPLE_DIR)])
+        self.assertEqual(both, from_dir)
+
+    def test_output_names(self):
+        file_paths = [os.path.join('week 1', 'a', 'Route.kml'), os.path.join('week 2', 'a', 'route.kml'),
+                      os.path.join('b', 'Track.kml'), os.path.join('b', 'Track.gpx'), os.path.join('b', 'Other.kml')]
+
+        self.assertEqual(list(output_names(file_paths).values()),
+                         ['Route (week 1 - a)', 'route (week 2 - a)', 'Track.kml', 'Track.gpx', 'Other'])
+
+        # Paths which can't be told apart are numbered, rather than looping forever
+        self.assertEqual(list(output_names(['route.kml', os.path.abspath('route.kml')]).values()), ['route (1)', 'route (2)'])
+
+    def test_run_batch(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            hgt_dir = os.path.join(temp_dir, 'hgt')
+            output_dir = os.path.join(temp_dir, 'output')
+
+            # Tiles covering the example routes
+            for lat, lon in [(54, -2), (53, -3), (52, -5)]:
+                write_synthetic_tile(hgt_dir, lat, lon)
+
+            # An empty file should fail without stopping the rest of the batch
+            bad_file = os.path.join(temp_dir, 'empty.kml')
+            open(bad_file, 'w').close()
+
+            kml_file_paths = find_route_files([EXAMPLE_DIR]) + [bad_file]
+            results = run_batch(kml_file_paths, output_dir, workers=2, hgt_dir=hgt_dir, render_audio=True)
+
+            self.assertEqual([result['file'] for result in results], kml_file_paths)
+            self.assertEqual([result['success'] for result in results], [True, True, True, False])
+            self.assertTrue(all(0 <= result['memo_hits'] < result['memo_cells'] for result in results[:3]))
+
+            for kml_file_path in kml_file_paths[:3]:
+                route_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(kml_file_path))[0])
+                self.assertEqual(sorted(os.listdir(route_dir)), ['elevation.wav', 'graph_data.txt', 'parkrun_name.txt', 'pitches.txt', 'playback.txt', 'rates.txt'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Module name: Benchmark Test
+
+Description: Unit tests for the benchmark suite in `performance_tests`.
+
+Tests include:
+- `test_run_benchmarks`: Runs the suite at a small scale, and checks every stage is timed and measured.
+- `test_compare_to_baseline`: Checks that only stages slower than the tolerance are reported as regressions.
+- `test_import_time_test`: Checks import times against a budget, and that a missing import time counts as a failure.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import json
+import subprocess
+import unittest
+from unittest.mock import patch
+from performance_tests import run_benchmarks, compare_to_baseline, import_time_test, ELEVATION_STAGES, PACE_STAGES, SEARCH_STAGES
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        report = run_benchmarks(scales=[100], repeats=1, library_sizes=[500])
+
+        self.assertEqual(list(report['results']['elevation']['100']), ELEVATION_STAGES + ['total'])
+        self.assertEqual(list(report['results']['pace']['100']), PACE_STAGES + ['total'])
+        self.assertEqual(list(report['results']['search']['500']), SEARCH_STAGES)
+        self.assertGreater(report['results']['search']['500']['prefiltered']['recall'], 0.5)
+
+        for stage in report['results']['elevation']['100'].values():
+            self.assertGreater(stage['time'], 0)
+            self.assertGreaterEqual(stage['peak_memory'], 0)
+
+        # The report must be saveable as a baseline
+        json.dumps(report)
+
+    def test_compare_to_baseline(self):
+        baseline = {'results': {'elevation': {'1000': {'parse': {'time': 0.010}, 'map': {'time': 0.0001}}}}}
+        current = {'results': {'elevation': {'1000': {'parse': {'time': 0.020}, 'map': {'time': 0.0005}},
+                                             '10000': {'parse': {'time': 1.0}}}}}
+
+        # The map stage is below the noise floor, and there is no baseline at 10000 points
+        regressions = compare_to_baseline(current, baseline, tolerance=1.5)
+        self.assertEqual(regressions, [('elevation', '1000', 'parse', 0.010, 0.020)])
+
+        self.assertEqual(compare_to_baseline(current, baseline, tolerance=3), [])
+
+    @patch('performance_tests.subprocess.run')
+    def test_import_time_test(self, mock_run):
+        stderr = ('import time: self [us] | cumulative | imported package\n'
+                  'import time:       500 |        500 |   numpy\n'
+                  'import time:       100 |     120000 | elevation_MAIN\n')
+        mock_run.return_value = subprocess.CompletedProcess([], 0, '', stderr)
+
+        self.assertTrue(import_time_test('elevation_MAIN', 0.25))
+        self.assertFalse(import_time_test('elevation_MAIN', 0.1))
+        self.assertFalse(import_time_test('pace_MAIN', 0.25))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Module name: Cache Test
+
+Description: Unit tests for the `result_cache` module.
+
+Tests include:
+- `test_put_and_get`: Checks that results round-trip through the cache and that hits and misses are counted.
+- `test_make_key`: Checks that keys depend on the file's contents and the parameters, but not its path.
+- `test_corrupt_result`: Checks that a truncated or corrupt result is deleted and counted as a miss.
+- `test_eviction`: Checks that the least recently used results are evicted first.
+- `test_process_route_cache`: Checks that a cache hit in `elevation_MAIN.process_route` skips the pipeline.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from result_cache import ResultCache
+from elevation_MAIN import process_route
+
+EXAMPLE_KML = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Tawd Valley parkrun.kml')
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.temp_dir.name, 'cache'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_put_and_get(self):
+        result = {'name': 'Parkrun', 'total_distance': 5.02, 'pitches': np.array([110.0, 220.0])}
+
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.put('key', result)
+        cached = self.cache.get('key')
+
+        self.assertEqual(cached['name'], 'Parkrun')
+        self.assertEqual(cached['total_distance'], 5.02)
+        np.testing.assert_array_equal(cached['pitches'], result['pitches'])
+
+        info = self.cache.info()
+        self.assertEqual((info['entries'], info['hits'], info['misses']), (1, 1, 1))
+
+        self.cache.clear()
+        self.assertEqual(self.cache.info()['entries'], 0)
+
+    def test_make_key(self):
+        copy_path = os.path.join(self.temp_dir.name, 'copy.kml')
+        shutil.copy(EXAMPLE_KML, copy_path)
+
+        key = self.cache.make_key(EXAMPLE_KML, {'resolution_in_m': 10})
+
+        self.assertEqual(key, self.cache.make_key(copy_path, {'resolution_in_m': 10}))
+        self.assertNotEqual(key, self.cache.make_key(copy_path, {'resolution_in_m': 5}))
+
+        with open(copy_path, 'a') as f:
+            f.write(' ')
+        self.assertNotEqual(key, self.cache.make_key(copy_path, {'resolution_in_m': 10}))
+
+    def test_corrupt_result(self):
+        self.cache.put('truncated', {'pitches': np.arange(1000.0)})
+        self.cache.put('corrupt', {'pitches': np.arange(1000.0)})
+
+        path = os.path.join(self.cache.cache_dir, 'truncated.npz')
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) // 2)
+        with open(os.path.join(self.cache.cache_dir, 'corrupt.npz'), 'wb') as f:
+            f.write(b'not a zip file')
+
+        self.assertIsNone(self.cache.get('truncated'))
+        self.assertIsNone(self.cache.get('corrupt'))
+        self.assertEqual((self.cache.misses, self.cache.info()['entries']), (2, 0))
+
+    def test_eviction(self):
+        result = {'data': np.zeros(1000)}
+
+        for key in ['a', 'b', 'c']:
+            self.cache.put(key, result)
+
+        # Make 'a' the most recently used, then shrink the cache to fit two results
+        entry_size = self.cache.info()['total_bytes'] // 3
+        now = time.time()
+        for age, key in enumerate(['a', 'c', 'b']):
+            os.utime(os.path.join(self.cache.cache_dir, f'{key}.npz'), (now - age, now - age))
+
+        self.cache.max_bytes = entry_size * 2
+        self.cache.evict()
+
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_process_route_cache(self):
+        backend = MagicMock()
+        backend.name = 'stub'
+        backend.get_elevations.side_effect = lambda lats, lons: np.full(len(lats), 42.0)
+
+        first = process_route(EXAMPLE_KML, backend, self.cache)
+        second = process_route(EXAMPLE_KML, backend, self.cache)
+
+        backend.get_elevations.assert_called_once()
+        self.assertEqual(first['name'], second['name'])
+        np.testing.assert_array_equal(first['pitches'], second['pitches'])
+
+if __name__ == '__main__':
+    unittest.main()
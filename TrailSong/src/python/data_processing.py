@@ -4,20 +4,162 @@ Module name: Data Processing
 Description: A collection of utility functions for data processing, interpolation, and file handling.
 
 Functions:
+    - parse_race_distance(value): Converts a race name ('5k', 'half', 'marathon'...) or a distance in km to km.
+    - distance_grid(total_distance, resolution_in_m): Returns evenly spaced distances along a route.
+    - adaptive_resolution(total_distance, target_duration, max_points, step_ms): Picks the resolution of a route's profile.
+    - resample(x_data, channels, grid, kind): Resamples one or more channels onto a shared grid in a single pass.
     - interpolate_data(x_data, y_data, n_data_points): Interpolates data to create a denser dataset.
+    - resample_route(route, resolution_in_m, columns, kind): Resamples columns of a route at evenly spaced distances.
     - plot_graph(x_data, x_label, y_data, y_label): Plots a scatter and line graph of the data.
     - map_value(value, min_value, max_value, min_result, max_result): Maps a value from one range to another.
+    - map_values(values, min_value, max_value, min_result, max_result): Maps an array of values from one range to another.
     - calculate_differences(data): Computes the differences between consecutive values in a list.
-    - write_to_file(data, file_name): Writes formatted data to a file for use in Pure Data.
+    - calculate_array_differences(data): Computes the differences between consecutive values in an array.
+    - write_atomically(file_path, payload): Replaces a file in one go, so readers never see it partly written.
+    - write_to_file(data, file_name, output_dir): Writes formatted data to a file for use in Pure Data.
+    - read_from_file(file_name, input_dir): Reads the values back from a file written by `write_to_file`.
+    - read_playback(input_dir): Reads the number of points, km interval and step of the elevation sonification.
+    - write_table(data, file_name, output_dir, table_format, sample_rate): Writes a float32 table for Pd's [soundfiler].
+    - read_table(file_name, input_dir, table_format): Reads the values back from a table written by `write_table`.
+
+matplotlib is only imported when a graph is plotted, and scipy only for 'pchip' or 'cubic' resampling, to keep start-up
+fast.
 
 Author: George Caselton
-Last updated: 18/08/2024
+Last updated: 17/10/2026
 """
 
-import matplotlib.pylab as plt
 import numpy as np
 import os
-from scipy.interpolate import interp1d
+import struct
+import tempfile
+
+# Formats of the table files written by write_table
+TABLE_FORMATS = ('wav', 'raw')
+
+# The process's umask, which os.umask can only read by setting it. Temporary files are created readable by their owner
+# only, so write_atomically gives them the permissions a plain open() would before they replace the target.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+# WAV format code of 32-bit float samples
+WAVE_FORMAT_IEEE_FLOAT = 3
+
+# Resampling methods. 'pchip' and 'cubic' need scipy, which is only imported when they are used
+RESAMPLING_KINDS = ('linear', 'pchip', 'cubic')
+
+# Distances of common races in km
+RACE_DISTANCES = {'5k': 5.0, '10k': 10.0, 'half': 21.0975, 'marathon': 42.195, '50k': 50.0, '100k': 100.0}
+
+# The finest resolution picked by adaptive_resolution, in metres, well below the spacing of the elevation data
+MIN_RESOLUTION_IN_M = 1.0
+
+def parse_race_distance(value):
+    """
+    Converts a race name, e.g. '10k', 'half' or 'marathon' (see RACE_DISTANCES), or a distance in km to km.
+
+    Args:
+        value (str or float): The race name or distance.
+
+    Returns:
+        float: The distance in km.
+
+    Raises:
+        ValueError: If the value is neither a known race nor a positive number.
+    """
+    if isinstance(value, str) and value.strip().lower() in RACE_DISTANCES:
+        return RACE_DISTANCES[value.strip().lower()]
+
+    try:
+        distance = float(value)
+    except (TypeError, ValueError):
+        distance = 0.0
+    if not distance > 0:
+        raise ValueError(f"invalid race distance '{value}', expected a distance in km or one of {', '.join(RACE_DISTANCES)}")
+    return distance
+
+def distance_grid(total_distance, resolution_in_m):
+    """
+    Returns evenly spaced distances along a route, as close to the resolution apart as fits a whole number of steps.
+
+    Args:
+        total_distance (float): The length of the route in km.
+        resolution_in_m (float): The spacing of the grid in metres.
+
+    Returns:
+        np.ndarray: The distances in km, from 0 to total_distance inclusive.
+    """
+    n_steps = max(int(round(total_distance * 1000 / resolution_in_m)), 1)
+    return np.linspace(0, total_distance, n_steps + 1)
+
+def adaptive_resolution(total_distance, target_duration=None, max_points=100000, step_ms=100):
+    """
+    Picks the resolution at which a route's profile is resampled, so it plays for the target duration in Pd, or fills
+    the point budget if no duration is given. The resolution is never finer than MIN_RESOLUTION_IN_M.
+
+    Args:
+        total_distance (float): The length of the route in km.
+        target_duration (float): How long the sonification should play for, in seconds.
+        max_points (int): The most points the profile may have.
+        step_ms (float): How long Pd plays each point for, in ms.
+
+    Returns:
+        float: The resolution in metres, for `distance_grid`.
+    """
+    n_points = max_points if target_duration is None else min(max(int(target_duration * 1000 / step_ms), 2), max_points)
+    return max(total_distance * 1000 / (n_points - 1), MIN_RESOLUTION_IN_M)
+
+def resample(x_data, channels, grid, kind='linear'):
+    """
+    Resamples one or more channels of per-point data onto a shared grid in a single pass.
+
+    For linear resampling the position of each grid point between the data points is found once, with np.searchsorted,
+    and applied to every channel. Grid points outside the data take the value at the nearest end, like np.interp.
+
+    Args:
+        x_data (np.ndarray): The increasing x-coordinates of the data points, e.g. cumulative distances. Repeated
+            values, such as from a paused GPS track, are allowed.
+        channels (np.ndarray or dict): A 1-D array of values per data point, a 2-D array with one row per channel,
+            or a dict of names to 1-D arrays.
+        grid (np.ndarray): The x-coordinates to resample at.
+        kind (str): One of 'linear', 'pchip' (shape-preserving cubic, with no overshoot) or 'cubic' (cubic spline).
+
+    Returns:
+        np.ndarray or dict: The resampled channels, in the same form as `channels`.
+
+    Raises:
+        ValueError: If the kind is unknown.
+    """
+    if kind not in RESAMPLING_KINDS:
+        raise ValueError(f"unknown resampling kind '{kind}', expected one of {', '.join(RESAMPLING_KINDS)}")
+
+    if isinstance(channels, dict):
+        resampled = resample(x_data, np.array(list(channels.values()), dtype=float), grid, kind)
+        return dict(zip(channels, resampled))
+
+    x_data = np.asarray(x_data, dtype=float)
+    values = np.asarray(channels, dtype=float)
+    grid = np.asarray(grid, dtype=float)
+
+    if kind == 'linear':
+        if values.ndim == 1:
+            return np.interp(grid, x_data, values)
+
+        # The segment each grid point falls in, and how far along it
+        segments = np.clip(np.searchsorted(x_data, grid, side='right') - 1, 0, len(x_data) - 2)
+        starts, ends = x_data[segments], x_data[segments + 1]
+        lengths = ends - starts
+        weights = np.divide(grid - starts, lengths, out=np.zeros_like(grid), where=lengths > 0)
+        weights = np.clip(weights, 0, 1)
+
+        return values[..., segments] * (1 - weights) + values[..., segments + 1] * weights
+
+    from scipy.interpolate import PchipInterpolator, CubicSpline
+
+    # Splines need strictly increasing x, so only the first of any repeated points is kept
+    x_data, first = np.unique(x_data, return_index=True)
+    interpolator = PchipInterpolator if kind == 'pchip' else CubicSpline
+    return interpolator(x_data, values[..., first], axis=-1)(np.clip(grid, x_data[0], x_data[-1]))
 
 def interpolate_data(x_data, y_data, n_data_points):
     """
@@ -31,20 +173,29 @@ def interpolate_data(x_data, y_data, n_data_points):
     Returns:
         tuple: Two numpy ndarrays containing the interpolated x and y data points.
     """
-    # Ensure x_data and y_data are numpy arrays
-    x_data = np.array(x_data)
-    y_data = np.array(y_data)
+    x_data = np.asarray(x_data, dtype=float)
 
-    # Create an interpolation function using linear interpolation
-    interp_func = interp1d(x_data, y_data, kind='linear')
+    # Generate evenly spaced x data points, and linearly interpolate the y data points at them
+    interpolated_x_data = np.linspace(x_data.min(), x_data.max(), num=n_data_points)
+    interpolated_y_data = resample(x_data, y_data, interpolated_x_data)
 
-    # Generate interpolated x data points
-    interpolated_x_data = np.linspace(min(x_data), max(x_data), num=n_data_points)
+    return interpolated_x_data, interpolated_y_data
 
-    # Apply interpolation function to get interpolated y data points
-    interpolated_y_data = interp_func(interpolated_x_data)
+def resample_route(route, resolution_in_m, columns=('ele',), kind='linear'):
+    """
+    Resamples columns of a route onto one grid of evenly spaced distances, reading the columns in place.
 
-    return interpolated_x_data, interpolated_y_data
+    Args:
+        route (route_processing.Route): A route whose distances, and the columns to resample, have been filled in.
+        resolution_in_m (float): The spacing of the grid in metres (see `distance_grid`).
+        columns (tuple): The names of the columns to resample, e.g. 'ele'.
+        kind (str): One of 'linear', 'pchip' or 'cubic' (see `resample`).
+
+    Returns:
+        tuple: The grid of distances (km), and a dict of each column's resampled values.
+    """
+    grid = distance_grid(route.total_distance, resolution_in_m)
+    return grid, resample(route.distances, {column: route.points[column] for column in columns}, grid, kind)
 
 def plot_graph(x_data, x_label, y_data, y_label):
     """
@@ -57,6 +208,8 @@ def plot_graph(x_data, x_label, y_data, y_label):
         x_label (str): The label for the x-axis.
         y_label (str): The label for the y-axis.
     """
+    import matplotlib.pyplot as plt
+
     plt.scatter(x_data, y_data)  # Scatter plot of the data points
     plt.plot(x_data, y_data, linestyle='-', color='blue')  # Line plot of the data
     plt.xlabel(x_label)  # Set x-axis label
@@ -87,6 +240,32 @@ def map_value(value, min_value, max_value, min_result, max_result):
     result = min_result + (value - min_value) / (max_value - min_value) * (max_result - min_result)
     return result
 
+def map_values(values, min_value, max_value, min_result, max_result):
+    """
+    Maps an array of values from one range to another, in the same way as `map_value`.
+
+    Args:
+        values (list or np.ndarray): The values to be mapped.
+        min_value (float): The minimum value of the input range.
+        max_value (float): The maximum value of the input range.
+        min_result (float): The minimum value of the output range.
+        max_result (float): The maximum value of the output range.
+
+    Returns:
+        np.ndarray: The mapped values in the output range. If the input range is empty, every value maps to min_result.
+    """
+    values = np.asarray(values, dtype=float)
+
+    # A flat input range would divide by zero
+    if max_value == min_value:
+        return np.full(values.shape, float(min_result))
+
+    # Clip values to be within min and max input values
+    values = np.clip(values, min_value, max_value)
+
+    # Calculate the mapped values
+    return min_result + (values - min_value) / (max_value - min_value) * (max_result - min_result)
+
 def calculate_differences(data):
     """
     Calculate the differences between consecutive values in a list.
@@ -108,28 +287,195 @@ def calculate_differences(data):
 
     return differences
 
-def write_to_file(data, file_name):
+def calculate_array_differences(data):
+    """
+    Calculate the differences between consecutive values in an array.
+
+    Args:
+        data (list or np.ndarray): The numerical values.
+
+    Returns:
+        np.ndarray: The differences between consecutive values, with a leading 0 to align with the input data.
+    """
+    data = np.asarray(data, dtype=float)
+
+    # First value will be 0 to align in with the input data
+    differences = np.zeros(data.shape)
+    differences[1:] = np.diff(data)
+
+    return differences
+
+def _default_pd_inputs_dir():
+    return os.path.join(os.path.dirname(__file__), '../pd/inputs')
+
+def write_atomically(file_path, payload):
+    """
+    Writes a file via a temporary file in the same directory, which then replaces it, so other processes (such as Pd, or
+    another worker) never read a partly written file. The file gets the same permissions as one written with open().
+
+    Args:
+        file_path (str): The file to write. Its directory must exist.
+        payload (bytes or callable): The contents, written in one buffered write, or a function which writes them to
+            the binary file it is given, e.g. to save arrays with np.savez.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if callable(payload):
+                payload(f)
+            else:
+                f.write(payload)
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def write_to_file(data, file_name, output_dir=None):
     """
     Writes data to a text file, formatted for use with Pure Data (Pd).
 
     Args:
-        data (list or str): The data to be written to the file. If it's a list, each item is written on a new line.
+        data (list, np.ndarray or str): The data to be written to the file. If it's a list or array, each item is written on a new line.
         file_name (str): The name of the file to be created (without extension).
+        output_dir (str): The directory to write the file to, which is created if needed. Defaults to the pd/inputs directory.
 
     Notes:
-        If `data` is a list, each entry is written with a prefix '0', the file_name, and a semicolon to indicate the end of the message.
+        If `data` is a list or array, each entry is written with a prefix '0', the file_name, and a semicolon to indicate the end of the message.
+        The file is written atomically, in one write.
     """
     # Define the output directory and file path
-    output_dir = '../pd/inputs'
-    this_dir = os.path.dirname(__file__)
-    file_path = os.path.join(this_dir, output_dir, f'{file_name}.txt')
-
-    # Write data to the file
-    with open(file_path, 'w') as f:
-        if isinstance(data, list):
-            for datum in data:
-                # Write each data point to a new line with the required format for Pd
-                f.write(f'0 {file_name} {datum};\n')
-        else:
-            # Write single data entry if data is not a list
-            f.write(data)
+    if output_dir is None:
+        output_dir = _default_pd_inputs_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, f'{file_name}.txt')
+
+    if isinstance(data, (list, np.ndarray)):
+        # Each data point on a new line with the required format for Pd
+        text = ''.join([f'0 {file_name} {datum};\n' for datum in data])
+    else:
+        # Single data entry if data is not a list
+        text = data
+
+    write_atomically(file_path, text.encode())
+
+def write_table(data, file_name, output_dir=None, table_format='wav', sample_rate=44100):
+    """
+    Writes an array of values to a float32 table file, which Pd loads into an [array] in one go with [soundfiler].
+
+    Unlike the text files of `write_to_file`, which a [qlist] steps through line by line, a table is 4 bytes per value
+    and can be read by index, e.g. with the table_reader.pd abstraction. The file is written atomically, in one write.
+
+    Args:
+        data (list or np.ndarray): The values to write.
+        file_name (str): The name of the file to be created (without extension).
+        output_dir (str): The directory to write the file to, which is created if needed. Defaults to the pd/inputs directory.
+        table_format (str): 'wav' for a mono 32-bit float WAV file ('.wav'), read with `read -resize`, or 'raw' for
+            headerless little-endian float32 values ('.f32'), read with `read -raw 0 1 4 l -resize`.
+        sample_rate (int): The sample rate stored in a WAV file's header. Pd ignores it when loading a table.
+
+    Returns:
+        str: The path of the written file.
+
+    Raises:
+        ValueError: If the table format is unknown.
+    """
+    if table_format not in TABLE_FORMATS:
+        raise ValueError(f"unknown table format '{table_format}', expected one of {', '.join(TABLE_FORMATS)}")
+
+    if output_dir is None:
+        output_dir = _default_pd_inputs_dir()
+    os.makedirs(output_dir, exist_ok=True)
+
+    values = np.asarray(data, dtype='<f4').tobytes()
+
+    if table_format == 'raw':
+        file_path = os.path.join(output_dir, f'{file_name}.f32')
+        write_atomically(file_path, values)
+        return file_path
+
+    n_values = len(values) // 4
+
+    # RIFF header, then a format chunk for IEEE float samples, a fact chunk (required for non-PCM formats) and the data
+    header = b''.join([
+        b'RIFF', struct.pack('<I', 4 + 26 + 12 + 8 + len(values)), b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHHH', 18, WAVE_FORMAT_IEEE_FLOAT, 1, sample_rate, sample_rate * 4, 4, 32, 0),
+        b'fact', struct.pack('<II', 4, n_values),
+        b'data', struct.pack('<I', len(values)),
+    ])
+
+    file_path = os.path.join(output_dir, f'{file_name}.wav')
+    write_atomically(file_path, header + values)
+    return file_path
+
+def read_table(file_name, input_dir=None, table_format='wav'):
+    """
+    Reads the values back from a table file written by `write_table`.
+
+    Args:
+        file_name (str): The name of the file (without extension).
+        input_dir (str): The directory to read the file from. Defaults to the pd/inputs directory.
+        table_format (str): 'wav' or 'raw', as given to `write_table`.
+
+    Returns:
+        np.ndarray: The float32 values.
+    """
+    if input_dir is None:
+        input_dir = _default_pd_inputs_dir()
+
+    extension = '.f32' if table_format == 'raw' else '.wav'
+    with open(os.path.join(input_dir, file_name + extension), 'rb') as f:
+        payload = f.read()
+
+    if table_format == 'raw':
+        return np.frombuffer(payload, dtype='<f4')
+
+    # Walk the chunks after the RIFF header to find the data
+    position = 12
+    while position + 8 <= len(payload):
+        chunk_id, chunk_size = payload[position:position + 4], struct.unpack_from('<I', payload, position + 4)[0]
+        if chunk_id == b'data':
+            return np.frombuffer(payload, dtype='<f4', count=chunk_size // 4, offset=position + 8)
+        position += 8 + chunk_size + chunk_size % 2
+
+    raise ValueError(f'{file_name}{extension} has no data chunk')
+
+def read_from_file(file_name, input_dir=None):
+    """
+    Reads the numeric values back from a Pd input file written by `write_to_file`.
+
+    Args:
+        file_name (str): The name of the file (without extension).
+        input_dir (str): The directory to read the file from. Defaults to the pd/inputs directory.
+
+    Returns:
+        np.ndarray: The values, in the order they were written.
+    """
+    if input_dir is None:
+        input_dir = _default_pd_inputs_dir()
+    file_path = os.path.join(input_dir, f'{file_name}.txt')
+
+    # Each line has the format '0 file_name value;'
+    with open(file_path) as f:
+        values = [line.split()[2].rstrip(';') for line in f if line.strip()]
+
+    return np.array(values, dtype=float)
+
+def read_playback(input_dir=None):
+    """
+    Reads playback.txt, written by elevation_MAIN.write_outputs as a single line of values rather than a [qlist].
+
+    Args:
+        input_dir (str): The directory to read the file from. Defaults to the pd/inputs directory.
+
+    Returns:
+        tuple: The number of points, how long a km plays for (ms), and how long each point plays for (ms).
+    """
+    if input_dir is None:
+        input_dir = _default_pd_inputs_dir()
+
+    with open(os.path.join(input_dir, 'playback.txt')) as f:
+        n_points, km_interval, step_ms = f.read().split()
+
+    return int(n_points), float(km_interval), float(step_ms)
@@ -5,19 +5,31 @@ Description: Unit tests for the `data_processing` module.
 
 Tests include:
 - `test_interpolate_data`: Checks that the interpolation method works as expected.
+- `test_resample`: Checks multi-channel resampling against np.interp, repeated points, and the spline kinds.
+- `test_distance_grid`: Checks that the grid spans the route with steps close to the resolution.
+- `test_adaptive_resolution`: Checks that the resolution fits the target duration or point budget, and race names.
 - `test_map_value`: Tests that values are being accurately mapped.
 - 'test_calculate_differences': Checks that the function correctly calculates the difference between 2 points.
+- `test_map_values`: Tests that arrays of values are mapped and clipped like `map_value`.
+- `test_calculate_array_differences`: Checks the array version of `calculate_differences`.
+- `test_read_from_file`: Checks that values written by `write_to_file` are read back unchanged.
+- `test_write_atomically`: Checks that files are replaced whole, with the permissions `open()` would give them.
+- `test_write_table`: Checks the float32 WAV header and that WAV and raw tables are read back unchanged.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
-Test status as of 18/08/2024: PASS
+Test status as of 17/10/2026: PASS
 
 """
 
+import os
+import struct
+import tempfile
 import unittest
 import numpy as np
-from data_processing import interpolate_data, map_value, calculate_differences
+from data_processing import interpolate_data, resample, distance_grid, map_value, calculate_differences, map_values, calculate_array_differences
+from data_processing import write_to_file, read_from_file, write_atomically, write_table, read_table, adaptive_resolution, parse_race_distance
 class TestDataProcessing(unittest.TestCase):
     
     def test_interpolate_data(self):
@@ -37,6 +49,60 @@ class TestDataProcessing(unittest.TestCase):
         np.testing.assert_array_almost_equal(interpolated_x_data, expected_x)
         np.testing.assert_array_almost_equal(interpolated_y_data, expected_y)
     
+    def test_resample(self):
+
+        # Test that `resample` gives the same values as np.interp for every channel, in each form of channels.
+
+        rng = np.random.default_rng(0)
+        x_data = np.cumsum(rng.uniform(0, 2, 200))
+        x_data[50] = x_data[49]  # A repeated point, as from a paused GPS track
+        channels = rng.normal(size=(3, 200))
+        grid = np.linspace(-1, x_data[-1] + 1, 1000)
+
+        expected = np.array([np.interp(grid, x_data, channel) for channel in channels])
+
+        np.testing.assert_allclose(resample(x_data, channels, grid), expected, atol=1e-12)
+        np.testing.assert_array_equal(resample(x_data, channels[0], grid), expected[0])
+
+        resampled = resample(x_data, {'ele': channels[0], 'gradient': channels[1]}, grid)
+        self.assertEqual(list(resampled), ['ele', 'gradient'])
+        np.testing.assert_allclose(resampled['gradient'], expected[1], atol=1e-12)
+
+        # PCHIP never overshoots the data, and both spline kinds pass through it
+        steps = np.array([0.0, 0, 0, 1, 1, 1])
+        fine_grid = np.linspace(0, 5, 101)
+        pchip = resample(np.arange(6), steps, fine_grid, 'pchip')
+        self.assertTrue(pchip.min() >= 0 and pchip.max() <= 1)
+        np.testing.assert_allclose(resample(np.arange(6), steps, np.arange(6), 'cubic'), steps, atol=1e-12)
+
+        with self.assertRaises(ValueError):
+            resample(x_data, channels, grid, 'nearest')
+
+    def test_distance_grid(self):
+
+        # Test that `distance_grid` spans the whole route, with a whole number of steps close to the resolution.
+
+        grid = distance_grid(5.004, 10)
+
+        self.assertEqual(len(grid), 501)
+        self.assertEqual((grid[0], grid[-1]), (0, 5.004))
+        np.testing.assert_allclose(np.diff(grid), 5.004 / 500)
+        self.assertEqual(len(distance_grid(0.001, 10)), 2)
+
+    def test_adaptive_resolution(self):
+
+        # A marathon played for 5 minutes at 100 ms per point has 3000 points, and the budget caps the points
+        self.assertEqual(len(distance_grid(42.195, adaptive_resolution(42.195, target_duration=300))), 3000)
+        self.assertEqual(len(distance_grid(160.0, adaptive_resolution(160.0, max_points=100000))), 100000)
+
+        # Short routes are never sampled finer than a metre
+        self.assertEqual(adaptive_resolution(0.5, target_duration=600), 1.0)
+
+        self.assertEqual(parse_race_distance('Marathon'), 42.195)
+        self.assertEqual(parse_race_distance('7.5'), 7.5)
+        with self.assertRaisesRegex(ValueError, "invalid race distance 'parkrun'"):
+            parse_race_distance('parkrun')
+
     def test_map_value(self):
         
         # Test the `map_value` function to verify correct value mapping.
@@ -62,5 +128,81 @@ class TestDataProcessing(unittest.TestCase):
         
         self.assertEqual(differences, expected_differences)
 
+    def test_map_values(self):
+
+        # Test the `map_values` function against `map_value`, including values outside the input range.
+
+        values = np.array([-5, 0, 2.5, 5, 10, 15])
+
+        result = map_values(values, 0, 10, 250, 50)
+        expected = [map_value(value, 0, 10, 250, 50) for value in values]
+
+        np.testing.assert_array_almost_equal(result, expected)
+        np.testing.assert_array_equal(map_values(values, 3, 3, 0, 1), np.zeros(6))  # Flat input range
+
+    def test_calculate_array_differences(self):
+
+        # Test the `calculate_array_differences` function against `calculate_differences`.
+
+        data = np.array([10, 20, 15, 40])
+
+        differences = calculate_array_differences(data)
+
+        np.testing.assert_array_equal(differences, calculate_differences(list(data)))
+
+    def test_read_from_file(self):
+
+        # Test that `read_from_file` reverses `write_to_file`.
+
+        data = np.array([110.0, 123.456, 880.0])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_to_file(data, 'pitches', temp_dir)
+            np.testing.assert_array_equal(read_from_file('pitches', temp_dir), data)
+
+    def test_write_atomically(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'values.bin')
+            write_atomically(file_path, b'old')
+            write_atomically(file_path, lambda f: f.write(b'new'))
+
+            with open(file_path, 'rb') as f:
+                self.assertEqual(f.read(), b'new')
+            self.assertEqual(os.listdir(temp_dir), ['values.bin'])
+
+            # The file has the permissions open() would give it, not the owner-only ones of a temporary file
+            plain_path = os.path.join(temp_dir, 'plain.bin')
+            open(plain_path, 'wb').close()
+            self.assertEqual(os.stat(file_path).st_mode, os.stat(plain_path).st_mode)
+
+    def test_write_table(self):
+
+        # Test that `write_table` writes a float32 WAV file Pd can load, and raw tables, which `read_table` reverses.
+
+        data = np.linspace(110, 880, 1001)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            wav_path = write_table(data, 'pitches', temp_dir)
+            raw_path = write_table(data, 'pitches', temp_dir, 'raw')
+
+            with open(wav_path, 'rb') as f:
+                header = f.read(58)
+
+            np.testing.assert_array_equal(read_table('pitches', temp_dir), data.astype(np.float32))
+            np.testing.assert_array_equal(read_table('pitches', temp_dir, 'raw'), data.astype(np.float32))
+            self.assertEqual(os.path.getsize(raw_path), 4 * len(data))
+
+            # Only the finished files are left behind
+            self.assertEqual(sorted(os.listdir(temp_dir)), ['pitches.f32', 'pitches.wav'])
+
+            with self.assertRaises(ValueError):
+                write_table(data, 'pitches', temp_dir, 'csv')
+
+        # IEEE float format, mono, 32 bits per sample, and the sample count in the fact chunk
+        self.assertEqual((header[:4], header[8:12], header[12:16]), (b'RIFF', b'WAVE', b'fmt '))
+        self.assertEqual(struct.unpack('<HHIIHH', header[20:36]), (3, 1, 44100, 44100 * 4, 4, 32))
+        self.assertEqual((header[38:42], struct.unpack('<I', header[46:50])[0]), (b'fact', 1001))
+        self.assertEqual(header[50:54], b'data')
+
 if __name__ == '__main__':
     unittest.main()
@@ -9,120 +9,315 @@ converted to the rate of pulse occurance.
 When run, the main() function prompts the user to select a KML file from which the elevation data and coordinates are
 extracted. Optional parameters bypass the parts of the code which require user interaction, which is useful for performance testing.
 
+Each stage of the pipeline is wrapped in instrumentation.stage, so its timing and memory use can be recorded by
+enabling instrumentation (see the instrumentation module).
+
 Functions:
+- route_parameters(): Converts a race distance, resolution and duration given by the user into SONIFICATION_PARAMETERS.
+- process_route(): Runs the elevation pipeline on one file and returns the sonified data.
+- map_profile(): Maps a resampled elevation profile to the rates, pitches and graph data sent to Pd.
+- write_outputs(): Writes the sonified data to the Pd input files.
 - main(): Main function to execute the script's functionality.
 
 Author: George Caselton
-Last updated: 18/08/2024
+Last updated: 17/10/2026
 """
 
-from kml_processing import *
-from geo_processing import *
-from data_processing import *
+import numpy as np
+from kml_processing import read_route, select_kml_file
+from geo_processing import get_elevation_backend, fill_elevations, fill_distances
+from data_processing import parse_race_distance, resample_route, adaptive_resolution, plot_graph, map_values, calculate_array_differences
+from data_processing import write_to_file, write_table
+from simplify_processing import simplify_route
+from instrumentation import stage
 from ANSI_formats import *
 
-def main(kml_file_path=None, show_graph=True):
+# Processing parameters, which are also part of the result cache key
+SONIFICATION_PARAMETERS = {
+    # Total race distance in metres, which routes must be within the tolerance (a fraction) of, or None for any length
+    'race_distance': 5000,
+    'distance_tolerance': 0.1,
+
+    # How many metres per data point, or 'auto' to pick it from the target duration or, if that is None, the point budget
+    'resolution_in_m': 10,
+    'target_duration': None,
+
+    # The most points a profile may have after resampling
+    'max_points': 100000,
+
+    # How long elevation_reader.pd plays each point for, in ms
+    'step_ms': 100,
+
+    # How the elevation profile is resampled: 'linear', or 'pchip' or 'cubic' (which need scipy)
+    'interpolation': 'linear',
+
+    # Setting minimums and maximums
+    'min_parkrun_elevation': 0,
+    'max_parkrun_elevation': 457,
+
+    'min_pitch': 110,
+    'max_pitch': 880,
+
+    'min_gradient': 0,
+    'max_gradient': 5,
+
+    'min_rate': 250,
+    'max_rate': 50,
+}
+
+def route_parameters(distance=None, resolution=None, duration=None):
     """
-    This main function can be called with parameters: data_file_path (string), which bypasses opening the dialog
-    box for users to choose a file, and show_graph (boolean), which dictates whether a visual elevation profile is displayed.
-    This is useful when doing performance testing.
+    Converts the options given by a user, e.g. on the command line, into SONIFICATION_PARAMETERS for `process_route`.
+
+    Args:
+        distance (str): A race name or distance in km (see data_processing.parse_race_distance), or 'any' for routes
+            of any length. Defaults to a 5k.
+        resolution (str or float): Metres per point, or 'auto'. Defaults to 10 m, or 'auto' if a duration is given.
+        duration (str or float): How long the sonification should play for in seconds, for 'auto' resolution.
+
+    Returns:
+        dict: The parameters to override.
+
+    Raises:
+        ValueError: If an option is invalid.
     """
+    parameters = {}
 
-    # Prompt user to select KML file
-    if kml_file_path is None:
-        kml_file_path = select_kml_file()
-    
-    # Assess validity of file
-    if kml_file_path:
-        coordinates, parkrun_name = extract_data(kml_file_path)
-        if coordinates:
-            print(f"Successfully extracted {GREEN}{parkrun_name}{RESET}'s coordinates!")
+    if distance is not None:
+        parameters['race_distance'] = None if str(distance).lower() == 'any' else parse_race_distance(distance) * 1000
+
+    if duration is not None:
+        try:
+            parameters['target_duration'] = float(duration)
+        except ValueError:
+            parameters['target_duration'] = 0.0
+        if not parameters['target_duration'] > 0:
+            raise ValueError(f"invalid duration '{duration}', expected a number of seconds")
+        resolution = 'auto' if resolution is None else resolution
+
+    if resolution is not None:
+        if str(resolution).lower() == 'auto':
+            parameters['resolution_in_m'] = 'auto'
         else:
-            print(f"{error_msg} No valid data found in the KML file.")
-            return
-    else:
-        print(f"{error_msg} No file selected.")
-        return
+            try:
+                parameters['resolution_in_m'] = float(resolution)
+            except ValueError:
+                parameters['resolution_in_m'] = 0.0
+            if not parameters['resolution_in_m'] > 0:
+                raise ValueError(f"invalid resolution '{resolution}', expected metres per point or 'auto'")
+
+    return parameters
+
+def process_route(kml_file_path, elevation_backend=None, cache=None, simplification=None, parameters=None):
+    """
+    Runs the whole elevation pipeline on one KML file, without any user interaction or file output.
+
+    Every stage works on whole arrays, and files are parsed in chunks, so the time and memory taken grow linearly with
+    the length of the route, from a 5k to an ultra.
+
+    Args:
+        kml_file_path (str): The path of the KML (or GPX) file.
+        elevation_backend (object): Where elevations come from, e.g. an hgt_processing.HGTTileStore for offline use.
+            By default, geo_processing's default backend is used.
+        cache (result_cache.ResultCache): If given, results are looked up in and saved to this cache, keyed by the
+            contents of the file, the SONIFICATION_PARAMETERS, the elevation backend and the simplification.
+        simplification (tuple): If given, a (method, tolerance in metres) pair with which the route is simplified
+            before any elevation lookups, e.g. ('rdp', 2.0). See simplify_processing for the methods.
+        parameters (dict): Any SONIFICATION_PARAMETERS to override, e.g. {'race_distance': 42195} for a marathon, or
+            {'race_distance': None, 'resolution_in_m': 'auto', 'target_duration': 120} for a route of any length
+            which plays for two minutes.
+
+    Returns:
+        dict: The route's 'name' and 'total_distance' (km), the 'resolution_in_m' it was resampled at and the 'step_ms'
+        each point plays for, its 'bounding_box' (min lat, min lon, max lat, max lon), the interpolated 'distances' (km)
+        and 'elevations' (m), and the 'rates', 'pitches' and 'graph_data' to be sent to Pd (see `map_profile`). If the
+        route was simplified, also the number of 'points_dropped' and the 'simplification_distance_error' (m) of its
+        length. The error in its elevation profile is not measured here, as it needs the elevation of every dropped
+        point, which is the lookup simplification saves; simplify_processing.measure_simplification_error reports it.
+
+    Raises:
+        ValueError: If the file contains no coordinates, the route is not the length of the race, or it would have more
+            than max_points points at the resolution.
+    """
+    parameters = {**SONIFICATION_PARAMETERS, **(parameters or {})}
+
+    if elevation_backend is None:
+        elevation_backend = get_elevation_backend()
+
+    # A cache hit skips the whole pipeline
+    if cache is not None:
+        with stage('elevation.cache_lookup'):
+            backend_name = getattr(elevation_backend, 'name', type(elevation_backend).__name__)
+            cache_key = cache.make_key(kml_file_path, {**parameters, 'elevation_backend': backend_name,
+                                                       'simplification': simplification})
+            result = cache.get(cache_key)
+        if result is not None:
+            return result
 
-    elevations = []
+    with stage('elevation.parse'):
+        try:
+            route = read_route(kml_file_path)
+        except Exception as e:
+            raise ValueError(f'could not read the KML file: {e}') from e
+    if not len(route):
+        raise ValueError('no valid data found in the KML file')
 
-    # Add elevation points to a list
-    for coords in coordinates:
-        elevation = get_srtm_elevation(coords[0], coords[1])
-        elevations.append(elevation)
+    # Drop the points which add little to the route before the costly stages
+    if simplification is not None:
+        with stage('elevation.simplify'):
+            _, simplification_report = simplify_route(route.coordinates, *simplification)
+            route = route[simplification_report['keep']]
 
+    # Look up the elevation of every point in one batch
+    with stage('elevation.elevation'):
+        fill_elevations(route, elevation_backend)
 
     # Calculating the cumulative distance covered
-    distances = [0.0]
-    for i in range(1, len(coordinates)):
-        coords1 = (coordinates[i-1][0], coordinates[i-1][1])
-        coords2 = (coordinates[i][0], coordinates[i][1])
-        distance = calculate_distance(coords1, coords2)
-        distances.append(distances[-1] + distance)
+    with stage('elevation.distance'):
+        fill_distances(route)
 
-    total_distance = distances[-1]
+    total_distance = route.total_distance
 
-    print(f"Total distance covered: {total_distance:.4f} km")
+    # Check if route is the length of the race, allowing for some deviation
+    race_distance = parameters['race_distance']
+    if race_distance is not None and abs(total_distance * 1000 - race_distance) > race_distance * parameters['distance_tolerance']:
+        raise ValueError(f'route length of {total_distance:.4f} km is invalid for a {race_distance / 1000:g} km race')
 
-    # Check if route is correct length, allowing for some deviation
-    if (total_distance < 5*0.9 or total_distance > 5*1.1):
-        print(f'{error_msg} route length is invalid, please re-run the program and select another KML file')
-        return
-    
-    # Total race distance in metres
-    race_distance = 5000
+    resolution_in_m = parameters['resolution_in_m']
+    if resolution_in_m == 'auto':
+        resolution_in_m = adaptive_resolution(total_distance, parameters['target_duration'], parameters['max_points'],
+                                              parameters['step_ms'])
+    elif int(round(total_distance * 1000 / resolution_in_m)) + 1 > parameters['max_points']:
+        raise ValueError(f"a {total_distance:.1f} km route at {resolution_in_m:g} m per point would have more than "
+                         f"{parameters['max_points']} points")
 
-    # How many metres per data point
-    resolution_in_m = 10
+    # Resample the profile every resolution_in_m metres along the route
+    with stage('elevation.interpolate'):
+        distances, columns = resample_route(route, resolution_in_m, ('ele',), parameters['interpolation'])
+        elevations = columns['ele']
 
-    # Number of data points
-    n_data_points = int(race_distance / resolution_in_m)
+    with stage('elevation.map'):
+        mapped = map_profile(elevations, parameters)
 
-    # Interpolate data
-    distances, elevations = interpolate_data(distances, elevations, n_data_points)
+    result = {
+        'name': route.name or '',
+        'total_distance': total_distance,
+        'resolution_in_m': resolution_in_m,
+        'step_ms': parameters['step_ms'],
+        'bounding_box': np.array([route.lats.min(), route.lons.min(), route.lats.max(), route.lons.max()]),
+        'distances': distances,
+        'elevations': elevations,
+        **mapped,
+    }
 
-    # Plot to see the data in line graph form
-    if show_graph == True:
-        plot_graph(distances, 'Distance (km)', elevations, 'Elevation (m)')
-    
-    # Setting minimums and maximums
-    max_parkrun_elevation = 457
-    min_parkrun_elevation = 0
+    # Only the distance error is free to measure, see the docstring
+    if simplification is not None:
+        result['points_dropped'] = simplification_report['dropped']
+        result['simplification_distance_error'] = simplification_report['distance_error']
 
-    max_pitch = 880
-    min_pitch = 110
+    if cache is not None:
+        with stage('elevation.cache_store'):
+            cache.put(cache_key, result)
 
-    min_gradient = 0
-    max_gradient = 5
+    return result
 
-    max_rate = 50
-    min_rate = 250
+def map_profile(elevations, parameters=None):
+    """
+    Maps a resampled elevation profile to the dimensions of sound.
 
-    # Ignoring the polarity of the elevation change to get absolute gradients
-    gradients = calculate_differences(elevations)
-    abs_gradients = [abs(x) for x in gradients]
+    Args:
+        elevations (np.ndarray): The elevation (m) of every point of the profile.
+        parameters (dict): Any SONIFICATION_PARAMETERS to override.
+
+    Returns:
+        dict: The 'rates', 'pitches' and 'graph_data' to be sent to Pd.
+    """
+    parameters = {**SONIFICATION_PARAMETERS, **(parameters or {})}
 
-    rates = []
-    pitches = []
-    graph_data = []
+    # Ignoring the polarity of the elevation change to get absolute gradients
+    gradients = calculate_array_differences(elevations)
+    abs_gradients = np.abs(gradients)
 
     # Mapping data to sound dimensions
-    for i in range(len(elevations)):
+    return {
+        'rates': map_values(abs_gradients, parameters['min_gradient'], parameters['max_gradient'],
+                            parameters['min_rate'], parameters['max_rate']),
+        'pitches': map_values(elevations, parameters['min_parkrun_elevation'], parameters['max_parkrun_elevation'],
+                              parameters['min_pitch'], parameters['max_pitch']),
+        'graph_data': map_values(elevations, elevations.min(), elevations.max(), 0, 1),
+    }
+
+def write_outputs(result, output_dir=None, table_format=None):
+    """
+    Writes the output of `process_route` to the text files read by elevation_MAIN.pd.
+
+    playback.txt holds the number of points, which graph_plotter.pd resizes the elevation graph to, how long a km
+    of the route plays for in ms, which km_marker.pd strikes its chord at, and how long each point plays for in ms
+    (step_ms), which the readers' and the graph's [metro]s step at.
+
+    Args:
+        result (dict): The result of `process_route`.
+        output_dir (str): The directory to write to. Defaults to the pd/inputs directory.
+        table_format (str): If given, the rates, pitches and graph data are also written as float32 tables in this
+            format ('wav' or 'raw'), which elevation_table_reader.pd loads in one go. See data_processing.write_table.
+    """
+    with stage('elevation.write'):
+        write_to_file(result['rates'], 'rates', output_dir)
+        write_to_file(result['pitches'], 'pitches', output_dir)
+        write_to_file(result['graph_data'], 'graph_data', output_dir)
+        write_to_file(result['name'], 'parkrun_name', output_dir)
+
+        km_interval = 1000 / result['resolution_in_m'] * result['step_ms']
+        write_to_file(f"{len(result['pitches'])} {km_interval:g} {result['step_ms']:g}", 'playback', output_dir)
+
+        if table_format is not None:
+            for name in ('rates', 'pitches', 'graph_data'):
+                write_table(result[name], name, output_dir, table_format)
+
+def main(kml_file_path=None, show_graph=True, elevation_backend=None, output_dir=None, cache=None, simplification=None,
+         table_format=None, parameters=None):
+    """
+    This main function can be called with parameters: data_file_path (string), which bypasses opening the dialog
+    box for users to choose a file, and show_graph (boolean), which dictates whether a visual elevation profile is displayed.
+    This is useful when doing performance testing.
 
-        rate = map_value(abs_gradients[i], min_gradient, max_gradient, min_rate, max_rate)
-        rates.append(rate)
+    elevation_backend (object) chooses where elevations come from, e.g. an hgt_processing.HGTTileStore for offline use,
+    and output_dir (string) where the Pd input files are written. By default, geo_processing's default backend and the
+    pd/inputs directory are used. If a result_cache.ResultCache is given as cache, unchanged routes are not reprocessed.
+    A (method, tolerance in metres) pair given as simplification, e.g. ('rdp', 2.0), simplifies dense routes first.
+    A table_format of 'wav' or 'raw' also writes the values as float32 tables, for elevation_table_reader.pd.
+    parameters (dict) overrides SONIFICATION_PARAMETERS, e.g. the race distance and resolution (see `process_route`).
+    """
 
-        pitch = map_value(elevations[i], min_parkrun_elevation, max_parkrun_elevation, min_pitch, max_pitch)
-        pitches.append(pitch)
+    # Prompt user to select KML file
+    if kml_file_path is None:
+        kml_file_path = select_kml_file()
 
-        normalised_data = map_value(elevations[i], min(elevations), max(elevations), 0, 1)
-        graph_data.append(normalised_data)
+    if not kml_file_path:
+        print(f"{error_msg} No file selected.")
+        return
+
+    # Extract and process the route, reporting any problems with the file
+    try:
+        result = process_route(kml_file_path, elevation_backend, cache, simplification, parameters)
+    except ValueError as e:
+        print(f'{error_msg} {e}, please re-run the program and select another KML file')
+        return
+
+    print(f"Successfully extracted {GREEN}{result['name']}{RESET}'s coordinates!")
+    print(f"Total distance covered: {result['total_distance']:.4f} km")
+    print(f"Resolution: {result['resolution_in_m']:.4g} m per point ({len(result['pitches'])} points)")
+
+    if 'points_dropped' in result:
+        print(f"Simplification dropped {result['points_dropped']} points, "
+              f"changing the route's length by {result['simplification_distance_error']:.2f} m")
+
+    # Plot to see the data in line graph form
+    if show_graph == True:
+        plot_graph(result['distances'], 'Distance (km)', result['elevations'], 'Elevation (m)')
 
     # Write the data to text files in the pd/inputs directory
-    write_to_file(rates, 'rates')
-    write_to_file(pitches, 'pitches')
-    write_to_file(graph_data, 'graph_data')
-    write_to_file(parkrun_name, 'parkrun_name')
+    write_outputs(result, output_dir, table_format)
 
     # Print success message
     print(f'{success_msg}\nOpen elevation_MAIN.pd to hear the result.')
@@ -0,0 +1,222 @@
+"""
+Module name: Elevation Memo
+
+Description: A memo of elevations keyed on the cells of the DEM's grid, for routes which loop or are run again and again.
+
+Laps, out-and-back sections and the same parkrun processed week after week look up the same few thousand grid cells
+over and over. ElevationMemo wraps an elevation backend and quantizes each coordinate to the cell of the grid post the
+backend would read, on the backend's native grid (its `arc_seconds`: SRTM3 has a post every 3 arc-seconds, about 90 m
+north-south, and SRTM1 every arc-second). Coarser grids nest in finer ones, so a directory mixing SRTM1 and SRTM3 tiles
+is memoized on the SRTM1 grid. Within a route, the cells are
+de-duplicated with np.unique, and only the cells not already in the memo are looked up. The memo is kept for the life of
+the process, so it is shared by every route a batch worker processes, and can be saved to a .npz file between runs.
+
+For nearest-post sampling (SRTMBackend, and HGTTileStore by default) the memo returns exactly what the backend would.
+For bilinear interpolation, or a grid other than the backend's, each point gets the elevation of its nearest post on the
+memo's grid, so the memo is given a different name and results cached with and without it are kept apart.
+
+Long-lived processes save the memo with `checkpoint`, which rewrites the file at most every DEFAULT_SAVE_INTERVAL seconds.
+
+Usage:
+    TRAILSONG_ELEVATION_MEMO=~/.trailsong_memo.npz python elevation_MAIN.py
+    python batch_MAIN.py ../example_data/elevation -o ../batch_output --elevation-memo ~/.trailsong_memo.npz
+
+Classes:
+    - ElevationMemo(backend, memo_file, arc_seconds): Elevation backend which memoizes another backend by grid cell.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import os
+import time
+import numpy as np
+from data_processing import write_atomically
+
+# Resolution of the grid the memo is keyed on, in arc-seconds, for backends which do not give their own `arc_seconds`.
+# SRTM3 is the resolution available worldwide
+DEFAULT_ARC_SECONDS = 3
+
+# Shortest time between the saves made by `ElevationMemo.checkpoint`, in seconds
+DEFAULT_SAVE_INTERVAL = 30.0
+
+class ElevationMemo:
+    """
+    Elevation backend which memoizes another backend by the grid cell of each coordinate.
+
+    Args:
+        backend (object): The elevation backend to memoize, e.g. an SRTMBackend or HGTTileStore.
+        memo_file (str): If given, a .npz file the memo is loaded from, and saved to by `save`.
+        arc_seconds (int): The spacing of the grid's posts. Defaults to the backend's `arc_seconds`, or
+            DEFAULT_ARC_SECONDS if it has none.
+    """
+
+    def __init__(self, backend, memo_file=None, arc_seconds=None):
+        native_arc_seconds = getattr(backend, 'arc_seconds', DEFAULT_ARC_SECONDS)
+        arc_seconds = arc_seconds or native_arc_seconds
+
+        self.backend = backend
+        self.memo_file = memo_file
+        self.arc_seconds = arc_seconds
+        self.posts_per_degree = 3600 // arc_seconds
+
+        # SRTM.py reads the post north-west of each point, and HGTTileStore the nearest post. Either is reproduced
+        # exactly on the backend's grid, or any finer grid it nests in
+        interpolation = getattr(backend, 'interpolation', 'nearest')
+        self.floor = interpolation == 'floor'
+        self.exact = interpolation in ('floor', 'nearest') and native_arc_seconds % arc_seconds == 0
+        self.name = backend.name if self.exact and arc_seconds == native_arc_seconds else f'{backend.name}:memo{arc_seconds}'
+
+        # The cells looked up so far, sorted by key, and their elevations
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float32)
+        self.dirty = False
+        self.last_saved = time.monotonic()
+
+        self.points = 0
+        self.hits = 0
+        self.misses = 0
+
+        if memo_file is not None:
+            self.load()
+            self.dirty = False
+
+    def cell_keys(self, lats, lons):
+        """
+        Returns the key of the grid cell each coordinate is in.
+
+        Args:
+            lats (np.ndarray): The latitudes of the coordinates.
+            lons (np.ndarray): The longitudes of the coordinates.
+
+        Returns:
+            np.ndarray: An int64 key per coordinate, numbering the posts row by row from the north-west corner of the globe.
+        """
+        rounding = np.floor if self.floor else np.rint
+        rows = rounding((90 - lats) * self.posts_per_degree).astype(np.int64)
+        columns = rounding((lons + 180) * self.posts_per_degree).astype(np.int64)
+
+        return rows * (360 * self.posts_per_degree + 1) + columns
+
+    def _cell_coordinates(self, keys):
+        """
+        Returns the coordinates to look each cell up at: its post, or the middle of its cell when sampling rounds down.
+        """
+        rows, columns = np.divmod(keys, 360 * self.posts_per_degree + 1)
+        offset = 0.5 if self.floor else 0
+
+        return 90 - (rows + offset) / self.posts_per_degree, (columns + offset) / self.posts_per_degree - 180
+
+    def get_elevations(self, lats, lons):
+        """
+        Gets the elevations of many coordinates, only asking the backend for cells which are not in the memo yet.
+
+        Args:
+            lats (list or np.ndarray): The latitudes of the coordinates.
+            lons (list or np.ndarray): The longitudes of the coordinates.
+
+        Returns:
+            np.ndarray: The elevations in metres, with NaN where no data is available.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+
+        cells, cell_index = np.unique(self.cell_keys(lats.ravel(), lons.ravel()), return_inverse=True)
+
+        # Find the cells already in the memo
+        positions = np.searchsorted(self.keys, cells)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == cells[found]
+
+        elevations = np.empty(len(cells))
+        elevations[found] = self.values[positions[found]]
+
+        missing = cells[~found]
+        if len(missing):
+            elevations[~found] = self.backend.get_elevations(*self._cell_coordinates(missing))
+            self._insert(missing, elevations[~found])
+
+        self.points += lats.size
+        self.hits += int(found.sum())
+        self.misses += len(missing)
+
+        return elevations[cell_index].reshape(lats.shape)
+
+    def _insert(self, keys, values):
+        """
+        Adds sorted cells which are not in the memo yet. Cells without data are left out, so they are retried next time.
+        """
+        valid = ~np.isnan(values)
+        if not valid.any():
+            return
+
+        keys = keys[valid]
+        positions = np.searchsorted(self.keys, keys)
+        self.keys = np.insert(self.keys, positions, keys)
+        self.values = np.insert(self.values, positions, values[valid].astype(np.float32))
+        self.dirty = True
+
+    def load(self):
+        """
+        Adds the cells saved in the memo file to the memo. Files saved for another backend or grid are ignored.
+        """
+        try:
+            with np.load(self.memo_file) as saved:
+                if str(saved['name']) != self.name or int(saved['posts_per_degree']) != self.posts_per_degree:
+                    return
+                keys, values = saved['keys'], saved['values']
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            return
+
+        new = ~np.isin(keys, self.keys)
+        order = np.argsort(keys[new])
+        self._insert(keys[new][order], values[new][order].astype(float))
+
+    def save(self):
+        """
+        Saves the memo to its memo file, if it has cells the file does not.
+
+        Cells saved by other processes since the file was loaded are merged in first, so several batch workers can
+        share one file. The file is replaced atomically, so a reader never sees a partly written memo.
+        """
+        if self.memo_file is None or not self.dirty:
+            return
+
+        self.load()
+
+        directory = os.path.dirname(os.path.abspath(self.memo_file))
+        os.makedirs(directory, exist_ok=True)
+
+        write_atomically(self.memo_file, lambda f: np.savez(f, name=self.name, posts_per_degree=self.posts_per_degree,
+                                                            keys=self.keys, values=self.values))
+
+        self.dirty = False
+        self.last_saved = time.monotonic()
+
+    def checkpoint(self, interval=DEFAULT_SAVE_INTERVAL):
+        """
+        Saves the memo if it was last saved at least `interval` seconds ago, so a process which handles many routes can
+        save it now and then rather than rewriting the file after every route.
+        """
+        if time.monotonic() - self.last_saved >= interval:
+            self.save()
+
+    def info(self):
+        """
+        Reports how much work the memo has saved.
+
+        Returns:
+            dict: The number of 'points' looked up, the 'hits' and 'misses' of the distinct cells of each lookup, the
+            'hit_rate' of those cells, the fraction of point lookups which never reached the backend ('saved_rate'),
+            and the number of 'cells' in the memo.
+        """
+        cells_looked_up = self.hits + self.misses
+
+        return {
+            'points': self.points,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / cells_looked_up if cells_looked_up else 0.0,
+            'saved_rate': 1 - self.misses / self.points if self.points else 0.0,
+            'cells': len(self.keys),
+        }
@@ -3,15 +3,56 @@ Module name: Geo Processing
 
 Description: Utility functions to retreive the elevation of the given coordinates and calculate the distance between two points.
 
+Functions:
+    - get_srtm_elevation(lat, lon): Gets the elevation of a single coordinate.
+    - get_srtm_elevations(lats, lons): Gets the elevations of many coordinates in one batched lookup.
+    - srtm_cache_info(): Reports the hit/miss counts of the process-wide SRTM tile cache.
+    - clear_srtm_cache(): Drops the shared SRTM handle and all decoded tiles.
+    - get_elevation_backend(): Returns the elevation backend used by default.
+    - set_elevation_backend(backend): Sets the elevation backend used by default.
+    - get_elevations(lats, lons, backend): Gets the elevations of many coordinates from an elevation backend.
+    - fill_elevations(route, backend): Fills in the elevations of a route_processing.Route in place.
+    - calculate_distance(coords1, coords2): Calculates the distance between two sets of coordinates.
+    - calculate_distances(lats, lons, method): Calculates all segment lengths and the cumulative distance along a track.
+    - fill_distances(route, method): Fills in the cumulative distances of a route_processing.Route in place.
+
+Elevation backends are objects with a `name` and a `get_elevations(lats, lons)` method returning a NumPy array.
+SRTMBackend (SRTM.py, which downloads tiles on demand) is the default, unless the TRAILSONG_HGT_DIR environment variable
+points to a local directory of .hgt tiles, in which case hgt_processing.HGTTileStore is used and no network is needed.
+Setting TRAILSONG_ELEVATION_MEMO to a file memoizes the default backend's lookups between runs (see elevation_memo).
+
+SRTM.py (which pulls in requests) and geopy are only imported when they are first used, to keep start-up fast.
+
 Author: George Caselton
-Last updated: 18/08/2024
+Last updated: 17/10/2026
 """
 
-import srtm
-from geopy.distance import geodesic
+import os
+import numpy as np
+
+# Process-wide SRTM state, shared by every batched lookup
+_srtm_data = None
+_decoded_tiles = {}
+_srtm_cache_stats = {'hits': 0, 'misses': 0}
+
+# Elevation backend used when none is given, created on first use
+_elevation_backend = None
+
+# Mean Earth radius in kilometres, as used by geopy
+EARTH_RADIUS = 6371.009
+
+# WGS84 ellipsoid, in metres
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+# Methods accepted by calculate_distances, from fastest to most accurate
+DISTANCE_METHODS = ('equirectangular', 'haversine', 'vincenty')
 
 # Function to get elevation from SRTM data
 def get_srtm_elevation(lat, lon):
+    import srtm
+
     # Load SRTM data
     srtm_data = srtm.get_data()
     
@@ -20,6 +61,298 @@ def get_srtm_elevation(lat, lon):
     
     return elevation
 
+def _get_srtm_data():
+    """
+    Returns the shared SRTM elevation-data handle, creating it on first use.
+    """
+    global _srtm_data
+    if _srtm_data is None:
+        import srtm
+        _srtm_data = srtm.get_data()
+    return _srtm_data
+
+def _get_decoded_tile(tile_lat, tile_lon):
+    """
+    Returns the decoded elevation grid of the 1x1 degree tile whose south-west corner is (tile_lat, tile_lon).
+
+    Tiles are decoded from the raw big-endian .hgt bytes once and then kept for the lifetime of the process.
+    Returns None if SRTM has no tile for this location.
+    """
+    key = (tile_lat, tile_lon)
+    if key in _decoded_tiles:
+        _srtm_cache_stats['hits'] += 1
+        return _decoded_tiles[key]
+
+    _srtm_cache_stats['misses'] += 1
+
+    # SRTM names tiles after the floor of the coordinates, so the south-west corner is inside its own tile
+    srtm_file = _get_srtm_data().get_file(tile_lat, tile_lon)
+    if srtm_file is None:
+        grid = None
+    else:
+        side = srtm_file.square_side
+        grid = np.frombuffer(srtm_file.data, dtype='>i2').reshape(side, side)
+
+    _decoded_tiles[key] = grid
+    return grid
+
+def get_srtm_elevations(lats, lons):
+    """
+    Gets the SRTM elevations of many coordinates at once.
+
+    Coordinates are grouped by SRTM tile so that each tile is fetched and decoded only once, and the elevations
+    are then read from the decoded grids with array indexing. The grid sampling is the same as in
+    `get_srtm_elevation`, so the results are identical.
+
+    Args:
+        lats (list or np.ndarray): The latitudes of the coordinates.
+        lons (list or np.ndarray): The longitudes of the coordinates.
+
+    Returns:
+        np.ndarray: The elevations in metres, with NaN where no SRTM data is available.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    elevations = np.full(lats.shape, np.nan)
+
+    # Group the coordinates by the tile they fall in
+    tile_corners = np.stack([np.floor(lats), np.floor(lons)], axis=-1).reshape(-1, 2).astype(int)
+    tiles, tile_index = np.unique(tile_corners, axis=0, return_inverse=True)
+    tile_index = tile_index.reshape(lats.shape)
+
+    for i, (tile_lat, tile_lon) in enumerate(tiles):
+        grid = _get_decoded_tile(int(tile_lat), int(tile_lon))
+        if grid is None:
+            continue
+
+        in_tile = tile_index == i
+        side = grid.shape[0]
+
+        # Same row and column calculation as SRTM.py's GeoElevationFile.get_row_and_column
+        rows = np.floor((tile_lat + 1 - lats[in_tile]) * float(side - 1)).astype(int)
+        columns = np.floor((lons[in_tile] - tile_lon) * float(side - 1)).astype(int)
+
+        values = grid[rows, columns].astype(float)
+
+        # SRTM.py treats values outside this range as voids
+        values[(values > 10000) | (values < -1000)] = np.nan
+        elevations[in_tile] = values
+
+    return elevations
+
+def srtm_cache_info():
+    """
+    Reports the state of the process-wide SRTM tile cache.
+
+    Returns:
+        dict: The number of tile hits and misses, and the number of tiles currently held in memory.
+    """
+    return {**_srtm_cache_stats, 'tiles': len(_decoded_tiles)}
+
+def clear_srtm_cache():
+    """
+    Drops the shared SRTM handle and all decoded tiles, and resets the hit/miss counts.
+    """
+    global _srtm_data
+    _srtm_data = None
+    _decoded_tiles.clear()
+    _srtm_cache_stats['hits'] = 0
+    _srtm_cache_stats['misses'] = 0
+
+class SRTMBackend:
+    """
+    Elevation backend which uses SRTM.py through the process-wide tile cache.
+    """
+
+    name = 'srtm'
+
+    # SRTM.py reads the post at the north-west corner of the grid cell each point is in
+    interpolation = 'floor'
+
+    # SRTM.py uses SRTM1 tiles where they exist (the US) and SRTM3 elsewhere, whose cells are made of SRTM1's
+    arc_seconds = 1
+
+    def get_elevations(self, lats, lons):
+        return get_srtm_elevations(lats, lons)
+
+def get_elevation_backend():
+    """
+    Returns the elevation backend used when none is given, creating it on first use.
+
+    Returns:
+        object: An HGTTileStore if the TRAILSONG_HGT_DIR environment variable is set, otherwise an SRTMBackend. If the
+        TRAILSONG_ELEVATION_MEMO environment variable is set, the backend is wrapped in an ElevationMemo which is loaded
+        from and saved to that file.
+    """
+    global _elevation_backend
+    if _elevation_backend is None:
+        hgt_directory = os.environ.get('TRAILSONG_HGT_DIR')
+        if hgt_directory:
+            from hgt_processing import HGTTileStore
+            _elevation_backend = HGTTileStore(hgt_directory)
+        else:
+            _elevation_backend = SRTMBackend()
+
+        memo_file = os.environ.get('TRAILSONG_ELEVATION_MEMO')
+        if memo_file:
+            import atexit
+            from elevation_memo import ElevationMemo
+            _elevation_backend = ElevationMemo(_elevation_backend, memo_file)
+            atexit.register(_elevation_backend.save)
+    return _elevation_backend
+
+def set_elevation_backend(backend):
+    """
+    Sets the elevation backend used when none is given. Passing None restores the default.
+
+    Args:
+        backend (object): An object with a `get_elevations(lats, lons)` method, e.g. an SRTMBackend or HGTTileStore.
+    """
+    global _elevation_backend
+    _elevation_backend = backend
+
+def get_elevations(lats, lons, backend=None):
+    """
+    Gets the elevations of many coordinates from an elevation backend.
+
+    Args:
+        lats (list or np.ndarray): The latitudes of the coordinates.
+        lons (list or np.ndarray): The longitudes of the coordinates.
+        backend (object): The elevation backend to use. Defaults to `get_elevation_backend()`.
+
+    Returns:
+        np.ndarray: The elevations in metres, with NaN where no data is available.
+    """
+    if backend is None:
+        backend = get_elevation_backend()
+    return backend.get_elevations(lats, lons)
+
+def fill_elevations(route, backend=None):
+    """
+    Looks up the elevation of every point of a route in one batch, and writes them into its 'ele' column.
+
+    Args:
+        route (route_processing.Route): The route.
+        backend (object): The elevation backend to use. Defaults to `get_elevation_backend()`.
+
+    Returns:
+        route_processing.Route: The same route.
+    """
+    route.elevations[:] = get_elevations(route.lats, route.lons, backend)
+    return route
+
 # Function which calculates the distance between two sets of coordinates
 def calculate_distance(coords1, coords2):
+    from geopy.distance import geodesic
     return geodesic(coords1, coords2).kilometers
+
+def calculate_distances(lats, lons, method='vincenty'):
+    """
+    Calculates the length of every segment of a track, and the cumulative distance covered, in one vectorized pass.
+
+    The available methods trade accuracy for speed. Compared to geopy's geodesic (Karney's algorithm on WGS84):
+        - 'equirectangular': a flat approximation on a sphere. Within 0.6% for segments up to 10 km below 80 degrees latitude.
+        - 'haversine': great-circle distance on a sphere. Within 0.6% for any segment.
+        - 'vincenty': Vincenty's inverse formula on WGS84. Within 1 mm for any segment; the rare nearly-antipodal pairs
+          for which it does not converge fall back to geopy.
+
+    Args:
+        lats (list or np.ndarray): The latitudes of the track's points.
+        lons (list or np.ndarray): The longitudes of the track's points.
+        method (str): One of 'equirectangular', 'haversine' or 'vincenty'.
+
+    Returns:
+        tuple: Two numpy ndarrays, the segment lengths (one fewer than the number of points) and the cumulative
+        distance at each point (starting at 0), both in kilometres.
+    """
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+
+    lat1, lat2 = lats[:-1], lats[1:]
+    lon_deltas = lons[1:] - lons[:-1]
+
+    if method == 'equirectangular':
+        x = lon_deltas * np.cos((lat1 + lat2) / 2)
+        y = lat2 - lat1
+        segments = EARTH_RADIUS * np.hypot(x, y)
+    elif method == 'haversine':
+        h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(lon_deltas / 2) ** 2
+        segments = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+    elif method == 'vincenty':
+        segments = _vincenty_distances(lat1, lat2, lon_deltas)
+    else:
+        raise ValueError(f'Invalid distance method: {method}')
+
+    cumulative = np.concatenate(([0.0], np.cumsum(segments)))
+    return segments, cumulative
+
+def fill_distances(route, method='vincenty'):
+    """
+    Calculates the cumulative distance along a route, and writes it into its 'dist' column.
+
+    Args:
+        route (route_processing.Route): The route.
+        method (str): One of 'equirectangular', 'haversine' or 'vincenty' (see `calculate_distances`).
+
+    Returns:
+        route_processing.Route: The same route.
+    """
+    if len(route):
+        segments, _ = calculate_distances(route.lats, route.lons, method)
+        route.distances[0] = 0.0
+        np.cumsum(segments, out=route.distances[1:])
+    return route
+
+def _vincenty_distances(lat1, lat2, lon_deltas, max_iterations=200, tolerance=1e-12):
+    """
+    Vectorized Vincenty inverse formula on the WGS84 ellipsoid. Angles are in radians and distances are returned in kilometres.
+    """
+    # Wrap longitude differences into [-pi, pi]
+    L = (lon_deltas + np.pi) % (2 * np.pi) - np.pi
+
+    U1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sin_U1, cos_U1 = np.sin(U1), np.cos(U1)
+    sin_U2, cos_U2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Iterate every pair together; converged pairs simply stop changing
+        for _ in range(max_iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_U2 * sin_lam, cos_U1 * sin_U2 - sin_U1 * cos_U2 * cos_lam)
+            cos_sigma = sin_U1 * sin_U2 + cos_U1 * cos_U2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_U1 * cos_U2 * sin_lam / sin_sigma)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+
+            # Lines along the equator have cos_sq_alpha = 0
+            cos_2sigma_m = np.where(cos_sq_alpha == 0, 0.0, cos_sigma - 2 * sin_U1 * sin_U2 / cos_sq_alpha)
+
+            C = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            lam_previous = lam
+            lam = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+
+            converged = np.abs(lam - lam_previous) < tolerance
+            if converged.all():
+                break
+
+    u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+
+    distances = WGS84_B * A * (sigma - delta_sigma) / 1000
+
+    # Nearly-antipodal pairs may not converge, so those are calculated with geopy's geodesic instead
+    for i in np.flatnonzero(~converged | ~np.isfinite(distances)):
+        coords1 = (np.degrees(lat1[i]), 0.0)
+        coords2 = (np.degrees(lat2[i]), np.degrees(L[i]))
+        distances[i] = calculate_distance(coords1, coords2)
+
+    return distances
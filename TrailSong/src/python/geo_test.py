@@ -5,20 +5,27 @@ Description: Unit tests for the `geo_processing` module.
 
 Tests include:
 - `get_srtm_elevation`: Verifies elevation retrieval from mocked SRTM data.
+- `get_srtm_elevations`: Verifies batched elevation lookups match SRTM.py and reuse cached tiles.
+- `get_elevations`: Checks that lookups are sent to the chosen elevation backend.
 - `calculate_distance`: Checks distance calculation between two coordinates.
+- `calculate_distances`: Checks the documented error bounds of each vectorized distance method against geopy.
 
 Tests use `unittest` and `unittest.mock` to isolate functionality.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
-Test status as of 18/08/2024: PASS
+Test status as of 17/10/2026: PASS
 
 """
 
 import unittest
 from unittest.mock import MagicMock, patch
-from geo_processing import get_srtm_elevation, calculate_distance
+import numpy as np
+from srtm.data import GeoElevationFile
+from geo_processing import get_srtm_elevation, get_srtm_elevations, srtm_cache_info, clear_srtm_cache, calculate_distance
+from geo_processing import get_elevations, set_elevation_backend, calculate_distances
+from geopy.distance import geodesic
 
 class TestGeoProcessing(unittest.TestCase):
     
@@ -40,6 +47,43 @@ class TestGeoProcessing(unittest.TestCase):
         mock_srtm_data.get_elevation.assert_called_once_with(lat, lon)
         self.assertAlmostEqual(elevation, known_elevation, delta=5.0) # Delta allows some deviation
 
+    @patch('srtm.get_data')
+    def test_get_srtm_elevations(self, mock_get_data):
+        clear_srtm_cache()
+
+        # A small synthetic tile, so results can be checked against SRTM.py's own per-point lookup
+        grid = (np.arange(121).reshape(11, 11) * 10).astype('>i2')
+        tile = GeoElevationFile('N54W002.hgt', grid.tobytes(), MagicMock())
+        mock_get_data.return_value.get_file.return_value = tile
+
+        lats = np.array([54.05, 54.5, 54.99, 54.31])
+        lons = np.array([-1.95, -1.5, -1.01, -1.77])
+        elevations = get_srtm_elevations(lats, lons)
+
+        expected = [tile.get_elevation(lat, lon) for lat, lon in zip(lats, lons)]
+        np.testing.assert_array_equal(elevations, expected)
+
+        # A second batch on the same tile should be served from the cache
+        get_srtm_elevations(lats, lons)
+        mock_get_data.assert_called_once()
+        self.assertEqual(srtm_cache_info(), {'hits': 1, 'misses': 1, 'tiles': 1})
+
+        clear_srtm_cache()
+
+    def test_get_elevations(self):
+        # Backends only need a get_elevations method
+        backend = MagicMock()
+        backend.get_elevations.return_value = np.array([12.0, 34.0])
+
+        set_elevation_backend(backend)
+        try:
+            elevations = get_elevations([54.1, 54.2], [-1.1, -1.2])
+        finally:
+            set_elevation_backend(None)
+
+        backend.get_elevations.assert_called_once_with([54.1, 54.2], [-1.1, -1.2])
+        np.testing.assert_array_equal(elevations, [12.0, 34.0])
+
     def test_calculate_distance(self):
 
         # Test coordinates of London and Paris
@@ -53,5 +97,39 @@ class TestGeoProcessing(unittest.TestCase):
         expected_distance = 343.0
         self.assertAlmostEqual(distance, expected_distance, delta=5.0)  # Allowing some deviation
 
+    def test_calculate_distances(self):
+
+        rng = np.random.default_rng(0)
+
+        # A random-walk track of segments up to about 10 km, and widely spread points for long segments
+        short_lats = np.clip(np.cumsum(rng.normal(0, 0.03, 300)) + 50, -79, 79)
+        short_lons = np.cumsum(rng.normal(0, 0.03, 300))
+        long_lats = rng.uniform(-80, 80, 300)
+        long_lons = rng.uniform(-180, 180, 300)
+
+        # Maximum relative errors documented in calculate_distances
+        bounds = {'equirectangular': 0.006, 'haversine': 0.006, 'vincenty': 1e-9}
+
+        for lats, lons, methods in [(short_lats, short_lons, bounds), (long_lats, long_lons, ['haversine', 'vincenty'])]:
+            expected = np.array([geodesic((lats[i], lons[i]), (lats[i + 1], lons[i + 1])).kilometers for i in range(len(lats) - 1)])
+
+            for method in methods:
+                segments, cumulative = calculate_distances(lats, lons, method)
+
+                np.testing.assert_allclose(segments, expected, rtol=bounds[method], atol=1e-6, err_msg=method)
+                np.testing.assert_allclose(cumulative, np.concatenate(([0], np.cumsum(segments))))
+
+            # Vincenty is within 1 mm of geopy, however long the segment
+            segments, _ = calculate_distances(lats, lons, 'vincenty')
+            np.testing.assert_allclose(segments, expected, rtol=0, atol=1e-6)
+
+        # Vincenty should be within 1 mm of geopy, even for nearly-antipodal points where it falls back
+        segments, _ = calculate_distances([51.5074, 48.8566, -48.9], [-0.1278, 2.3522, -177.6])
+        self.assertAlmostEqual(segments[0], calculate_distance((51.5074, -0.1278), (48.8566, 2.3522)), delta=1e-6)
+        self.assertAlmostEqual(segments[1], calculate_distance((48.8566, 2.3522), (-48.9, -177.6)), delta=1e-6)
+
+        with self.assertRaises(ValueError):
+            calculate_distances([0, 1], [0, 1], method='flat')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,212 @@
+"""
+Module name: HGT Processing
+
+Description: An offline elevation backend which reads SRTM .hgt tiles from a local directory.
+
+Tiles are opened with numpy.memmap the first time they are needed and then shared between all lookups made
+through the same store, so only the pages of a tile which are actually sampled are read from disk. Both SRTM1
+(1 arc-second, 3601x3601) and SRTM3 (3 arc-second, 1201x1201) tiles are supported, and can be mixed in one directory.
+
+Classes:
+    - HGTTileStore(directory, interpolation): Vectorized nearest or bilinear elevation sampling from local tiles.
+
+Functions:
+    - tile_file_name(lat, lon): Returns the SRTM file name of the tile containing a coordinate.
+    - write_synthetic_tile(directory, lat, lon, arc_seconds, elevation_function): Writes a generated .hgt tile, for testing.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import os
+import numpy as np
+
+# Number of posts along each side of a tile for each SRTM resolution (in arc-seconds)
+TILE_SIDES = {1: 3601, 3: 1201}
+
+# Value used by SRTM to mark missing data
+VOID_VALUE = -32768
+
+def tile_file_name(lat, lon):
+    """
+    Returns the SRTM file name of the tile containing the given coordinates, e.g. 'N54W002.hgt'.
+
+    Args:
+        lat (float): The latitude of the coordinate.
+        lon (float): The longitude of the coordinate.
+
+    Returns:
+        str: The tile's file name.
+    """
+    tile_lat = int(np.floor(lat))
+    tile_lon = int(np.floor(lon))
+
+    north_south = 'N' if tile_lat >= 0 else 'S'
+    east_west = 'E' if tile_lon >= 0 else 'W'
+
+    return f'{north_south}{abs(tile_lat):02d}{east_west}{abs(tile_lon):03d}.hgt'
+
+class HGTTileStore:
+    """
+    An elevation backend which samples SRTM .hgt tiles from a local directory, with no network access.
+
+    Args:
+        directory (str): The directory containing the .hgt tiles.
+        interpolation (str): Either 'nearest' to use the closest post, or 'bilinear' to interpolate between the four surrounding posts.
+    """
+
+    def __init__(self, directory, interpolation='nearest'):
+        if interpolation not in {'nearest', 'bilinear'}:
+            raise ValueError(f'Invalid interpolation: {interpolation}')
+
+        self.directory = directory
+        self.interpolation = interpolation
+        self.name = f'hgt:{os.path.abspath(directory)}:{interpolation}'
+        self.arc_seconds = self._finest_resolution()
+
+        # Memory-mapped tiles, keyed by the (lat, lon) of their south-west corner. None marks a missing tile.
+        self.tiles = {}
+
+    def _finest_resolution(self):
+        """
+        Returns the spacing of the posts of the finest tiles in the directory, in arc-seconds, e.g. for the grid of an
+        elevation_memo.ElevationMemo. The posts of coarser tiles are also posts of the finer grid.
+        """
+        sides = set()
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.lower().endswith('.hgt'):
+                    sides.add(int(round(np.sqrt(entry.stat().st_size / 2))))
+
+        resolutions = [arc_seconds for arc_seconds, side in TILE_SIDES.items() if side in sides]
+        return min(resolutions, default=max(TILE_SIDES))
+
+    def get_tile(self, tile_lat, tile_lon):
+        """
+        Returns the memory-mapped grid of the tile whose south-west corner is (tile_lat, tile_lon), opening it on first use.
+
+        Returns:
+            np.memmap: The tile's elevation posts, with row 0 at the northern edge, or None if the tile is not in the directory.
+        """
+        key = (tile_lat, tile_lon)
+        if key in self.tiles:
+            return self.tiles[key]
+
+        tile = None
+        file_path = os.path.join(self.directory, tile_file_name(tile_lat, tile_lon))
+
+        if os.path.exists(file_path):
+            # The resolution of the tile is inferred from its size
+            side = int(round(np.sqrt(os.path.getsize(file_path) / 2)))
+            if side not in TILE_SIDES.values():
+                raise ValueError(f'Invalid tile size for {file_path}')
+
+            tile = np.memmap(file_path, dtype='>i2', mode='r', shape=(side, side))
+
+        self.tiles[key] = tile
+        return tile
+
+    def get_elevations(self, lats, lons):
+        """
+        Gets the elevations of many coordinates at once.
+
+        Args:
+            lats (list or np.ndarray): The latitudes of the coordinates.
+            lons (list or np.ndarray): The longitudes of the coordinates.
+
+        Returns:
+            np.ndarray: The elevations in metres, with NaN where there is no tile or the data is void.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        elevations = np.full(lats.shape, np.nan)
+
+        # Group the coordinates by the tile they fall in
+        tile_corners = np.stack([np.floor(lats), np.floor(lons)], axis=-1).reshape(-1, 2).astype(int)
+        tiles, tile_index = np.unique(tile_corners, axis=0, return_inverse=True)
+        tile_index = tile_index.reshape(lats.shape)
+
+        for i, (tile_lat, tile_lon) in enumerate(tiles):
+            tile = self.get_tile(int(tile_lat), int(tile_lon))
+            if tile is None:
+                continue
+
+            in_tile = tile_index == i
+            side = tile.shape[0]
+
+            # Fractional row and column of each coordinate within the tile's grid of posts
+            rows = (tile_lat + 1 - lats[in_tile]) * (side - 1)
+            columns = (lons[in_tile] - tile_lon) * (side - 1)
+
+            if self.interpolation == 'nearest':
+                values = self._sample_nearest(tile, rows, columns)
+            else:
+                values = self._sample_bilinear(tile, rows, columns)
+
+            elevations[in_tile] = values
+
+        return elevations
+
+    @staticmethod
+    def _sample_nearest(tile, rows, columns):
+        """
+        Returns the value of the closest post to each fractional row and column.
+        """
+        side = tile.shape[0]
+        rows = np.clip(np.rint(rows).astype(int), 0, side - 1)
+        columns = np.clip(np.rint(columns).astype(int), 0, side - 1)
+
+        values = tile[rows, columns].astype(float)
+        values[values == VOID_VALUE] = np.nan
+        return values
+
+    @staticmethod
+    def _sample_bilinear(tile, rows, columns):
+        """
+        Interpolates between the four posts surrounding each fractional row and column.
+        """
+        side = tile.shape[0]
+
+        # The top-left post of each cell, kept one away from the edge so its neighbours are inside the tile
+        top = np.clip(np.floor(rows).astype(int), 0, side - 2)
+        left = np.clip(np.floor(columns).astype(int), 0, side - 2)
+        row_weight = np.clip(rows - top, 0, 1)
+        column_weight = np.clip(columns - left, 0, 1)
+
+        corners = np.stack([tile[top, left], tile[top, left + 1], tile[top + 1, left], tile[top + 1, left + 1]]).astype(float)
+        corners[corners == VOID_VALUE] = np.nan
+
+        upper = corners[0] * (1 - column_weight) + corners[1] * column_weight
+        lower = corners[2] * (1 - column_weight) + corners[3] * column_weight
+        return upper * (1 - row_weight) + lower * row_weight
+
+def write_synthetic_tile(directory, lat, lon, arc_seconds=3, elevation_function=None):
+    """
+    Writes a generated .hgt tile, so the offline backend can be tested without downloading any SRTM data.
+
+    Args:
+        directory (str): The directory to write the tile to.
+        lat (int): The latitude of the tile's south-west corner.
+        lon (int): The longitude of the tile's south-west corner.
+        arc_seconds (int): The resolution of the tile, either 1 (SRTM1) or 3 (SRTM3).
+        elevation_function (callable): Takes arrays of latitudes and longitudes and returns elevations in metres.
+            Defaults to gently rolling hills between roughly 0 and 200 m.
+
+    Returns:
+        str: The path of the written tile.
+    """
+    if elevation_function is None:
+        elevation_function = lambda lats, lons: 100 + 60 * np.sin(lats * 40) + 40 * np.cos(lons * 30)
+
+    side = TILE_SIDES[arc_seconds]
+
+    # Row 0 is the northern edge of the tile and column 0 the western edge
+    post_lats = lat + 1 - np.arange(side) / (side - 1)
+    post_lons = lon + np.arange(side) / (side - 1)
+    elevations = np.broadcast_to(elevation_function(post_lats[:, None], post_lons[None, :]), (side, side))
+
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, tile_file_name(lat, lon))
+    np.rint(elevations).astype('>i2').tofile(file_path)
+
+    return file_path
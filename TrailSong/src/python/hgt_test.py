@@ -0,0 +1,94 @@
+"""
+Module name: HGT Test
+
+Description: Unit tests for the `hgt_processing` module.
+
+Tests include:
+- `test_nearest_sampling`: Checks that nearest sampling returns the exact posts of SRTM1 and SRTM3 tiles.
+- `test_bilinear_sampling`: Checks that bilinear sampling interpolates between posts, including across tiles.
+- `test_missing_tile_and_voids`: Checks that missing tiles and void posts give NaN.
+- `test_tiles_opened_once`: Checks that each tile is memory-mapped once and shared between lookups.
+
+All tiles are synthetic and written to a temporary directory, so no SRTM data is downloaded.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from hgt_processing import HGTTileStore, tile_file_name, write_synthetic_tile, VOID_VALUE
+
+class TestHGTProcessing(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = self.temp_dir.name
+
+        # A plane rising to the north-east makes bilinear results easy to predict
+        self.plane = lambda lats, lons: (lats - 54) * 1000 + (lons + 2) * 500
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_tile_file_name(self):
+        self.assertEqual(tile_file_name(54.97, -1.6), 'N54W002.hgt')
+        self.assertEqual(tile_file_name(-33.9, 18.4), 'S34E018.hgt')
+
+    def test_nearest_sampling(self):
+        write_synthetic_tile(self.directory, 54, -2, arc_seconds=3, elevation_function=self.plane)
+        write_synthetic_tile(self.directory, 51, -1, arc_seconds=1, elevation_function=lambda lats, lons: (lats - 51) * 3600)
+        store = HGTTileStore(self.directory)
+
+        # Posts of the SRTM3 tile are 1/1200 of a degree apart
+        lats = 54 + np.array([0, 600, 1199]) / 1200
+        lons = -2 + np.array([0, 300, 1199]) / 1200
+        np.testing.assert_array_equal(store.get_elevations(lats, lons), np.rint(self.plane(lats, lons)))
+
+        # SRTM1 tiles are 3601 posts wide, and the nearest post is chosen
+        elevations = store.get_elevations([51 + 100.4 / 3600, 51 + 100.6 / 3600], [-0.5, -0.5])
+        np.testing.assert_array_equal(elevations, [100, 101])
+
+    def test_bilinear_sampling(self):
+        write_synthetic_tile(self.directory, 54, -2, elevation_function=self.plane)
+        write_synthetic_tile(self.directory, 54, -1, elevation_function=self.plane)
+        store = HGTTileStore(self.directory, interpolation='bilinear')
+
+        # Bilinear interpolation of a plane is exact, up to the rounding of posts to whole metres
+        lats = np.array([54.1234, 54.5, 54.9999, 54.0001])
+        lons = np.array([-1.8765, -1.0001, -0.5, -1.0])
+        np.testing.assert_allclose(store.get_elevations(lats, lons), self.plane(lats, lons), atol=0.5)
+
+    def test_missing_tile_and_voids(self):
+        elevation_function = lambda lats, lons: np.where(lats > 54.5, VOID_VALUE, 50)
+        write_synthetic_tile(self.directory, 54, -2, elevation_function=elevation_function)
+        store = HGTTileStore(self.directory)
+
+        elevations = store.get_elevations([54.2, 54.8, 10.0], [-1.5, -1.5, 10.0])
+        self.assertEqual(elevations[0], 50)
+        self.assertTrue(np.isnan(elevations[1]))
+        self.assertTrue(np.isnan(elevations[2]))
+
+    def test_tiles_opened_once(self):
+        write_synthetic_tile(self.directory, 54, -2)
+        store = HGTTileStore(self.directory)
+
+        store.get_elevations([54.1, 54.2], [-1.1, -1.2])
+        tile = store.tiles[(54, -2)]
+        store.get_elevations([54.3], [-1.3])
+
+        self.assertIsInstance(tile, np.memmap)
+        self.assertIs(store.tiles[(54, -2)], tile)
+        self.assertEqual(len(store.tiles), 1)
+
+    def test_invalid_interpolation(self):
+        with self.assertRaises(ValueError):
+            HGTTileStore(self.directory, interpolation='cubic')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Module name: Instrumentation
+
+Description: Opt-in per-stage timing and memory instrumentation for the pipelines.
+
+The pipelines wrap each of their stages in `with stage('name'):`. While instrumentation is disabled (the default),
+`stage` returns a shared no-op context manager, so it costs well under a microsecond per stage. Once enabled, each stage
+is recorded with its wall time, CPU time and tracemalloc peak memory, and the record is passed to a sink.
+
+A sink is any callable taking a record dict. ConsoleTableSink prints a table row per stage, and JSONLinesSink appends
+one JSON object per stage to a file. Instrumentation can also be enabled without any code changes by setting the
+TRAILSONG_INSTRUMENTATION environment variable to 'console', or to the path of a .jsonl file.
+
+Classes:
+    - ConsoleTableSink(): Prints each record as a row of a table.
+    - JSONLinesSink(file_path): Appends each record to a JSON lines file.
+
+Functions:
+    - stage(name): Context manager which records one stage, if instrumentation is enabled.
+    - enable_instrumentation(sink, track_memory): Starts recording stages and sending them to a sink.
+    - disable_instrumentation(): Stops recording stages.
+    - instrumentation_enabled(): Returns whether stages are being recorded.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Returned by stage() while instrumentation is disabled
+_NULL_STAGE = nullcontext()
+
+# The active recorder, or None while instrumentation is disabled
+_recorder = None
+
+class ConsoleTableSink:
+    """
+    Prints each stage record as a row of a table, with a header before the first row.
+    """
+
+    def __init__(self):
+        self.header_printed = False
+
+    def __call__(self, record):
+        if not self.header_printed:
+            print(f"{'stage':<24} {'wall (ms)':>10} {'cpu (ms)':>10} {'peak (MB)':>10}")
+            self.header_printed = True
+
+        peak = f"{record['peak_memory'] / 1e6:10.2f}" if record['peak_memory'] is not None else f"{'-':>10}"
+        print(f"{record['stage']:<24} {record['wall_time'] * 1000:10.2f} {record['cpu_time'] * 1000:10.2f} {peak}")
+
+class JSONLinesSink:
+    """
+    Appends each stage record to a file as one JSON object per line.
+
+    Args:
+        file_path (str): The file to append to.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def __call__(self, record):
+        # Opening in append mode for each record keeps lines whole when several processes share the file
+        with open(self.file_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+class _StageRecorder:
+    """
+    Records stages and sends them to a sink. Nested stages are supported, and an outer stage's peak memory includes
+    the peaks of the stages inside it.
+    """
+
+    def __init__(self, sink, track_memory):
+        self.sink = sink
+        self.track_memory = track_memory
+
+        # Peak traced memory seen so far by each open stage, innermost last
+        self.open_peaks = []
+
+        # tracemalloc is only stopped again by `close` if this recorder started it
+        self.started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    def close(self):
+        if self.started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.started_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        start_memory = None
+        if self.track_memory and tracemalloc.is_tracing():
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if self.open_peaks:
+                self.open_peaks[-1] = max(self.open_peaks[-1], peak_memory)
+            tracemalloc.reset_peak()
+            start_memory = current_memory
+            self.open_peaks.append(current_memory)
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.process_time() - start_cpu
+
+            peak_memory = None
+            if start_memory is not None:
+                stage_peak = max(self.open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                peak_memory = stage_peak - start_memory
+
+                # Let the enclosing stage see this stage's peak
+                if self.open_peaks:
+                    self.open_peaks[-1] = max(self.open_peaks[-1], stage_peak)
+                tracemalloc.reset_peak()
+
+            self.sink({
+                'stage': name,
+                'wall_time': wall_time,
+                'cpu_time': cpu_time,
+                'peak_memory': peak_memory,
+                'timestamp': time.time(),
+                'pid': os.getpid(),
+            })
+
+def stage(name):
+    """
+    Returns a context manager which records the code inside it as a named stage, if instrumentation is enabled.
+
+    Args:
+        name (str): The name of the stage, e.g. 'elevation.parse'.
+    """
+    if _recorder is None:
+        return _NULL_STAGE
+    return _recorder.stage(name)
+
+def enable_instrumentation(sink=None, track_memory=True):
+    """
+    Starts recording stages.
+
+    Args:
+        sink (callable): Called with a record dict for each stage, containing 'stage', 'wall_time' and 'cpu_time'
+            (seconds), 'peak_memory' (bytes above the memory in use when the stage started, or None), 'timestamp' and 'pid'.
+            Defaults to a ConsoleTableSink.
+        track_memory (bool): Whether to measure peak memory with tracemalloc, which slows down allocations.
+    """
+    global _recorder
+    disable_instrumentation()
+    _recorder = _StageRecorder(sink or ConsoleTableSink(), track_memory)
+
+def disable_instrumentation():
+    """
+    Stops recording stages, and stops tracemalloc if enabling instrumentation started it.
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = None
+
+def instrumentation_enabled():
+    """
+    Returns whether stages are being recorded.
+    """
+    return _recorder is not None
+
+def _enable_from_environment():
+    """
+    Enables instrumentation if the TRAILSONG_INSTRUMENTATION environment variable is set.
+    """
+    setting = os.environ.get('TRAILSONG_INSTRUMENTATION')
+    if not setting:
+        return
+
+    if setting == 'console':
+        enable_instrumentation(ConsoleTableSink())
+    else:
+        enable_instrumentation(JSONLinesSink(setting))
+
+_enable_from_environment()
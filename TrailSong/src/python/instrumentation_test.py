@@ -0,0 +1,110 @@
+"""
+Module name: Instrumentation Test
+
+Description: Unit tests for the `instrumentation` module.
+
+Tests include:
+- `test_disabled`: Checks that stages are shared no-ops and nothing is recorded while instrumentation is disabled.
+- `test_records`: Checks the fields of each record, and that nested stages include their inner stages' peak memory.
+- `test_tracemalloc_stopped`: Checks that disabling instrumentation stops tracemalloc only if enabling it started it.
+- `test_json_lines_sink`: Checks that records are appended to a JSON lines file.
+- `test_process_route_stages`: Runs the elevation pipeline on an example route and checks the stages it records.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+import numpy as np
+from instrumentation import stage, enable_instrumentation, disable_instrumentation, instrumentation_enabled, JSONLinesSink
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+
+class TestInstrumentation(unittest.TestCase):
+
+    def tearDown(self):
+        disable_instrumentation()
+
+    def test_disabled(self):
+        self.assertFalse(instrumentation_enabled())
+        self.assertIs(stage('a'), stage('b'))
+
+        with stage('a'):
+            pass
+
+    def test_records(self):
+        records = []
+        enable_instrumentation(records.append)
+
+        with stage('outer'):
+            with stage('inner'):
+                data = np.ones(1_000_000)
+            del data
+
+        self.assertEqual([record['stage'] for record in records], ['inner', 'outer'])
+
+        inner, outer = records
+        for record in records:
+            self.assertGreaterEqual(record['wall_time'], 0)
+            self.assertGreaterEqual(record['cpu_time'], 0)
+
+        # The 8 MB array is allocated inside both stages
+        self.assertGreaterEqual(inner['peak_memory'], 8_000_000)
+        self.assertGreaterEqual(outer['peak_memory'], inner['peak_memory'])
+
+    def test_tracemalloc_stopped(self):
+        enable_instrumentation(lambda record: None)
+        self.assertTrue(tracemalloc.is_tracing())
+        disable_instrumentation()
+        self.assertFalse(tracemalloc.is_tracing())
+
+        # Tracing started by someone else is left running
+        tracemalloc.start()
+        try:
+            enable_instrumentation(lambda record: None)
+            disable_instrumentation()
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_json_lines_sink(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, 'stages.jsonl')
+            enable_instrumentation(JSONLinesSink(file_path), track_memory=False)
+
+            for name in ['a', 'b']:
+                with stage(name):
+                    pass
+
+            with open(file_path) as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual([record['stage'] for record in records], ['a', 'b'])
+        self.assertIsNone(records[0]['peak_memory'])
+
+    def test_process_route_stages(self):
+        from elevation_MAIN import process_route, write_outputs
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tile(temp_dir, 54, -2)
+
+            records = []
+            enable_instrumentation(records.append)
+
+            result = process_route(EXAMPLE_FILE, HGTTileStore(temp_dir))
+            write_outputs(result, os.path.join(temp_dir, 'output'))
+
+        self.assertEqual([record['stage'] for record in records],
+                         ['elevation.parse', 'elevation.elevation', 'elevation.distance', 'elevation.interpolate',
+                          'elevation.map', 'elevation.write'])
+
+if __name__ == '__main__':
+    unittest.main()
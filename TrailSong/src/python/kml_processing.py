@@ -3,15 +3,28 @@ Module name: KML Processing
 
 Description: Utility functions to open a dialog box and then extract coordinates from a KML file.
 
+The streaming functions also accept GPX files, and parse the file incrementally with lxml's iterparse, freeing each
+element, and everything before it in the document, once it has been read. Memory use therefore grows with the largest
+single element rather than the whole file: a GPX track is read point by point, but the text of a KML <coordinates>
+element is held in full while it is parsed. Entities are never resolved, so uploaded files cannot read other files.
+
+Functions:
+    - extract_data(kml_file_path): Extracts the coordinates and name from a KML file.
+    - iter_coordinate_chunks(file_path, chunk_size): Streams the coordinates of a KML or GPX file as NumPy arrays.
+    - stream_data(file_path, chunk_size): Streams a KML or GPX file into a coordinate array and its name.
+    - read_route(file_path, chunk_size): Streams a KML or GPX file into a route_processing.Route.
+    - select_kml_file(): Opens a dialog box to select a KML file.
+
 Author: George Caselton
-Last updated: 18/08/2024
+Last updated: 17/10/2026
 """
 
 
+import os
+import numpy as np
 from lxml import etree
-import tkinter as tk
+from route_processing import Route, empty_points
 from ANSI_formats import *
-from tkinter import filedialog
 
 def extract_data(kml_file_path):
     """
@@ -58,12 +71,177 @@ def extract_data(kml_file_path):
         return [], None
 
 
+def _parse_kml_coordinates(coords_text):
+    """
+    Parses the text of a KML <coordinates> element into an (n, 2) array of (lat, lon).
+
+    Like `extract_data`, any tuple which is not a valid 'lon,lat,alt' triple is skipped.
+    """
+    tuples = coords_text.split()
+    if not tuples:
+        return np.empty((0, 2))
+
+    # Fast path: every tuple has three values, so all of them can be converted in one go
+    if np.all(np.char.count(np.array(tuples), ',') == 2):
+        try:
+            values = np.array(','.join(tuples).split(','), dtype=float).reshape(-1, 3)
+            return values[:, [1, 0]]
+        except ValueError:
+            pass
+
+    # Slow path for text containing invalid tuples
+    coordinates = []
+    for coord in tuples:
+        try:
+            lon, lat, _ = map(float, coord.split(','))
+            coordinates.append((lat, lon))
+        except ValueError:
+            continue
+
+    return np.array(coordinates, dtype=float).reshape(-1, 2)
+
+def _iter_track_elements(file_path):
+    """
+    Streams the parts of a KML or GPX file which are needed, clearing each element once it has been read.
+
+    Yields:
+        tuple: In document order, ('name', str) for each <name> element, ('coordinates', np.ndarray) for each
+        KML <coordinates> element, and ('point', (lat, lon)) for each GPX <trkpt> or <rtept>.
+    """
+    tags = ('{*}name', '{*}coordinates', '{*}trkpt', '{*}rtept')
+
+    # huge_tree allows <coordinates> elements of more than 10 MB, i.e. single tracks of a few hundred thousand points
+    for _, elem in etree.iterparse(file_path, events=('end',), tag=tags, huge_tree=True, resolve_entities=False):
+        tag = etree.QName(elem).localname
+
+        if tag == 'name':
+            yield 'name', (elem.text or '').strip()
+        elif tag == 'coordinates':
+            yield 'coordinates', _parse_kml_coordinates(elem.text or '')
+        else:
+            try:
+                yield 'point', (float(elem.get('lat')), float(elem.get('lon')))
+            except (TypeError, ValueError):
+                pass
+
+        # Free the element and any siblings already read. The first element read in a new parent also frees
+        # everything already read before its parents, e.g. earlier Placemarks, so the tree never grows
+        elem.clear(keep_tail=True)
+        for node in ((elem,) if elem.getprevious() is not None else elem.iterancestors()):
+            while node.getprevious() is not None:
+                del node.getparent()[0]
+
+def _iter_chunks(file_path, chunk_size, names):
+    """
+    Streams the coordinates of a KML or GPX file in arrays of at most chunk_size rows, appending any names found to `names`.
+    """
+    pending = []
+    pending_count = 0
+    points = []
+
+    for kind, value in _iter_track_elements(file_path):
+        if kind == 'name':
+            names.append(value)
+            continue
+
+        if kind == 'point':
+            # GPX points are gathered in a list and converted together
+            points.append(value)
+            if len(points) < chunk_size:
+                continue
+            value = np.array(points)
+            points = []
+        elif points:
+            pending.append(np.array(points))
+            pending_count += len(points)
+            points = []
+
+        pending.append(value)
+        pending_count += len(value)
+
+        # Emit full chunks as soon as enough coordinates have been read
+        if pending_count >= chunk_size:
+            coordinates = np.concatenate(pending)
+            n_full = len(coordinates) - len(coordinates) % chunk_size
+            for start in range(0, n_full, chunk_size):
+                yield coordinates[start:start + chunk_size]
+            pending = [coordinates[n_full:]]
+            pending_count = len(coordinates) - n_full
+
+    if points:
+        pending.append(np.array(points))
+        pending_count += len(points)
+
+    if pending_count:
+        yield np.concatenate(pending)
+
+def iter_coordinate_chunks(file_path, chunk_size=10000):
+    """
+    Streams the coordinates of a KML or GPX file, without loading the whole document.
+
+    :param file_path: Path to the KML or GPX file
+    :param chunk_size: The maximum number of coordinates in each chunk
+    :return: A generator of (n, 2) numpy arrays of (lat, lon), with n <= chunk_size
+    """
+    return _iter_chunks(file_path, chunk_size, [])
+
+def stream_data(file_path, chunk_size=10000):
+    """
+    Extract coordinates and name from a KML or GPX file using the streaming parser.
+
+    Gives the same coordinates and name as `extract_data` for KML files, but as a numpy array.
+
+    :param file_path: Path to the KML or GPX file
+    :param chunk_size: The number of coordinates parsed into each intermediate array
+    :return: A tuple containing an (n, 2) numpy array of (lat, lon) and the name
+    """
+    try:
+        names = []
+        chunks = list(_iter_chunks(file_path, chunk_size, names))
+        coordinates = np.concatenate(chunks) if chunks else np.empty((0, 2))
+
+        # The first name in the document is the name of the route
+        parkrun_name = names[0] if names else None
+
+        return coordinates, parkrun_name
+
+    except Exception as e:
+        print(f'{error_msg} {e}')
+        return np.empty((0, 2)), None
+
+def read_route(file_path, chunk_size=10000):
+    """
+    Streams a KML or GPX file straight into a Route, copying each chunk of coordinates into the route's array once.
+
+    Unlike `stream_data`, errors are not caught, so the caller can decide how to report them.
+
+    :param file_path: Path to the KML or GPX file
+    :param chunk_size: The number of coordinates parsed into each intermediate array
+    :return: A route_processing.Route, with its 'source' file in the metadata and no elevations or distances yet
+    """
+    names = []
+    chunks = list(_iter_chunks(file_path, chunk_size, names))
+
+    points = empty_points(sum(len(chunk) for chunk in chunks))
+    start = 0
+    for chunk in chunks:
+        points['lat'][start:start + len(chunk)] = chunk[:, 0]
+        points['lon'][start:start + len(chunk)] = chunk[:, 1]
+        start += len(chunk)
+
+    # The first name in the document is the name of the route
+    return Route(points, names[0] if names else None, {'source': os.path.abspath(file_path)})
+
 def select_kml_file():
     """
     Open a file dialog to select a KML file and return its path.
     
     :return: Path to the selected KML file
     """
+    # tkinter is only imported when a dialog is needed, so headless runs start faster
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw() 
 
@@ -5,17 +5,27 @@ Description: Unit tests for the `kml_processing` module.
 
 Tests include:
 - `test_extract_data`: Verifies that the extraction of coordinates and names from a KML file works correctly.
+- `test_stream_data`: Checks that the streaming parser matches `extract_data` on the example KML files.
+- `test_stream_gpx`: Checks that GPX track points are streamed in chunks.
+- `test_stream_frees_elements`: Checks that the elements of a KML file with many Placemarks are freed once read.
 - `test_select_kml_file`: Tests the file selection dialog to ensure it returns the expected file path.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
-Test status as of 18/08/2024: PASS
+Test status as of 17/10/2026: PASS
 """
 
+import glob
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
-from kml_processing import extract_data, select_kml_file
+import numpy as np
+from lxml import etree
+from kml_processing import extract_data, stream_data, iter_coordinate_chunks, select_kml_file
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), '../example_data/elevation')
 
 class TestKMLProcessing(unittest.TestCase):
 
@@ -51,6 +61,57 @@ class TestKMLProcessing(unittest.TestCase):
         mock_root.xpath.assert_any_call('//kml:coordinates', namespaces=namespaces)
         mock_root.xpath.assert_any_call('//kml:name', namespaces=namespaces)
 
+    def test_stream_data(self):
+        kml_files = glob.glob(os.path.join(EXAMPLE_DIR, '*.kml'))
+        self.assertTrue(kml_files)
+
+        for kml_file in kml_files:
+            expected_coords, expected_name = extract_data(kml_file)
+            coords, name = stream_data(kml_file, chunk_size=50)
+
+            np.testing.assert_array_equal(coords, np.array(expected_coords))
+            self.assertEqual(name, expected_name)
+
+    def test_stream_gpx(self):
+        points = ''.join(f'<trkpt lat="{54 + i / 1000}" lon="{-1.5 - i / 1000}"><ele>10</ele></trkpt>' for i in range(25))
+        gpx = f'<gpx xmlns="http://www.topografix.com/GPX/1/1"><trk><name>Track</name><trkseg>{points}</trkseg></trk></gpx>'
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gpx_file = os.path.join(temp_dir, 'track.gpx')
+            with open(gpx_file, 'w') as f:
+                f.write(gpx)
+
+            chunks = list(iter_coordinate_chunks(gpx_file, chunk_size=10))
+            coords, name = stream_data(gpx_file)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        np.testing.assert_array_equal(np.concatenate(chunks), coords)
+        np.testing.assert_array_almost_equal(coords[-1], [54.024, -1.524])
+        self.assertEqual(name, 'Track')
+
+    def test_stream_frees_elements(self):
+        placemarks = ''.join(f'<Placemark><name>Lap {i}</name><description>Lap</description><LineString>'
+                             f'<coordinates>-1.5,{54 + i / 1000},0</coordinates></LineString></Placemark>' for i in range(100))
+        kml = f'<kml xmlns="http://www.opengis.net/kml/2.2"><Document><name>Laps</name>{placemarks}</Document></kml>'
+
+        # Keep hold of the parser, so the tree left at the end can be inspected
+        parsers = []
+        real_iterparse = etree.iterparse
+        def iterparse(*args, **kwargs):
+            parsers.append(real_iterparse(*args, **kwargs))
+            return parsers[-1]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            kml_file = os.path.join(temp_dir, 'laps.kml')
+            with open(kml_file, 'w') as f:
+                f.write(kml)
+
+            with patch('kml_processing.etree.iterparse', side_effect=iterparse):
+                coords, name = stream_data(kml_file)
+
+        self.assertEqual((len(coords), name), (100, 'Laps'))
+        self.assertLess(len(list(parsers[0].root.iter())), 10)
+
     @patch('tkinter.filedialog.askopenfilename')
     @patch('tkinter.Tk')
     def test_select_kml_file(self, mock_tk, mock_askopenfilename):
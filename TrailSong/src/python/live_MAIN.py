@@ -0,0 +1,160 @@
+"""
+Module name: Live MAIN
+
+Description: Entry point for sonifying a route live, as it is being run.
+
+The listen command reads a live position feed, processes each fix as it arrives, and sends the pitch and rate straight
+to Pd. Open live_MAIN.pd and press PLAY to hear it. The replay command plays back a recorded KML route as NMEA sentences
+at an accelerated speed, so the live mode can be tried out without GPS hardware.
+
+Usage:
+    python live_MAIN.py replay "../example_data/elevation/Jesmond Dene parkrun.kml" --speed 10 | python live_MAIN.py listen -
+    python live_MAIN.py listen tcp://192.168.1.20:10110
+    python live_MAIN.py listen track.nmea --follow
+
+Functions:
+- listen(source, follow, pd_host, pd_port, elevation_backend, verbose): Sonifies a live position feed.
+- replay(kml_file_path, destination, speed, pace): Plays back a recorded route as NMEA sentences.
+- main(): Parses the command line arguments and runs a command.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+from live_processing import LiveRoute, FUDISender, LatencyTracker, iter_source_lines, process_lines
+from live_processing import format_gga_sentence, replay_fixes
+from ANSI_formats import *
+
+# Default port of [netreceive -u] in live_MAIN.pd
+DEFAULT_PD_PORT = 3000
+
+def listen(source, follow=False, pd_host='127.0.0.1', pd_port=DEFAULT_PD_PORT, elevation_backend=None, verbose=False):
+    """
+    Sonifies a live position feed until it ends or the user presses Ctrl+C, then prints the latency of the updates.
+
+    Args:
+        source (str): '-' for stdin, 'tcp://host:port', 'udp://host:port' or a file path (see `iter_source_lines`).
+        follow (bool): For files, whether to keep waiting for new lines at the end of the file.
+        pd_host (str): The host Pd is running on.
+        pd_port (int): The port of Pd's [netreceive -u].
+        elevation_backend (object): Where elevations come from. Defaults to geo_processing's default backend.
+        verbose (bool): Whether to print the values of every fix.
+
+    Returns:
+        dict: The latency summary from `LatencyTracker.summary`.
+    """
+    route = LiveRoute(elevation_backend)
+    sender = FUDISender(pd_host, pd_port)
+    tracker = LatencyTracker()
+
+    def print_update(values):
+        print(f"{values['distance']:7.3f} km  {values['elevation']:6.1f} m  "
+              f"pitch {values['pitch']:6.1f} Hz  rate {values['rate']:5.1f} ms")
+
+    try:
+        process_lines(iter_source_lines(source, follow), route, sender, tracker, print_update if verbose else None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sender.close()
+
+    summary = tracker.summary()
+    print(f"{summary['updates']} updates sent to Pd, latency: mean {summary['mean_ms']:.3f} ms, "
+          f"p50 {summary['p50_ms']:.3f} ms, p95 {summary['p95_ms']:.3f} ms, max {summary['max_ms']:.3f} ms",
+          file=sys.stderr)
+
+    return summary
+
+def replay(kml_file_path, destination='-', speed=10.0, pace=300):
+    """
+    Plays back a recorded route as NMEA GGA sentences, timed as if it were being run.
+
+    Args:
+        kml_file_path (str): The KML (or GPX) file of the route.
+        destination (str): '-' for stdout, 'udp://host:port' to send datagrams, 'tcp://host:port' to serve the
+            sentences to the first client which connects, or a file path to append to (to be followed by listen).
+        speed (float): How many times faster than real time to play back. 0 plays back as fast as possible.
+        pace (float): The pace of the run, in seconds per km.
+    """
+    times, coordinates = replay_fixes(kml_file_path, pace)
+
+    connection = None
+    if destination == '-':
+        write = lambda sentence: (sys.stdout.write(sentence), sys.stdout.flush())
+    elif destination.startswith('udp://'):
+        host, _, port = destination[len('udp://'):].rpartition(':')
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        write = lambda sentence: sender.sendto(sentence.encode('ascii'), (host, int(port)))
+    elif destination.startswith('tcp://'):
+        host, _, port = destination[len('tcp://'):].rpartition(':')
+        with socket.create_server((host, int(port))) as server:
+            connection, _ = server.accept()
+        write = lambda sentence: connection.sendall(sentence.encode('ascii'))
+    else:
+        output_file = open(destination, 'a')
+        write = lambda sentence: (output_file.write(sentence), output_file.flush())
+
+    # Timestamp the fixes from the current time of day
+    start_time = time.time()
+    start_of_day = start_time % 86400
+
+    try:
+        for fix_time, (lat, lon) in zip(times, coordinates):
+            if speed > 0:
+                delay = start_time + fix_time / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            write(format_gga_sentence(start_of_day + fix_time, lat, lon) + '\r\n')
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        if connection is not None:
+            connection.close()
+
+def main(args=None):
+    """
+    Parses the command line arguments and runs a command.
+    """
+    parser = argparse.ArgumentParser(description='Sonify a route live, as it is being run.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    listen_parser = commands.add_parser('listen', help='sonify a live feed of NMEA sentences or GPX points')
+    listen_parser.add_argument('source', help="'-' for stdin, tcp://host:port, udp://host:port or a file")
+    listen_parser.add_argument('-f', '--follow', action='store_true', help='keep reading a file as it grows')
+    listen_parser.add_argument('--pd-host', default='127.0.0.1', help='host running live_MAIN.pd')
+    listen_parser.add_argument('--pd-port', type=int, default=DEFAULT_PD_PORT, help="port of live_MAIN.pd's netreceive")
+    listen_parser.add_argument('--hgt-dir', default=os.environ.get('TRAILSONG_HGT_DIR'), help='local directory of SRTM .hgt tiles')
+    listen_parser.add_argument('-v', '--verbose', action='store_true', help='print the values of every fix')
+
+    replay_parser = commands.add_parser('replay', help='play back a recorded KML route as NMEA sentences')
+    replay_parser.add_argument('kml_file', help='the recorded route')
+    replay_parser.add_argument('-o', '--output', default='-', help="'-' for stdout, udp://host:port, tcp://host:port or a file")
+    replay_parser.add_argument('-s', '--speed', type=float, default=10.0, help='times faster than real time, 0 for no waiting')
+    replay_parser.add_argument('--pace', type=float, default=300, help='pace of the run in seconds per km')
+
+    args = parser.parse_args(args)
+
+    if args.command == 'listen':
+        elevation_backend = None
+        if args.hgt_dir:
+            from hgt_processing import HGTTileStore
+            elevation_backend = HGTTileStore(args.hgt_dir)
+
+        listen(args.source, args.follow, args.pd_host, args.pd_port, elevation_backend, args.verbose)
+    else:
+        try:
+            replay(args.kml_file, args.output, args.speed, args.pace)
+        except ValueError as e:
+            print(f'{error_msg} {e}.', file=sys.stderr)
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
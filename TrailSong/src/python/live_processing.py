@@ -0,0 +1,428 @@
+"""
+Module name: Live Processing
+
+Description: Incremental processing of a live position feed, for sonifying a route while it is being run.
+
+Each new position fix is turned into the same distance, elevation, gradient, pitch and rate as the batch elevation
+pipeline, and pushed straight to a running Pd instance as FUDI messages over UDP, which Pd receives with
+[netreceive -u]. The time taken from reading each fix to sending its values is tracked.
+
+Position fixes are read as lines of NMEA sentences ($..GGA and $..RMC) or GPX track points, from stdin, a TCP
+connection, UDP datagrams or a file, which can be followed as it grows. A recorded KML route can be replayed as NMEA
+sentences at an accelerated speed, so the whole chain can be tested without GPS hardware.
+
+Classes:
+    - LiveRoute(elevation_backend, parameters): Keeps the state of a route and processes each new fix.
+    - FUDISender(host, port): Sends messages to Pd's [netreceive -u].
+    - LatencyTracker(max_samples): Records the latency of each update and summarises it.
+
+Functions:
+    - parse_nmea_sentence(sentence): Parses a GGA or RMC sentence into a position fix.
+    - parse_gpx_line(line): Parses the track points on a line of GPX.
+    - parse_fix_line(line): Parses a line of either format into position fixes.
+    - iter_source_lines(source, follow): Reads lines from stdin, a TCP or UDP address, or a file.
+    - process_lines(lines, route, sender, tracker): Processes each fix in a stream of lines and sends it to Pd.
+    - format_gga_sentence(seconds, lat, lon): Formats a position as an NMEA GGA sentence.
+    - replay_fixes(kml_file_path, pace): Returns the times and coordinates of a recorded route run at a steady pace.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import re
+import socket
+import sys
+import time
+from collections import deque
+import numpy as np
+from geo_processing import calculate_distances, get_elevation_backend
+from data_processing import map_value
+
+# Track points of a GPX file, with their lat and lon attributes in either order
+GPX_POINT_PATTERN = re.compile(r'<(?:trkpt|rtept)\s([^>]*)>')
+GPX_ATTRIBUTE_PATTERN = re.compile(r'\b(lat|lon)\s*=\s*["\']([-+0-9.eE]+)["\']')
+
+# How often a followed file is checked for new lines, in seconds
+FOLLOW_INTERVAL = 0.05
+
+def parse_nmea_sentence(sentence):
+    """
+    Parses an NMEA GGA or RMC sentence from any talker (e.g. $GPGGA, $GNRMC).
+
+    Args:
+        sentence (str): The sentence, with or without its checksum.
+
+    Returns:
+        tuple: The UTC time of the fix (seconds since midnight), latitude and longitude, or None if the sentence is
+        another type, has no fix or fails its checksum.
+    """
+    sentence = sentence.strip()
+    if not sentence.startswith('$'):
+        return None
+
+    # The checksum is the XOR of every character between '$' and '*'
+    body, _, checksum = sentence[1:].partition('*')
+    if checksum:
+        calculated = 0
+        for character in body.encode('ascii', 'replace'):
+            calculated ^= character
+        try:
+            if calculated != int(checksum[:2], 16):
+                return None
+        except ValueError:
+            return None
+
+    fields = body.split(',')
+    sentence_type = fields[0][2:]
+
+    try:
+        if sentence_type == 'GGA' and len(fields) > 6 and fields[6] not in ('', '0'):
+            time_field, lat_fields, lon_fields = fields[1], fields[2:4], fields[4:6]
+        elif sentence_type == 'RMC' and len(fields) > 6 and fields[2] == 'A':
+            time_field, lat_fields, lon_fields = fields[1], fields[3:5], fields[5:7]
+        else:
+            return None
+
+        lat = _nmea_degrees(lat_fields[0], 2, lat_fields[1] == 'S')
+        lon = _nmea_degrees(lon_fields[0], 3, lon_fields[1] == 'W')
+        seconds = int(time_field[0:2]) * 3600 + int(time_field[2:4]) * 60 + float(time_field[4:]) if time_field else None
+    except (ValueError, IndexError):
+        return None
+
+    return seconds, lat, lon
+
+def _nmea_degrees(value, n_degree_digits, negative):
+    """
+    Converts an NMEA (d)ddmm.mmmm field to decimal degrees.
+    """
+    degrees = int(value[:n_degree_digits]) + float(value[n_degree_digits:]) / 60
+    return -degrees if negative else degrees
+
+def parse_gpx_line(line):
+    """
+    Parses the track and route points on a line of GPX.
+
+    Args:
+        line (str): A line of a GPX file.
+
+    Returns:
+        list: The (latitude, longitude) of each point on the line.
+    """
+    points = []
+
+    for match in GPX_POINT_PATTERN.finditer(line):
+        attributes = dict(GPX_ATTRIBUTE_PATTERN.findall(match.group(1)))
+        if 'lat' in attributes and 'lon' in attributes:
+            points.append((float(attributes['lat']), float(attributes['lon'])))
+
+    return points
+
+def parse_fix_line(line):
+    """
+    Parses a line of NMEA or GPX into position fixes.
+
+    Args:
+        line (str): The line.
+
+    Returns:
+        list: The (latitude, longitude) of each fix on the line, which is empty if there are none.
+    """
+    if line.lstrip().startswith('$'):
+        fix = parse_nmea_sentence(line)
+        return [fix[1:]] if fix else []
+
+    if '<' in line:
+        return parse_gpx_line(line)
+
+    return []
+
+class LiveRoute:
+    """
+    Keeps the state of a route as it is run, and turns each new position fix into sound parameters.
+
+    The gradient is measured over the last `resolution_in_m` metres covered, the same spacing as the batch pipeline's
+    data points, so it isn't thrown off by fixes which are close together.
+
+    Args:
+        elevation_backend (object): Where elevations come from. Defaults to geo_processing's default backend.
+        parameters (dict): The sonification parameters. Defaults to elevation_MAIN.SONIFICATION_PARAMETERS.
+    """
+
+    def __init__(self, elevation_backend=None, parameters=None):
+        if parameters is None:
+            from elevation_MAIN import SONIFICATION_PARAMETERS
+            parameters = SONIFICATION_PARAMETERS
+
+        self.elevation_backend = elevation_backend or get_elevation_backend()
+        self.parameters = parameters
+
+        self.last_position = None
+        self.distance = 0.0
+        self.elevation = None
+
+        # (distance in m, elevation) of the recent fixes the gradient is measured over
+        self.history = deque()
+
+    def update(self, lat, lon):
+        """
+        Processes a new position fix.
+
+        Args:
+            lat (float): The latitude of the fix.
+            lon (float): The longitude of the fix.
+
+        Returns:
+            dict: The cumulative 'distance' (km), 'elevation' (m), 'gradient' (m per resolution_in_m), 'pitch' (Hz)
+            and 'rate' (ms).
+        """
+        parameters = self.parameters
+
+        if self.last_position is not None:
+            segments, _ = calculate_distances([self.last_position[0], lat], [self.last_position[1], lon])
+            self.distance += segments[0]
+        self.last_position = (lat, lon)
+
+        # Keep the previous elevation over voids in the elevation data
+        elevation = self.elevation_backend.get_elevations(np.array([lat]), np.array([lon]))[0]
+        if not np.isnan(elevation):
+            self.elevation = float(elevation)
+        elif self.elevation is None:
+            self.elevation = 0.0
+
+        # Drop fixes which are further back than needed to measure the gradient
+        distance_m = self.distance * 1000
+        resolution = parameters['resolution_in_m']
+        self.history.append((distance_m, self.elevation))
+        while len(self.history) > 2 and self.history[1][0] <= distance_m - resolution:
+            self.history.popleft()
+
+        start_distance, start_elevation = self.history[0]
+        if distance_m > start_distance:
+            gradient = (self.elevation - start_elevation) / (distance_m - start_distance) * resolution
+        else:
+            gradient = 0.0
+
+        return {
+            'distance': self.distance,
+            'elevation': self.elevation,
+            'gradient': gradient,
+            'pitch': map_value(self.elevation, parameters['min_parkrun_elevation'], parameters['max_parkrun_elevation'],
+                               parameters['min_pitch'], parameters['max_pitch']),
+            'rate': map_value(abs(gradient), parameters['min_gradient'], parameters['max_gradient'],
+                              parameters['min_rate'], parameters['max_rate']),
+        }
+
+class FUDISender:
+    """
+    Sends messages to a running Pd instance using FUDI, Pd's own network format, over UDP.
+
+    In Pd, [netreceive -u 3000] outputs each message, which [route pitches rates] can pass on to pulses.pd.
+
+    Args:
+        host (str): The host Pd is running on.
+        port (int): The port of Pd's [netreceive -u].
+    """
+
+    def __init__(self, host='127.0.0.1', port=3000):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, messages):
+        """
+        Sends several messages in a single datagram.
+
+        Args:
+            messages (dict): The values of each message, keyed by its selector, e.g. {'pitches': 440.0}.
+        """
+        packet = ''.join(f'{selector} {value:.6g};\n' for selector, value in messages.items())
+        self.socket.sendto(packet.encode('ascii'), self.address)
+
+    def close(self):
+        self.socket.close()
+
+class LatencyTracker:
+    """
+    Records the latency of each update, from reading a fix to sending its values to Pd.
+
+    Args:
+        max_samples (int): How many of the most recent latencies are kept for the percentiles.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.latencies = deque(maxlen=max_samples)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def record(self, latency):
+        """
+        Records the latency of one update, in seconds.
+        """
+        self.latencies.append(latency)
+        self.count += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+
+    def summary(self):
+        """
+        Summarises the latencies recorded so far.
+
+        Returns:
+            dict: The number of updates, and the mean, median, 95th percentile and maximum latency in milliseconds.
+        """
+        if not self.count:
+            return {'updates': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+
+        p50, p95 = np.percentile(self.latencies, [50, 95]) * 1000
+        return {
+            'updates': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': float(p50),
+            'p95_ms': float(p95),
+            'max_ms': self.maximum * 1000,
+        }
+
+def iter_source_lines(source, follow=False):
+    """
+    Reads lines from a live position feed.
+
+    Args:
+        source (str): '-' for stdin, 'tcp://host:port' to connect to a server (e.g. a phone sharing its NMEA
+            sentences), 'udp://host:port' to listen for datagrams, or the path of a file.
+        follow (bool): For files, whether to keep waiting for new lines at the end of the file, like `tail -f`.
+
+    Yields:
+        str: Each line, as soon as it arrives.
+    """
+    if source == '-':
+        yield from sys.stdin
+
+    elif source.startswith('tcp://'):
+        host, port = _parse_address(source)
+        with socket.create_connection((host, port)) as connection:
+            yield from connection.makefile('r', encoding='ascii', errors='replace')
+
+    elif source.startswith('udp://'):
+        host, port = _parse_address(source)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+            receiver.bind((host or '0.0.0.0', port))
+            while True:
+                datagram = receiver.recv(65536)
+                yield from datagram.decode('ascii', 'replace').splitlines()
+
+    else:
+        with open(source, encoding='utf-8', errors='replace') as f:
+            partial_line = ''
+            while True:
+                line = f.readline()
+                if line.endswith('\n'):
+                    yield partial_line + line
+                    partial_line = ''
+                elif line:
+                    # The writer hasn't finished the line yet
+                    partial_line += line
+                elif follow:
+                    time.sleep(FOLLOW_INTERVAL)
+                else:
+                    if partial_line:
+                        yield partial_line
+                    return
+
+def _parse_address(source):
+    """
+    Splits 'scheme://host:port' into its host and port.
+    """
+    host, _, port = source.split('://', 1)[1].rpartition(':')
+    return host, int(port)
+
+def process_lines(lines, route, sender, tracker, on_update=None):
+    """
+    Processes each position fix in a stream of lines, and sends its pitch and rate to Pd as soon as it is ready.
+
+    Args:
+        lines (iterable): Lines of NMEA sentences or GPX, e.g. from `iter_source_lines`.
+        route (LiveRoute): The route being run.
+        sender (FUDISender): Where the values are sent.
+        tracker (LatencyTracker): Records the time from reading each line to sending each of its fixes.
+        on_update (callable): Called with the values of each fix, e.g. to print them.
+
+    Returns:
+        int: The number of fixes processed.
+    """
+    n_fixes = 0
+
+    for line in lines:
+        start_time = time.perf_counter()
+
+        for lat, lon in parse_fix_line(line):
+            values = route.update(lat, lon)
+            sender.send({
+                'pitches': values['pitch'],
+                'rates': values['rate'],
+                'distance': values['distance'],
+                'elevation': values['elevation'],
+            })
+            tracker.record(time.perf_counter() - start_time)
+            n_fixes += 1
+
+            if on_update is not None:
+                on_update(values)
+
+    return n_fixes
+
+def format_gga_sentence(seconds, lat, lon):
+    """
+    Formats a position as an NMEA GGA sentence, with its checksum.
+
+    Args:
+        seconds (float): The UTC time of the fix, in seconds since midnight.
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        str: The sentence, without a line ending.
+    """
+    # Rounding before splitting into fields means a field can never round up to 60
+    centiseconds = int(round(seconds * 100)) % 8640000
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    time_field = f'{hours:02d}{minutes:02d}{centiseconds // 100:02d}.{centiseconds % 100:02d}'
+
+    def angle_field(angle, degree_digits):
+        # ddmm.mmmm, in ten-thousandths of an arc minute
+        degrees, units = divmod(int(round(abs(angle) * 600000)), 600000)
+        return f'{degrees:0{degree_digits}d}{units // 10000:02d}.{units % 10000:04d}'
+
+    lat_field = f"{angle_field(lat, 2)},{'S' if lat < 0 else 'N'}"
+    lon_field = f"{angle_field(lon, 3)},{'W' if lon < 0 else 'E'}"
+
+    body = f'GPGGA,{time_field},{lat_field},{lon_field},1,08,0.9,,M,,M,,'
+
+    checksum = 0
+    for character in body.encode('ascii'):
+        checksum ^= character
+
+    return f'${body}*{checksum:02X}'
+
+def replay_fixes(kml_file_path, pace=300):
+    """
+    Returns the times and coordinates of a recorded route, as if it were run at a steady pace.
+
+    Args:
+        kml_file_path (str): The KML (or GPX) file of the route.
+        pace (float): The pace of the run, in seconds per km.
+
+    Returns:
+        tuple: The time of each fix (seconds from the start), and the (n, 2) array of their latitudes and longitudes.
+
+    Raises:
+        ValueError: If the file contains no coordinates.
+    """
+    from kml_processing import stream_data
+
+    coordinates, _ = stream_data(kml_file_path)
+    if not len(coordinates):
+        raise ValueError('no valid data found in the KML file')
+
+    _, distances = calculate_distances(coordinates[:, 0], coordinates[:, 1])
+    return distances * pace, coordinates
@@ -0,0 +1,121 @@
+"""
+Module name: Live Test
+
+Description: Unit tests for the `live_processing` module.
+
+Tests include:
+- `test_parse_nmea_sentence`: Checks GGA and RMC parsing, hemispheres, missing fixes and checksums, and that formatted
+  sentences round trip without fields rounding up to 60.
+- `test_parse_gpx_line`: Checks that track points are parsed with their attributes in either order.
+- `test_live_route`: Checks that incremental distances, elevations and gradients match the batch pipeline.
+- `test_replay_to_pd`: Replays an example route to an NMEA file, streams it and checks the FUDI messages Pd would receive.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import socket
+import tempfile
+import unittest
+import numpy as np
+from live_processing import parse_nmea_sentence, parse_gpx_line, format_gga_sentence, replay_fixes
+from live_processing import LiveRoute, FUDISender, LatencyTracker, iter_source_lines, process_lines
+from geo_processing import calculate_distances
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+
+class TestLiveProcessing(unittest.TestCase):
+
+    def test_parse_nmea_sentence(self):
+        gga = '$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47'
+        rmc = '$GNRMC,123519.50,A,4807.038,S,01131.000,W,022.4,084.4,230394,003.1,W'
+
+        seconds, lat, lon = parse_nmea_sentence(gga)
+        self.assertEqual(seconds, 12 * 3600 + 35 * 60 + 19)
+        self.assertAlmostEqual(lat, 48.1173)
+        self.assertAlmostEqual(lon, 11.516667, places=6)
+
+        self.assertEqual(parse_nmea_sentence(rmc)[1:], (-lat, -lon))
+
+        # Wrong checksum, no fix, and other sentence types
+        self.assertIsNone(parse_nmea_sentence(gga[:-2] + '00'))
+        self.assertIsNone(parse_nmea_sentence('$GPGGA,123519,,,,,0,00,,,M,,M,,'))
+        self.assertIsNone(parse_nmea_sentence('$GPGSV,3,1,11,03,03,111,00'))
+
+        # Formatting and parsing round trip
+        self.assertEqual(parse_nmea_sentence(format_gga_sentence(3723.5, -54.98, -1.6)), (3723.5, -54.98, -1.6))
+
+        # Values which round up carry into the next field, rather than giving 60 seconds or minutes
+        sentence = format_gga_sentence(3599.999, 54.99999999, -1.99999999)
+        self.assertEqual(sentence.split(',')[1:5], ['010000.00', '5500.0000', 'N', '00200.0000'])
+        self.assertEqual(format_gga_sentence(86399.999, 0, 0).split(',')[1], '000000.00')
+
+    def test_parse_gpx_line(self):
+        line = '<trkpt lat="54.98" lon="-1.6"><ele>10</ele></trkpt><trkpt lon=\'-1.7\' lat=\'54.99\'>'
+
+        self.assertEqual(parse_gpx_line(line), [(54.98, -1.6), (54.99, -1.7)])
+        self.assertEqual(parse_gpx_line('<name>Route</name>'), [])
+
+    def test_live_route(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # The route crosses from one tile into the next
+            write_synthetic_tile(temp_dir, 54, -2)
+            write_synthetic_tile(temp_dir, 55, -2)
+            backend = HGTTileStore(temp_dir)
+
+            _, coordinates = replay_fixes(EXAMPLE_FILE)
+            route = LiveRoute(backend)
+            updates = [route.update(lat, lon) for lat, lon in coordinates]
+
+            _, distances = calculate_distances(coordinates[:, 0], coordinates[:, 1])
+            elevations = backend.get_elevations(coordinates[:, 0], coordinates[:, 1])
+
+        np.testing.assert_allclose([update['distance'] for update in updates], distances)
+        np.testing.assert_allclose([update['elevation'] for update in updates], elevations)
+
+        for update in updates:
+            self.assertTrue(110 <= update['pitch'] <= 880)
+            self.assertTrue(50 <= update['rate'] <= 250)
+
+        # A constant slope of 1 m rise per 20 m gives a gradient of 0.5 m per 10 m
+        route = LiveRoute(backend)
+        route.elevation_backend = type('Slope', (), {'get_elevations': lambda self, lats, lons: (lats - 54) * 111195 / 20})()
+        for lat in np.arange(54, 54.001, 0.00001):
+            update = route.update(lat, -1.5)
+        self.assertAlmostEqual(update['gradient'], 0.5, places=2)
+
+    def test_replay_to_pd(self):
+        from live_MAIN import replay
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tile(temp_dir, 54, -2)
+            nmea_file = os.path.join(temp_dir, 'track.nmea')
+            replay(EXAMPLE_FILE, nmea_file, speed=0)
+
+            # A UDP socket standing in for Pd's [netreceive -u]
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as pd:
+                pd.bind(('127.0.0.1', 0))
+                pd.settimeout(1)
+
+                sender = FUDISender(*pd.getsockname())
+                tracker = LatencyTracker()
+                n_fixes = process_lines(iter_source_lines(nmea_file), LiveRoute(HGTTileStore(temp_dir)), sender, tracker)
+                sender.close()
+
+                first_packet = pd.recv(65536).decode('ascii')
+
+        self.assertEqual(n_fixes, len(replay_fixes(EXAMPLE_FILE)[0]))
+        self.assertEqual([message.split()[0] for message in first_packet.split(';\n') if message],
+                         ['pitches', 'rates', 'distance', 'elevation'])
+
+        summary = tracker.summary()
+        self.assertEqual(summary['updates'], n_fixes)
+        self.assertLessEqual(summary['p50_ms'], summary['max_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Module name: Memo Test
+
+Description: Unit tests for the `elevation_memo` module.
+
+Tests include:
+- `test_matches_backend`: Checks that memoized elevations are identical to nearest-post and round-down sampling, of
+  SRTM3, SRTM1 and mixed tiles, and that memos on other grids are named apart.
+- `test_hit_rate`: Checks that a looped route only looks each cell up once, within and across lookups.
+- `test_memo_file`: Checks that the memo is saved, merged and reloaded between instances, and that checkpoints are
+  throttled.
+- `test_process_route`: Checks that memoizing the backend does not change a processed example route.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from elevation_memo import ElevationMemo
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+
+class FloorBackend:
+    """
+    Stand-in for SRTMBackend, which reads the post at the north-west corner of each point's cell of a tile.
+    """
+
+    name = 'floor'
+    interpolation = 'floor'
+
+    def __init__(self, store):
+        self.store = store
+        self.n_lookups = 0
+
+    def get_elevations(self, lats, lons):
+        self.n_lookups += len(lats)
+        tile_lats, tile_lons = np.floor(lats), np.floor(lons)
+        rows = np.floor((tile_lats + 1 - lats) * 1200).astype(int)
+        columns = np.floor((lons - tile_lons) * 1200).astype(int)
+        return np.array([self.store.get_tile(int(tile_lat), int(tile_lon))[row, column]
+                         for tile_lat, tile_lon, row, column in zip(tile_lats, tile_lons, rows, columns)], dtype=float)
+
+class TestElevationMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        write_synthetic_tile(self.temp_dir.name, 54, -2)
+        write_synthetic_tile(self.temp_dir.name, 55, -2)
+        self.store = HGTTileStore(self.temp_dir.name)
+
+        # Points scattered over both tiles, including their shared edge
+        rng = np.random.default_rng(0)
+        self.lats = np.concatenate([rng.uniform(54, 56, 2000), np.full(10, 55.0)])
+        self.lons = rng.uniform(-2, -1, 2010)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_matches_backend(self):
+        memo = ElevationMemo(self.store)
+        np.testing.assert_array_equal(memo.get_elevations(self.lats, self.lons), self.store.get_elevations(self.lats, self.lons))
+        self.assertEqual(memo.name, self.store.name)
+
+        backend = FloorBackend(self.store)
+        memo = ElevationMemo(backend)
+        np.testing.assert_array_equal(memo.get_elevations(self.lats, self.lons), backend.get_elevations(self.lats, self.lons))
+
+        # Bilinear interpolation is approximated by the nearest post, so results are kept apart
+        bilinear_store = HGTTileStore(self.temp_dir.name, 'bilinear')
+        self.assertNotEqual(ElevationMemo(bilinear_store).name, bilinear_store.name)
+
+        # SRTM1 tiles are memoized on their own grid, which SRTM3 tiles in the same directory nest in
+        write_synthetic_tile(self.temp_dir.name, 55, -2, arc_seconds=1)
+        mixed_store = HGTTileStore(self.temp_dir.name)
+        memo = ElevationMemo(mixed_store)
+        self.assertEqual((mixed_store.arc_seconds, memo.name), (1, mixed_store.name))
+        np.testing.assert_array_equal(memo.get_elevations(self.lats, self.lons), mixed_store.get_elevations(self.lats, self.lons))
+
+        # A coarser grid than the tiles' is not exact, so it is named apart
+        self.assertEqual(ElevationMemo(mixed_store, arc_seconds=3).name, f'{mixed_store.name}:memo3')
+
+    def test_hit_rate(self):
+        backend = FloorBackend(self.store)
+        memo = ElevationMemo(backend)
+
+        # Three laps of a 1 km loop, sampled every metre
+        angles = np.linspace(0, 2 * np.pi, 1000, endpoint=False)
+        lap_lats, lap_lons = 54.5 + 0.0014 * np.sin(angles), -1.5 + 0.0025 * np.cos(angles)
+        laps = memo.get_elevations(np.tile(lap_lats, 3), np.tile(lap_lons, 3))
+
+        n_cells = backend.n_lookups
+        self.assertLess(n_cells, 100)
+        np.testing.assert_array_equal(laps[:1000], laps[2000:])
+
+        # Running the loop again only uses the memo
+        memo.get_elevations(lap_lats, lap_lons)
+        info = memo.info()
+
+        self.assertEqual(backend.n_lookups, n_cells)
+        self.assertEqual((info['points'], info['hits'], info['misses'], info['cells']), (4000, n_cells, n_cells, n_cells))
+        self.assertEqual(info['hit_rate'], 0.5)
+        self.assertEqual(info['saved_rate'], 1 - n_cells / 4000)
+
+    def test_memo_file(self):
+        memo_file = os.path.join(self.temp_dir.name, 'memo', 'elevations.npz')
+
+        first = ElevationMemo(self.store, memo_file)
+        first.get_elevations(self.lats[:1000], self.lons[:1000])
+        second = ElevationMemo(self.store, memo_file)
+        second.get_elevations(self.lats[1000:], self.lons[1000:])
+        n_cells = first.info()['cells'] + second.info()['cells']
+        first.save()
+        second.save()
+
+        # The second save merges in the cells of the first
+        memo = ElevationMemo(self.store, memo_file)
+        self.assertEqual(memo.info()['cells'], n_cells)
+        np.testing.assert_array_equal(memo.get_elevations(self.lats, self.lons), self.store.get_elevations(self.lats, self.lons))
+        self.assertEqual(memo.info()['misses'], 0)
+
+        # Memos of other backends are not loaded
+        self.assertEqual(ElevationMemo(FloorBackend(self.store), memo_file).info()['cells'], 0)
+
+        # Checkpoints only save once the interval has passed since the last save
+        memo.get_elevations(self.lats + 0.001, self.lons)
+        memo.checkpoint(interval=3600)
+        self.assertTrue(memo.dirty)
+        memo.checkpoint(interval=0)
+        self.assertFalse(memo.dirty)
+
+    def test_process_route(self):
+        from elevation_MAIN import process_route
+
+        memo = ElevationMemo(self.store)
+        result = process_route(EXAMPLE_FILE, self.store)
+        memoized_result = process_route(EXAMPLE_FILE, memo)
+        process_route(EXAMPLE_FILE, memo)
+
+        np.testing.assert_array_equal(memoized_result['elevations'], result['elevations'])
+        self.assertEqual(memo.info()['hit_rate'], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,22 +7,42 @@ This script prompts the user to select a text file containing pace data, extract
 convert the paces to beats per minute (BPM), and save the results to text files. It uses functions from the `pace_processing`
 module to perform the pace-to-BPM conversion and functions from the `data_processing` module to handle file writing.
 
+With --cohort, a whole results sheet (a CSV of each runner's age, gender, ability and splits) is converted to a BPM
+matrix in one vectorized pass, and written to bpms.csv, with optional Pd inputs for each runner.
+
+With --distance, the paces are of a race other than a 5k, e.g. 'marathon', and are scaled to the 5k statistics with
+Riegel's formula (see pace_processing.riegel_factor).
+
+Usage:
+    python pace_MAIN.py ../example_data/pace/example_1.txt
+    python pace_MAIN.py --cohort results.csv --output-dir ../cohort_output --pd-inputs
+    python pace_MAIN.py marathon_splits.txt --distance marathon
+
 Functions:
 - main(): Main function to execute the script's functionality.
+- run_cohort(csv_path, output_dir, pd_inputs, race_distance): Converts the splits of every runner in a CSV results sheet to BPM.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 """
 
+import argparse
+import csv
+import io
 import os
-from pace_processing import *
-from data_processing import write_to_file
+import re
+import numpy as np
+from pace_processing import pace_to_bpm, cohort_pace_to_bpm, read_cohort_csv, extract_data_from_file, select_pace_file
+from pace_processing import TABLE_DISTANCE
+from data_processing import write_to_file, parse_race_distance, write_atomically
+from instrumentation import stage
 from ANSI_formats import *
 
-def main(data_file_path=None):
+def main(data_file_path=None, race_distance=TABLE_DISTANCE):
     """
     This main function can be called with a parameter, data_file_path (string), which bypasses opening the dialog
     box for users to choose a file. This is useful when doing performance testing.
+    race_distance (float) is the distance of the race in km, which the paces are scaled from.
     """
     
     # Open dialog box to select pace data
@@ -38,7 +58,8 @@ def main(data_file_path=None):
     file_name = os.path.basename(data_file_path)[:-4]
 
     # Extract data and print to console
-    data_result = extract_data_from_file(data_file_path)
+    with stage('pace.parse'):
+        data_result = extract_data_from_file(data_file_path)
 
     # Check if any errors occurred during extraction
     if data_result is None:
@@ -49,15 +70,84 @@ def main(data_file_path=None):
     print(f'Gender: {gender}\nAbility: {ability}\nAge: {age}\nPaces: {paces}')
 
     # Map to tempo and print to console
-    tempos = pace_to_bpm(gender, ability, age, paces)
+    try:
+        with stage('pace.bpm'):
+            tempos = pace_to_bpm(gender, ability, age, paces, race_distance)
+    except ValueError as e:
+        print(f'{error_msg} {e}')
+        return
     print(f'Tempos: {tempos}')
         
     # Write the data to text files in the pd/inputs directory
-    write_to_file(tempos, 'bpm')
-    write_to_file(file_name, 'data_name')
+    with stage('pace.write'):
+        write_to_file(tempos, 'bpm')
+        write_to_file(file_name, 'data_name')
 
     # Print success message
     print(f'{success_msg}\nOpen pace_MAIN.pd to hear the result.')
 
+def run_cohort(csv_path, output_dir, pd_inputs=False, race_distance=TABLE_DISTANCE):
+    """
+    Converts the splits of every runner in a CSV results sheet to BPM, and writes them to bpms.csv in output_dir.
+
+    Args:
+        csv_path (str): The results sheet (see pace_processing.read_cohort_csv for its columns).
+        output_dir (str): The directory to write to, which is created if needed.
+        pd_inputs (bool): Whether to also write each runner's bpm.txt and data_name.txt, for pace_MAIN.pd, to their own
+            sub-directory, named after the runner's row and name.
+        race_distance (float): Distance of the race in km, which the paces are scaled from.
+
+    Returns:
+        np.ndarray: The BPM matrix, with one row per runner and NaN for missing splits.
+
+    Raises:
+        ValueError: If the CSV file is invalid.
+    """
+    with stage('pace.parse'):
+        cohort = read_cohort_csv(csv_path)
+
+    with stage('pace.bpm'):
+        bpms = cohort_pace_to_bpm(cohort['genders'], cohort['abilities'], cohort['ages'], cohort['paces'],
+                                  race_distance)
+
+    with stage('pace.write'):
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Names are quoted where needed, e.g. 'Smith, Ann', and the sheet is replaced in one go
+        text = io.StringIO()
+        writer = csv.writer(text, lineterminator='\n')
+        writer.writerow(['name'] + [f'split_{i + 1}' for i in range(bpms.shape[1])])
+        writer.writerows([name] + ['' if np.isnan(bpm) else f'{bpm:.3f}' for bpm in row]
+                         for name, row in zip(cohort['names'], bpms))
+        write_atomically(os.path.join(output_dir, 'bpms.csv'), text.getvalue().encode())
+
+        if pd_inputs:
+            for i, (name, row) in enumerate(zip(cohort['names'], bpms)):
+                runner_dir = os.path.join(output_dir, f"{i + 1:05d}_{re.sub(r'[^A-Za-z0-9_-]+', '_', name)}")
+                write_to_file(row[~np.isnan(row)], 'bpm', runner_dir)
+                write_to_file(name, 'data_name', runner_dir)
+
+    return bpms
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Convert pace data to BPM for pace_MAIN.pd.')
+    parser.add_argument('data_file', nargs='?', help='pace data file (a dialog box opens if not given)')
+    parser.add_argument('--cohort', help='CSV results sheet of many runners to convert instead')
+    parser.add_argument('-o', '--output-dir', default='cohort_output', help='where --cohort writes bpms.csv')
+    parser.add_argument('--pd-inputs', action='store_true', help="with --cohort, also write each runner's Pd inputs")
+    parser.add_argument('--distance', default='5k', help='race distance in km, or 5k, 10k, half, marathon, 50k or 100k (default: 5k)')
+    args = parser.parse_args()
+
+    try:
+        race_distance = parse_race_distance(args.distance)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.cohort:
+        try:
+            bpms = run_cohort(args.cohort, args.output_dir, args.pd_inputs, race_distance)
+            print(f"{GREEN}Converted {bpms.shape[0]} runners' splits to BPM in {os.path.join(args.output_dir, 'bpms.csv')}{RESET}")
+        except (OSError, ValueError) as e:
+            print(f'{error_msg} {e}')
+    else:
+        main(args.data_file, race_distance)
\ No newline at end of file
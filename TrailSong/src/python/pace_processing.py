@@ -3,138 +3,445 @@ Module name: Pace Processing
 
 Description: Module containing functions related to pace data processing.
 
+The average and world record paces of global_pace_stats are compiled once into NumPy arrays indexed by gender, age group
+and ability (AVERAGE_PACES and WORLD_RECORD_PACES), so whole results sheets can be converted in one vectorized pass.
+
+The statistics are for 5k races. Paces over other distances are scaled to the equivalent 5k pace with Riegel's formula,
+t2 = t1 * (d2 / d1) ** 1.06, so the BPM of a marathon runner reflects how fast they are running for a marathon.
+
 Functions:
-- pace_to_bpm(gender, ability, age, paces): Converts paces to BPM using linear transformation.
-- ungendered_stats(ability, age): Computes average and world record paces by averaging male and female statistics.
+- age_group_indices(ages): Returns the index of each age's group in the compiled tables.
+- riegel_factor(race_distance): Returns how much slower the pace of a race of the given distance is than a 5k's.
+- pace_to_bpm(gender, ability, age, paces, race_distance): Converts paces to BPM using linear transformation.
+- cohort_pace_to_bpm(genders, abilities, ages, paces, race_distances): Converts the paces of many runners to a BPM matrix at once.
+- ungendered_stats(ability, age): Returns the average and world record paces, averaged over male and female statistics.
+- parse_paces(values): Converts an array of 'mins:secs' or seconds pace strings to seconds.
+- read_cohort_csv(file_path): Reads the ages, genders, abilities and splits of many runners from a CSV file.
+- read_pace_log(file_path, chunk_size): Reads a pace log of any length, with optional time and distance columns, in bulk.
 - extract_data_from_file(file_path): Reads and extracts gender, ability, age, and paces from a specified file.
 - select_pace_file(): Opens a file dialog for selecting a pace data file.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
 """
 
-import tkinter as tk
-from tkinter import filedialog
+import csv
+import re
+import numpy as np
 from ANSI_formats import *
 from global_pace_stats import average_5k_paces_by_age, world_record_5k_paces_by_age
 
-def pace_to_bpm(gender, ability, age, paces):
+# Average and maximum BPM, at the runner's average pace and the world record pace of their cohort
+AVERAGE_BPM = 125
+MAXIMUM_BPM = 200
+
+# Codes used to index the compiled tables. 'O' (other) uses the average of the men's and women's statistics
+GENDERS = ('M', 'F', 'O')
+ABILITIES = ('Beginner', 'Novice', 'Intermediate', 'Advanced', 'Elite')
+AGE_GROUPS = tuple(range(10, 95, 5))
+
+# Distance of the races described by global_pace_stats, in km
+TABLE_DISTANCE = 5.0
+
+# Exponent of Riegel's formula for the time of a race over another distance, t2 = t1 * (d2 / d1) ** RIEGEL_EXPONENT
+RIEGEL_EXPONENT = 1.06
+
+def _compile_tables():
+    """
+    Compiles the nested dicts of global_pace_stats into arrays indexed by [gender, age group, ability], with the
+    ungendered statistics averaged once, and the slope and intercept of each cohort's pace to BPM line.
+    """
+    average_paces = np.empty((len(GENDERS), len(AGE_GROUPS), len(ABILITIES)))
+    world_record_paces = np.empty((len(GENDERS), len(AGE_GROUPS), 1))
+
+    for g, gender_key in enumerate(['Men', 'Women']):
+        for a, age_group in enumerate(AGE_GROUPS):
+            average_paces[g, a] = [average_5k_paces_by_age[gender_key][str(age_group)][ability] for ability in ABILITIES]
+            world_record_paces[g, a] = world_record_5k_paces_by_age[gender_key][str(age_group)]
+
+    average_paces[2] = (average_paces[0] + average_paces[1]) / 2
+    world_record_paces[2] = (world_record_paces[0] + world_record_paces[1]) / 2
+
+    # y = mx + b, through (average pace, AVERAGE_BPM) and (world record pace, MAXIMUM_BPM)
+    slopes = (MAXIMUM_BPM - AVERAGE_BPM) / (world_record_paces - average_paces)
+    intercepts = AVERAGE_BPM - slopes * average_paces
+
+    return average_paces, np.broadcast_to(world_record_paces, average_paces.shape), slopes, intercepts
+
+AVERAGE_PACES, WORLD_RECORD_PACES, _SLOPES, _INTERCEPTS = _compile_tables()
+
+def age_group_indices(ages):
+    """
+    Returns the index in AGE_GROUPS of each age's group: the nearest multiple of 5 below it, between 10 and 90.
+
+    :param ages (int, str or array): Ages of the runners.
+    :return: An array of indices, with the same shape as ages.
+    """
+    ages = np.asarray(ages).astype(int)
+    return np.clip(ages, AGE_GROUPS[0], AGE_GROUPS[-1]) // 5 - AGE_GROUPS[0] // 5
+
+def riegel_factor(race_distance):
+    """
+    Returns how much slower the average pace of a race of the given distance is than that of a 5k, by Riegel's formula.
+    Dividing a pace by it gives the equivalent 5k pace.
+
+    :param race_distance (float or array): Race distance in km.
+    :return: The factor, with the same shape as race_distance.
+    """
+    return (np.asarray(race_distance, dtype=float) / TABLE_DISTANCE) ** (RIEGEL_EXPONENT - 1)
+
+def _codes(values, choices, field):
+    """
+    Converts an array of strings into their indices in choices, raising a ValueError naming the first invalid one.
+    """
+    values = np.asarray(values, dtype=str)
+    unique_values, inverse = np.unique(values, return_inverse=True)
+
+    lookup = {choice: i for i, choice in enumerate(choices)}
+    unique_codes = np.array([lookup.get(value, -1) for value in unique_values], dtype=int)
+
+    codes = unique_codes[inverse].reshape(values.shape)
+    if (codes < 0).any():
+        row = int(np.flatnonzero(codes.ravel() < 0)[0])
+        raise ValueError(f"invalid {field} '{values.ravel()[row]}' for runner {row + 1}")
+    return codes
+
+def pace_to_bpm(gender, ability, age, paces, race_distance=TABLE_DISTANCE):
     """
     Convert paces (measured in seconds per km) to beats per minute (BPM) for a given gender, ability level, and age.
     This function uses the linear equation y = mx + b to compare the user's pace to that of the average for their age/gender/ability.
     In this equation, y is the BPM, m is the gradient, x is the pace, and b is the y-intercept.
+    The gradient and intercept of every cohort are precomputed when the module is imported.
 
     :param gender (string): Gender of the runner ('M' for male, 'F' for female, 'O' for other).
     :param ability (string): Running ability level ('Beginner', 'Novice', 'Intermediate', 'Advanced', 'Elite').
     :param age (string): Age of the runner.
     :param paces (list): List of paces (in seconds per km) to convert to BPM.
+    :param race_distance (float): Distance of the race in km, which the paces are scaled from with `riegel_factor`.
     :return: List of BPM values corresponding to the input paces.
     """
-    # Defining minimum and maximum ages of 10 and 90
-    if int(age) < 10:
-        age_key = '10'
-    elif int(age) > 90:
-        age_key = '90'
-    else:
-        # Your age group is the nearest multiple of 5 below your age
-        age_key = str(int(age) - int(age) % 5)
-
-    average_pace = 0
-    world_record_pace = 0
-
-    # Use ungendered statistics if gender is 'O', otherwise use gender-specific data
-    if gender == 'O':
-        average_pace, world_record_pace = ungendered_stats(ability, age_key)
-    else:
-        gender_key = 'Men' if gender == 'M' else 'Women'
-        average_pace = average_5k_paces_by_age[gender_key][age_key][ability]
-        world_record_pace = world_record_5k_paces_by_age[gender_key][age_key]
-    
-    # Define average and maximum BPM values
-    average_bpm = 125
-    maximum_bpm = 200
-
-    # Calculate the slope (m) and intercept (b) for the linear equation y = mx + b
-    m = (maximum_bpm - average_bpm) / (world_record_pace - average_pace)
-    b = average_bpm - (m * average_pace)
-
-    # Compute BPM values for each pace
-    tempos = [(m * pace) + b for pace in paces]
-    
-    return tempos
+    return cohort_pace_to_bpm([gender], [ability], [age], np.asarray(paces, dtype=float)[None, :], race_distance)[0].tolist()
+
+def cohort_pace_to_bpm(genders, abilities, ages, paces, race_distances=TABLE_DISTANCE):
+    """
+    Converts the paces of many runners to BPM in one vectorized pass, in the same way as `pace_to_bpm`.
+
+    :param genders (array): Gender of each runner ('M', 'F' or 'O').
+    :param abilities (array): Ability level of each runner (see ABILITIES).
+    :param ages (array): Age of each runner.
+    :param paces (2-D array): One row of paces (in seconds per km) per runner. NaN marks a missing split.
+    :param race_distances (float or array): Distance of the race in km, or of each runner's race.
+    :return: A 2-D array of BPM values, the same shape as paces, with NaN for missing splits.
+    :raises ValueError: If a gender or ability is invalid, naming the first runner with one.
+    """
+    cohorts = (_codes(genders, GENDERS, 'gender'), age_group_indices(ages), _codes(abilities, ABILITIES, 'ability'))
+    paces = np.asarray(paces, dtype=float) / riegel_factor(race_distances).reshape(-1, 1)
+
+    return _SLOPES[cohorts][:, None] * paces + _INTERCEPTS[cohorts][:, None]
 
 def ungendered_stats(ability, age):
     """
-    This function averages the male and female times to give ungendered stats for average 5k pace and world record 5k pace.
+    Gives ungendered stats for average 5k pace and world record 5k pace, the averages of the male and female times.
+    These are precomputed when the module is imported.
 
     :param ability (string): Running ability level ('Beginner', 'Novice', 'Intermediate', 'Advanced', 'Elite').
     :param age (string): Age of the runner.
     :return: A tuple containing the average pace and world record pace for both genders combined.
     """
-    # Retrieve male and female average paces and world record paces.
-    male_avg = average_5k_paces_by_age['Men'][age][ability]
-    male_WR = world_record_5k_paces_by_age['Men'][age]
-    female_avg = average_5k_paces_by_age['Women'][age][ability]
-    female_WR = world_record_5k_paces_by_age['Women'][age]
+    cohort = (GENDERS.index('O'), int(age_group_indices(age)), ABILITIES.index(ability))
+    return AVERAGE_PACES[cohort], WORLD_RECORD_PACES[cohort]
+
+def parse_paces(values):
+    """
+    Converts an array of pace strings, either 'mins:secs' or seconds, to seconds in one pass. Empty strings become NaN.
+
+    :param values (array): The pace strings.
+    :return: An array of paces in seconds, the same shape as values.
+    :raises ValueError: If a pace is invalid, naming the first one and its position.
+    """
+    values = np.char.strip(np.asarray(values, dtype=str))
+    mins, colons, secs = (np.char.partition(values, ':')[..., i] for i in range(3))
+
+    # Values without a colon are whole seconds, and empty values are missing
+    has_colon = colons == ':'
+    secs = np.where(has_colon, secs, mins)
+    mins = np.where(has_colon, mins, '0')
+    secs = np.where(values == '', 'nan', secs)
+
+    try:
+        return mins.astype(float) * 60 + secs.astype(float)
+    except ValueError:
+        pass
+
+    # Only when something is invalid, find the first bad value to report it
+    for index in np.ndindex(values.shape):
+        try:
+            float(mins[index]), float(secs[index])
+        except ValueError:
+            position = f'value {index[0] + 1}' if len(index) == 1 else f'runner {index[0] + 1}, split {index[1] + 1}'
+            raise ValueError(f"invalid pace format '{values[index]}' ({position})") from None
+
+def read_cohort_csv(file_path):
+    """
+    Reads a results sheet of many runners from a CSV file into columns.
+
+    The header row must include 'age', 'gender' and 'ability' columns, and may include a 'name' column. Every other
+    column is a split pace, in order, as 'mins:secs' or seconds. Runners with fewer splits leave the rest empty.
+
+    :param file_path (string): Path to the CSV file.
+    :return: A dict of 'names', 'genders', 'abilities' and 'ages' arrays with one value per runner, and a 2-D 'paces'
+        array with one row per runner, in seconds, with NaN for missing splits.
+    :raises ValueError: If a required column is missing or a value is invalid.
+    """
+    with open(file_path, newline='') as f:
+        rows = list(csv.reader(f))
+
+    if not rows:
+        raise ValueError('the CSV file is empty')
+
+    header = [column.strip().lower() for column in rows[0]]
+    missing = [column for column in ('age', 'gender', 'ability') if column not in header]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+
+    # Pad short rows, so the sheet is one rectangular array of strings
+    table = np.array([row + [''] * (len(header) - len(row)) for row in rows[1:] if any(row)], dtype=str)
+    table = table.reshape(-1, len(header))
+
+    columns = {column: table[:, i] for i, column in enumerate(header)}
+    split_columns = [i for i, column in enumerate(header) if column not in ('name', 'age', 'gender', 'ability')]
+
+    ages = np.char.strip(columns['age'])
+    bad_ages = ~np.char.isdigit(ages)
+    if bad_ages.any():
+        row = int(np.flatnonzero(bad_ages)[0])
+        raise ValueError(f"invalid age '{ages[row]}' for runner {row + 1}")
+
+    return {
+        'names': np.char.strip(columns['name']) if 'name' in columns else np.arange(1, len(table) + 1).astype(str),
+        'genders': np.char.strip(columns['gender']),
+        'abilities': np.char.strip(columns['ability']),
+        'ages': ages.astype(int),
+        'paces': parse_paces(table[:, split_columns]),
+    }
+
+# Pace logs are parsed in chunks of about this many bytes, cut at the end of a line
+PACE_LOG_CHUNK_SIZE = 1 << 20
+
+# What each byte of a pace log is: anything not listed is invalid
+_INVALID, _DIGIT, _DOT, _COLON, _SEPARATOR = range(5)
+_BYTE_KINDS = np.zeros(256, dtype=np.uint8)
+_BYTE_KINDS[np.frombuffer(b'0123456789', dtype=np.uint8)] = _DIGIT
+_BYTE_KINDS[ord('.')] = _DOT
+_BYTE_KINDS[ord(':')] = _COLON
+_BYTE_KINDS[np.frombuffer(b' \t\r\n,', dtype=np.uint8)] = _SEPARATOR
+
+# Numbers have at most this many digits, and the power of ten of each digit is looked up
+_MAX_DIGITS = 15
+_POWERS_OF_TEN = 10.0 ** np.arange(-_MAX_DIGITS, _MAX_DIGITS + 1)
+
+def _line_text(chunk, position):
+    """
+    Returns the text of the line of a chunk of bytes containing the given position.
+    """
+    start = chunk.rfind(b'\n', 0, position) + 1
+    end = chunk.find(b'\n', position)
+    return chunk[start:end if end >= 0 else len(chunk)].decode(errors='replace').strip()
+
+def _parse_log_chunk(chunk, first_line):
+    """
+    Parses the numbers in a chunk of complete lines of a pace log, with array operations over its bytes.
+
+    Values are separated by whitespace or commas, and are either decimal numbers or durations whose parts are joined by
+    colons ('mm:ss' or 'h:mm:ss'). Digits are turned into the value of each part with np.bincount, and parts into the
+    value of each field in base 60.
+
+    Returns:
+        tuple: The value of each field, and the line number it is on.
+
+    Raises:
+        ValueError: Naming the first line with anything else on it.
+    """
+    data = np.frombuffer(chunk, dtype=np.uint8)
+    kinds = _BYTE_KINDS[data]
+    newlines = np.flatnonzero(data == ord('\n'))
+
+    is_digit = kinds == _DIGIT
+    is_dot = kinds == _DOT
+    is_colon = kinds == _COLON
+    numeric = is_digit | is_dot
+    previous_numeric = np.concatenate(([False], numeric[:-1]))
+    next_numeric = np.concatenate((numeric[1:], [False]))
+
+    def fail(position, reason):
+        line = first_line + int(np.searchsorted(newlines, position))
+        raise ValueError(f"line {line}: {reason} in '{_line_text(chunk, position)}'")
+
+    # Anything but numbers, separators and colons between two numbers is invalid
+    invalid = (kinds == _INVALID) | (is_colon & ~(previous_numeric & next_numeric))
+    if invalid.any():
+        fail(np.argmax(invalid), 'invalid value')
+
+    # Each run of digits and dots is one part of a value
+    part_starts = np.flatnonzero(numeric & ~previous_numeric)
+    part_ends = np.flatnonzero(numeric & ~next_numeric) + 1
+    part_ids = np.cumsum(numeric & ~previous_numeric) - 1
+    n_parts = len(part_starts)
+
+    dots = np.flatnonzero(is_dot)
+    digits = np.flatnonzero(is_digit)
+    dots_per_part = np.bincount(part_ids[dots], minlength=n_parts)
+    digits_per_part = np.bincount(part_ids[digits], minlength=n_parts)
+    bad_parts = (dots_per_part > 1) | (digits_per_part == 0) | (digits_per_part > _MAX_DIGITS)
+    if bad_parts.any():
+        fail(part_starts[np.argmax(bad_parts)], 'invalid number')
+
+    # The power of ten of each digit, from its distance to the part's decimal point (or end)
+    points = part_ends.copy()
+    points[part_ids[dots]] = dots
+    digit_points = points[part_ids[digits]]
+    exponents = digit_points - digits - 1 + (digits > digit_points)
+    digit_values = (data[digits] - ord('0')) * _POWERS_OF_TEN[exponents + _MAX_DIGITS]
+    part_values = np.bincount(part_ids[digits], weights=digit_values, minlength=n_parts)
+
+    # Parts after a colon continue the value before it
+    continues = np.zeros(n_parts, dtype=bool)
+    continues[part_starts > 0] = is_colon[part_starts[part_starts > 0] - 1]
+    field_ids = np.cumsum(~continues) - 1
+    field_starts = np.flatnonzero(~continues)
+
+    parts_per_field = np.bincount(field_ids)
+    if (parts_per_field > 3).any():
+        fail(part_starts[field_starts[np.argmax(parts_per_field > 3)]], 'too many colons')
+
+    # Each part is worth 60 times the next: h:mm:ss or mm:ss
+    powers = field_starts[field_ids] + parts_per_field[field_ids] - 1 - np.arange(n_parts)
+    values = np.bincount(field_ids, weights=part_values * 60.0 ** powers)
+
+    return values, first_line + np.searchsorted(newlines, part_starts[field_starts])
+
+def read_pace_log(file_path, chunk_size=PACE_LOG_CHUNK_SIZE):
+    """
+    Reads a pace log of any length, such as the per-second pace stream of a watch, in chunks of whole lines.
+
+    The log starts with the runner's age, ability and gender, separated by whitespace, as read by
+    `extract_data_from_file`. It is followed by values separated by whitespace or commas, which are read as a list of
+    paces, like the example files, unless a line naming the columns comes first, e.g. 'time,distance,pace'. Each
+    following line is then one split, with a value for each column: 'time' (elapsed), 'distance' (km) and 'pace'. Paces
+    and times may be seconds or 'mins:secs' (or 'h:mm:ss').
+
+    Every chunk is validated in bulk, and the first bad line is reported with its line number.
+
+    :param file_path (string): Path to the pace log.
+    :param chunk_size (int): Roughly how many bytes are parsed at a time.
+    :return: A dict of the 'age', 'ability' and 'gender' strings, and an array for each of the 'paces' (seconds per km)
+        and, if the log has them, 'times' (seconds) and 'distances' (km).
+    :raises ValueError: If the header is incomplete, or naming the first line which is invalid.
+    """
+    with open(file_path, 'rb') as f:
+        buffer = f.read(chunk_size)
+
+        # The first three words are the header, which may share a line with the data
+        header = [match for _, match in zip(range(3), re.finditer(rb'\S+', buffer))]
+        if len(header) < 3:
+            raise ValueError('incomplete data in file')
+        age, ability, gender = (match.group().decode(errors='replace') for match in header)
+
+        data_start = header[-1].end()
+        line = buffer.count(b'\n', 0, data_start) + 1
+        buffer = buffer[data_start:]
+
+        # An optional line naming the columns, which only has words on it. Any other line is data, so a value such
+        # as '4:x0' is reported as invalid by the parser.
+        columns = None
+        first_data = re.match(rb'[ \t\r]*\n?[ \t\r\n]*([^\n]*)', buffer)
+        if re.fullmatch(rb'[A-Za-z_]+([ \t,]+[A-Za-z_]+)*[ \t,\r]*', first_data.group(1)):
+            columns = tuple(first_data.group(1).decode().lower().replace(',', ' ').split())
+            if 'pace' not in columns or not set(columns) <= {'time', 'distance', 'pace'} or len(set(columns)) < len(columns):
+                header_line = line + buffer.count(b'\n', 0, first_data.start(1))
+                raise ValueError(f"line {header_line}: unknown columns '{' '.join(columns)}'")
+            line += buffer.count(b'\n', 0, first_data.end(1))
+            buffer = buffer[first_data.end(1):]
 
-    # Calculate the ungendered average and world record paces.
-    ungendered_avg = (male_avg + female_avg) / 2
-    ungendered_WR = (male_WR + female_WR) / 2
+        values, value_lines = [], []
+        while True:
+            more = f.read(chunk_size)
 
-    return ungendered_avg, ungendered_WR
+            # Parse up to the last complete line, and carry the rest over to the next chunk
+            end = buffer.rfind(b'\n') + 1 if more else len(buffer)
+            if end:
+                chunk_values, chunk_lines = _parse_log_chunk(buffer[:end], line)
+                values.append(chunk_values)
+                value_lines.append(chunk_lines)
+                line += buffer.count(b'\n', 0, end)
+
+            buffer = buffer[end:] + more
+            if not more:
+                break
+
+    values = np.concatenate(values) if values else np.empty(0)
+    value_lines = np.concatenate(value_lines) if value_lines else np.empty(0, dtype=int)
+    lines, counts = np.unique(value_lines, return_counts=True)
+
+    log = {'age': age, 'ability': ability, 'gender': gender}
+
+    # Without a line naming the columns, the values are all paces, however they are split over lines
+    if columns is None:
+        log['paces'] = values
+        return log
+
+    wrong_counts = counts != len(columns)
+    if wrong_counts.any():
+        i = int(np.argmax(wrong_counts))
+        raise ValueError(f'line {lines[i]}: expected {len(columns)} values ({", ".join(columns)}), found {counts[i]}')
+
+    table = values.reshape(-1, len(columns))
+    for i, column in enumerate(columns):
+        log[{'pace': 'paces', 'time': 'times', 'distance': 'distances'}[column]] = table[:, i]
+
+    return log
 
 def extract_data_from_file(file_path):
     """
-    Extract gender, ability, age, and paces from a text file.
+    Extract gender, ability, age, and paces from a text file, using the vectorized `read_pace_log` parser.
 
     :param file_path (string): Path to the text file containing pace data.
     :return: A tuple containing gender, ability, age, and a list of paces, or None if the file is invalid.
     """
     try:
-        # Attempt to read the file
-        with open(file_path, 'r') as f:
-            user_data = f.read()
-    except Exception as e:
+        log = read_pace_log(file_path)
+    except (OSError, ValueError) as e:
         print(f'{error_msg} {e}')
         return None
 
-
-    data = user_data.split()
+    age, ability, gender, paces = log['age'], log['ability'], log['gender'], log['paces']
 
     # Check if the file contains enough data
-    if len(data) < 8:
+    if len(paces) < 5:
         print(f'{error_msg} Incomplete data in file')
         return None
 
-    # Extract the data fields
-    age = data[0]
-    ability = data[1]
-    gender = data[2]
-    
     # Validate them, or print error messages
     if not age.isdigit():
         print(f'{error_msg} Invalid age format: {age}')
     elif gender not in {'M', 'F', 'O'}:
         print(f'{error_msg} Invalid gender format: {gender}')
-    elif ability not in average_5k_paces_by_age['Men']['10'].keys():
+    elif ability not in ABILITIES:
         print(f'{error_msg} Invalid ability level: {ability}')
-    
-    # Convert pace times from 'mins:secs' format to seconds
-    paces = []
-    for pace in data[3:]:
-        try:
-            mins, secs = pace.split(':')
-            pace_in_secs = int(mins) * 60 + int(secs)
-            paces.append(pace_in_secs)
-        except ValueError:
-            print(f'{error_msg} Invalid pace format: {pace}')
-            return None
 
-    return gender, ability, age, paces
+    # Whole seconds are kept as integers, as in 'mins:secs' paces
+    if np.all(paces == np.round(paces)):
+        paces = paces.astype(int)
+
+    return gender, ability, age, paces.tolist()
 
 def select_pace_file():
 
+    # tkinter is only imported when a dialog is needed, so headless runs start faster
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw() 
 
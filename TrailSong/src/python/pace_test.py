@@ -7,17 +7,27 @@ Tests include:
 - `test_pace_to_bpm`: Validates that the function correctly converts paces to BPM using mocked average and world record paces.
 - `test_extract_data_from_file`: Ensures that the function correctly parses data from a mock file.
 - `test_select_pace_file`: Verifies that the file selection dialog works as expected and returns the correct file path.
+- `test_cohort_pace_to_bpm`: Checks that the vectorized cohort conversion matches `pace_to_bpm` for every cohort.
+- `test_read_cohort_csv`: Checks that a CSV results sheet is read into columns, and that the first bad value is reported.
+- `test_run_cohort`: Checks that `pace_MAIN.run_cohort` writes a bpms.csv which reads back, including quoted names.
+- `test_riegel_scaling`: Checks that paces of other race distances are scaled to their 5k equivalents.
+- `test_read_pace_log`: Checks that a long pace log is read into columns across chunks, that logs without named columns
+  are read as paces, and that the first bad line is reported.
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
-Test status as of 18/08/2024: PASS
+Test status as of 17/10/2026: PASS
 
 """
 
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open
+import numpy as np
 from pace_processing import pace_to_bpm, extract_data_from_file, select_pace_file
+from pace_processing import cohort_pace_to_bpm, read_cohort_csv, read_pace_log, riegel_factor, ungendered_stats, GENDERS, ABILITIES
 from global_pace_stats import average_5k_paces_by_age, world_record_5k_paces_by_age
 
 class TestPaceProcessing(unittest.TestCase):
@@ -49,7 +59,7 @@ class TestPaceProcessing(unittest.TestCase):
         for r, e in zip(result_bpm, expected_bpm):
             self.assertAlmostEqual(r, e, delta=0.1)
 
-    @patch('builtins.open', new_callable=mock_open, read_data='30 Beginner M 5:00 4:30 4:00 4:30 5:00')
+    @patch('builtins.open', new_callable=mock_open, read_data=b'30 Beginner M 5:00 4:30 4:00 4:30 5:00')
     def test_extract_data_from_file(self, mock_file):
         # Expected data
         expected_gender = 'M'
@@ -76,5 +86,132 @@ class TestPaceProcessing(unittest.TestCase):
         self.assertEqual(file_path, 'dummy_path.txt')
         mock_askopenfilename.assert_called_once_with(title="Select pace data file", filetypes=[("Text files", "*.txt")])
 
+    def test_cohort_pace_to_bpm(self):
+        # Every gender, ability and age from 5 to 99
+        rng = np.random.default_rng(0)
+        genders = np.repeat(GENDERS, len(ABILITIES) * 95)
+        abilities = np.tile(np.repeat(ABILITIES, 95), len(GENDERS))
+        ages = np.tile(np.arange(5, 100), len(GENDERS) * len(ABILITIES))
+        paces = rng.uniform(180, 600, (len(ages), 5))
+        paces[0, 3:] = np.nan
+
+        bpms = cohort_pace_to_bpm(genders, abilities, ages, paces)
+
+        for i in range(len(ages)):
+            expected = [(m * pace) + b for pace, (m, b) in zip(paces[i], [self.line(genders[i], abilities[i], ages[i])] * 5)]
+            np.testing.assert_allclose(bpms[i], expected)
+        self.assertTrue(np.isnan(bpms[0, 3:]).all())
+
+        with self.assertRaisesRegex(ValueError, "invalid ability 'Pro' for runner 2"):
+            cohort_pace_to_bpm(['M', 'F'], ['Elite', 'Pro'], [30, 30], paces[:2])
+
+    def line(self, gender, ability, age):
+        # The slope and intercept of the original per-runner calculation
+        age_key = str(min(max(int(age), 10), 90) - min(max(int(age), 10), 90) % 5)
+        if gender == 'O':
+            average_pace, world_record_pace = ungendered_stats(ability, age_key)
+        else:
+            gender_key = 'Men' if gender == 'M' else 'Women'
+            average_pace = average_5k_paces_by_age[gender_key][age_key][ability]
+            world_record_pace = world_record_5k_paces_by_age[gender_key][age_key]
+        m = (200 - 125) / (world_record_pace - average_pace)
+        return m, 125 - m * average_pace
+
+    def test_read_cohort_csv(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'results.csv')
+            with open(csv_path, 'w') as f:
+                f.write('Name,Age,Gender,Ability,km 1,km 2,km 3\n')
+                f.write('Ann,34,F,Novice,5:00,4:30,270\n')
+                f.write('Bo,61,O,Elite,3:55,4:01\n')
+
+            cohort = read_cohort_csv(csv_path)
+
+            with open(csv_path, 'a') as f:
+                f.write('Cy,40,M,Advanced,4:00,4:x0,4:00\n')
+            with self.assertRaisesRegex(ValueError, "'4:x0' \\(runner 3, split 2\\)"):
+                read_cohort_csv(csv_path)
+
+        self.assertEqual(list(cohort['names']), ['Ann', 'Bo'])
+        self.assertEqual(list(cohort['genders']), ['F', 'O'])
+        self.assertEqual(list(cohort['abilities']), ['Novice', 'Elite'])
+        np.testing.assert_array_equal(cohort['ages'], [34, 61])
+        np.testing.assert_array_equal(cohort['paces'], [[300, 270, 270], [235, 241, np.nan]])
+
+    def test_run_cohort(self):
+        import csv
+        from pace_MAIN import run_cohort
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_path = os.path.join(temp_dir, 'results.csv')
+            with open(csv_path, 'w') as f:
+                f.write('Name,Age,Gender,Ability,km 1,km 2\n')
+                f.write('"Smith, Ann",34,F,Novice,5:00,4:30\n')
+                f.write('Bo,61,O,Elite,3:55\n')
+
+            bpms = run_cohort(csv_path, os.path.join(temp_dir, 'output'))
+            with open(os.path.join(temp_dir, 'output', 'bpms.csv'), newline='') as f:
+                rows = list(csv.reader(f))
+
+            self.assertEqual(os.listdir(os.path.join(temp_dir, 'output')), ['bpms.csv'])
+
+        self.assertEqual(rows[0], ['name', 'split_1', 'split_2'])
+        self.assertEqual([row[0] for row in rows[1:]], ['Smith, Ann', 'Bo'])
+        self.assertEqual(rows[2][2], '')
+        np.testing.assert_allclose(np.array(rows[1][1:], dtype=float), bpms[0], atol=1e-3)
+
+    def test_riegel_scaling(self):
+        paces = [300, 310, 290, 305, 300]
+
+        # A marathon pace is about 1.25 times slower than the 5k pace of the same runner, by Riegel's formula
+        factor = riegel_factor(42.195)
+        self.assertAlmostEqual(factor, (42.195 / 5) ** 0.06)
+        np.testing.assert_allclose(pace_to_bpm('F', 'Advanced', '40', np.multiply(paces, factor), 42.195),
+                                   pace_to_bpm('F', 'Advanced', '40', paces))
+        self.assertEqual(pace_to_bpm('F', 'Advanced', '40', paces, 5), pace_to_bpm('F', 'Advanced', '40', paces))
+
+        # Each runner of a cohort can have their own race distance
+        cohort_paces = np.array([paces, np.multiply(paces, riegel_factor(10))])
+        bpms = cohort_pace_to_bpm(['M', 'M'], ['Novice', 'Novice'], [25, 25], cohort_paces, [5, 10])
+        np.testing.assert_allclose(bpms[0], bpms[1])
+
+    def test_read_pace_log(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = os.path.join(temp_dir, 'watch.txt')
+            with open(log_path, 'w') as f:
+                f.write('30 Advanced F\ntime,distance,pace\n')
+                f.writelines(f'{i},{i / 250:.3f},4:{i % 60:02d}.5\n' for i in range(1, 1001))
+
+            # Small chunks, so lines are carried over between them
+            log = read_pace_log(log_path, chunk_size=64)
+
+            with open(log_path, 'a') as f:
+                f.write('1001,4.004,4:1O\n')
+            with self.assertRaisesRegex(ValueError, "line 1003: invalid value in '1001,4.004,4:1O'"):
+                read_pace_log(log_path, chunk_size=64)
+
+            with open(log_path, 'w') as f:
+                f.write('30 Advanced F\ntime pace\n0:01 250\n0:02 251.5\n1:00:00\n')
+            with self.assertRaisesRegex(ValueError, 'line 5: expected 2 values \\(time, pace\\), found 1'):
+                read_pace_log(log_path)
+
+            # Without a line naming the columns, values on any number of lines are paces
+            with open(log_path, 'w') as f:
+                f.write('30 Beginner M\n5:00 4:30 4:10\n4:00 4:30\n')
+            paces = read_pace_log(log_path)['paces']
+
+            # A first line of data with letters in it is invalid, rather than naming the columns
+            for data in ['4:x0 5:00', '2026-10-17T08:00:00 4:30']:
+                with open(log_path, 'w') as f:
+                    f.write(f'30 Beginner M\n{data}\n4:00\n')
+                with self.assertRaisesRegex(ValueError, f"line 2: invalid value in '{data}'"):
+                    read_pace_log(log_path)
+
+        self.assertEqual((log['age'], log['ability'], log['gender']), ('30', 'Advanced', 'F'))
+        np.testing.assert_array_equal(log['times'], np.arange(1, 1001))
+        np.testing.assert_allclose(log['distances'], np.round(np.arange(1, 1001) / 250, 3))
+        np.testing.assert_array_equal(log['paces'], 240 + np.arange(1, 1001) % 60 + 0.5)
+        np.testing.assert_array_equal(paces, [300, 270, 250, 240, 270])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,59 +1,420 @@
 """
 Module name: Performance Tests
 
-Description: Performance tests for the elevation_MAIN and pace_MAIN scripts.
+Description: Benchmark suite for the elevation and pace pipelines.
 
 Tests include:
-- Timing each of the main functions (excluding user input as this cannot be timed).
-- Iterating through each script 10 times and averaging the elapsed time.
+- Timing each stage of the elevation pipeline (parse, elevation, distance, interpolate, map, write) and the pace
+  pipeline (parse, bpm, write) separately, on synthetic data at several scales from 100 to 1,000,000 points.
+- Measuring the peak memory allocated by each stage with tracemalloc.
+- Saving the results as JSON, and comparing them against a saved baseline to catch regressions.
+- Measuring the latency of profile similarity queries, exact and with the coarse quantizer, against the size of a
+  synthetic route library, and how many of the exact nearest routes the quantizer finds.
+- Measuring the import time of each script with `python -X importtime`, and checking it against a budget.
+
+The suite runs fully offline: routes are generated as KML files, and elevations come from synthetic .hgt tiles.
+Everything is written to a temporary directory, so it can be run from any directory.
+
+Usage:
+    python performance_tests.py --output results.json
+    python performance_tests.py --scales 100 1000 --baseline results.json
+    python performance_tests.py --scales 100 --library-sizes 1000 10000 100000
 
 Author: George Caselton
-Last updated: 13/08/2024
+Last updated: 17/10/2026
 
-Test status as of 18/08/2024: PASS
-Details: 
-- Average time elapsed during elevation_MAIN: 1.5971 seconds
-- Average time elapsed during pace_MAIN: 0.0012 seconds
+Test status as of 17/10/2026: PASS
+Details (median of 3 repeats):
+- elevation pipeline, 10,000 points: 0.0294 seconds
+- elevation pipeline, 1,000,000 points: 2.9109 seconds
+- pace pipeline, 1,000,000 splits: 2.0274 seconds
+- profile search, 50,000 routes: 0.47 ms per exact query, 0.25 ms per prefiltered query (recall 0.98)
 
 """
 
-import timeit
-from elevation_MAIN import main as elev_main
-from pace_MAIN import main as pace_main
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+# Number of points in the synthetic routes and pace files
+DEFAULT_SCALES = [100, 1000, 10000, 100000, 1000000]
+
+# Stages of each pipeline, in order
+ELEVATION_STAGES = ['parse', 'elevation', 'distance', 'interpolate', 'map', 'write']
+PACE_STAGES = ['parse', 'bpm', 'write']
+SEARCH_STAGES = ['index', 'exact', 'prefiltered']
+
+# Numbers of routes in the synthetic libraries searched, and the queries made of each
+DEFAULT_LIBRARY_SIZES = [1000, 10000, 50000]
+SEARCH_QUERIES = 100
+SEARCH_K = 10
+SEARCH_PROBES = 8
+
+# A stage is a regression if it is this many times slower than the baseline
+DEFAULT_TOLERANCE = 1.5
+
+# Stages faster than this (in seconds) are too noisy to compare against a baseline
+NOISE_FLOOR = 0.001
+
+# Maximum time, in seconds, that importing each script may take
+IMPORT_TIME_BUDGETS = {
+    'elevation_MAIN': 0.25,
+    'pace_MAIN': 0.15,
+}
+
+def generate_route(file_path, n_points, seed=0):
+    """
+    Writes a synthetic 5 km route to a KML file, as a wobbly loop near Newcastle with n_points coordinates.
+
+    :param file_path: Path of the KML file to write.
+    :param n_points: Number of coordinates in the route.
+    :param seed: Seed for the random wobble.
+    """
+    rng = np.random.default_rng(seed)
+
+    # A circle of about 5 km circumference, with some noise so the route is not perfectly smooth
+    angles = np.linspace(0, 2 * np.pi, n_points)
+    radius_in_degrees = 5 / (2 * np.pi) / 111.2
+    wobble = 1 + rng.normal(0, 0.002, n_points)
+    lats = 54.98 + radius_in_degrees * np.sin(angles) * wobble
+    lons = -1.6 + radius_in_degrees * np.cos(angles) * wobble / np.cos(np.radians(54.98))
 
-# Example file paths for testing
-example_kml = 'src/example_data/elevation/Tawd Valley parkrun.kml'
-example_pace_data = 'src/example_data/pace/example_1.txt'
+    coordinates = '\n'.join(f'{lon:.7f},{lat:.7f},0' for lat, lon in zip(lats, lons))
 
-def elev_wrapper():
+    with open(file_path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n'
+                f'<name>Synthetic parkrun {n_points}</name>\n'
+                f'<Placemark><LineString><coordinates>\n{coordinates}\n</coordinates></LineString></Placemark>\n'
+                '</Document></kml>\n')
+
+def generate_pace_file(file_path, n_splits, seed=0):
     """
-    Wrapper function to call elev_main with args that disable user input.
+    Writes a synthetic pace data file with n_splits paces, in the format read by pace_processing.
+
+    :param file_path: Path of the text file to write.
+    :param n_splits: Number of pace times in the file.
+    :param seed: Seed for the random paces.
     """
-    elev_main(kml_file_path=example_kml, show_graph=False)
+    rng = np.random.default_rng(seed)
+    paces = rng.integers(240, 420, n_splits)
 
-def pace_wrapper():
+    with open(file_path, 'w') as f:
+        f.write('28\nNovice\nM\n')
+        f.write('\n'.join(f'{pace // 60}:{pace % 60:02d}' for pace in paces))
+
+def generate_profiles(n_routes, n_points=501, seed=0):
     """
-    Wrapper function to call pace_main with args that disable user input.
+    Generates random 5 km elevation profiles, each a random walk plus a few hills of random height and width.
+
+    :param n_routes: Number of profiles.
+    :param n_points: Number of points in each profile.
+    :param seed: Seed of the random profiles.
+    :return: The distances (in km) of every profile, and a (n_routes, n_points) array of elevations.
     """
-    pace_main(data_file_path=example_pace_data)
+    rng = np.random.default_rng(seed)
+    distances = np.linspace(0, 5, n_points)
 
-def performance_test(wrapper_function):
+    elevations = 100 + np.cumsum(rng.normal(0, 0.2, (n_routes, n_points)), axis=1)
+    for _ in range(3):
+        centres, widths, heights = rng.uniform(0, 5, (n_routes, 1)), rng.uniform(0.2, 1, (n_routes, 1)), rng.uniform(-20, 40, (n_routes, 1))
+        elevations += heights * np.exp(-((distances - centres) / widths) ** 2)
+
+    return distances, elevations
+
+def _run_stage(stage_function, repeats):
     """
-    Measure and print the average processing time of the provided wrapper function.
+    Runs one stage, timing it over several repeats and measuring its peak memory on a separate run.
 
-    :param wrapper_function: Callable function to be timed.
+    :return: A tuple of the stage's return value and a dict of its median 'time' (seconds) and 'peak_memory' (bytes).
     """
-    # Time the function execution over 10 iterations
-    total_time = timeit.timeit(wrapper_function, number=10)
-    
-    # Calculate average time per call
-    avg_processing_time = total_time / 10
-    
-    # Print results
-    print(f'Average time elapsed during {wrapper_function.__name__}: {avg_processing_time:.4f} seconds')
+    times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        value = stage_function()
+        times.append(time.perf_counter() - start_time)
+
+    # tracemalloc slows allocations down, so memory is measured separately from the timings
+    tracemalloc.start()
+    stage_function()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return value, {'time': float(np.median(times)), 'peak_memory': peak_memory}
+
+def benchmark_elevation(n_points, work_dir, repeats=3):
+    """
+    Benchmarks each stage of the elevation pipeline on a synthetic route.
+
+    :param n_points: Number of coordinates in the route.
+    :param work_dir: Directory for the synthetic route, tiles and outputs.
+    :param repeats: Number of times each stage is timed.
+    :return: A dict of stage name to its timing and memory.
+    """
+    from kml_processing import read_route
+    from geo_processing import fill_elevations, fill_distances
+    from data_processing import resample_route
+    from hgt_processing import HGTTileStore, write_synthetic_tile
+    from elevation_MAIN import SONIFICATION_PARAMETERS as parameters, map_profile, write_outputs
+
+    kml_file_path = os.path.join(work_dir, f'route_{n_points}.kml')
+    generate_route(kml_file_path, n_points)
+
+    # Elevations come from a synthetic tile, so no network is needed
+    hgt_dir = os.path.join(work_dir, 'hgt')
+    if not os.path.exists(os.path.join(hgt_dir, 'N54W002.hgt')):
+        write_synthetic_tile(hgt_dir, 54, -2)
+    backend = HGTTileStore(hgt_dir)
+
+    results = {}
+
+    # The stages of elevation_MAIN.process_route, each of which fills in the same route again when it is repeated
+    route, results['parse'] = _run_stage(lambda: read_route(kml_file_path), repeats)
+
+    _, results['elevation'] = _run_stage(lambda: fill_elevations(route, backend), repeats)
+
+    _, results['distance'] = _run_stage(lambda: fill_distances(route), repeats)
+
+    (_, columns), results['interpolate'] = _run_stage(
+        lambda: resample_route(route, parameters['resolution_in_m'], ('ele',), parameters['interpolation']), repeats)
+
+    mapped, results['map'] = _run_stage(lambda: map_profile(columns['ele'], parameters), repeats)
+    result = {'name': route.name or '', 'resolution_in_m': parameters['resolution_in_m'], 'step_ms': parameters['step_ms'],
+              **mapped}
+
+    output_dir = os.path.join(work_dir, 'elevation_output')
+    _, results['write'] = _run_stage(lambda: write_outputs(result, output_dir), repeats)
+
+    return results
+
+def benchmark_pace(n_splits, work_dir, repeats=3):
+    """
+    Benchmarks each stage of the pace pipeline on a synthetic pace file.
+
+    :param n_splits: Number of pace times in the file.
+    :param work_dir: Directory for the synthetic pace file and outputs.
+    :param repeats: Number of times each stage is timed.
+    :return: A dict of stage name to its timing and memory.
+    """
+    from pace_processing import extract_data_from_file, pace_to_bpm
+    from data_processing import write_to_file
+
+    pace_file_path = os.path.join(work_dir, f'pace_{n_splits}.txt')
+    generate_pace_file(pace_file_path, n_splits)
+
+    results = {}
+
+    (gender, ability, age, paces), results['parse'] = _run_stage(lambda: extract_data_from_file(pace_file_path), repeats)
+
+    tempos, results['bpm'] = _run_stage(lambda: pace_to_bpm(gender, ability, age, paces), repeats)
+
+    output_dir = os.path.join(work_dir, 'pace_output')
+    _, results['write'] = _run_stage(lambda: write_to_file(tempos, 'bpm', output_dir), repeats)
+
+    return results
+
+def benchmark_search(n_routes, repeats=3):
+    """
+    Benchmarks profile similarity queries on a synthetic library of routes.
+
+    :param n_routes: Number of routes in the library.
+    :param repeats: Number of times each stage is timed.
+    :return: A dict of stage name to its timing and memory. The query times are per query, of a batch of
+        SEARCH_QUERIES, and the prefiltered stage also has the 'recall' of the exact nearest routes.
+    """
+    from profile_search import ProfileIndex, profile_features
+
+    distances, elevations = generate_profiles(n_routes)
+    features = np.array([profile_features(distances, route_elevations) for route_elevations in elevations])
+    index = ProfileIndex(features, [str(route) for route in range(n_routes)])
+
+    # The queries are routes like those in the library, but not in it
+    _, query_elevations = generate_profiles(SEARCH_QUERIES, seed=1)
+    queries = np.array([profile_features(distances, route_elevations) for route_elevations in query_elevations])
+
+    results = {}
+
+    _, results['index'] = _run_stage(index.build_quantizer, repeats)
+
+    (exact, _), results['exact'] = _run_stage(lambda: index.query(queries, SEARCH_K), repeats)
+
+    (prefiltered, _), results['prefiltered'] = _run_stage(lambda: index.query(queries, SEARCH_K, SEARCH_PROBES), repeats)
+
+    for stage in ['exact', 'prefiltered']:
+        results[stage]['time'] /= SEARCH_QUERIES
+
+    results['prefiltered']['recall'] = float(np.mean([len(np.intersect1d(exact_row, prefiltered_row)) / SEARCH_K
+                                                      for exact_row, prefiltered_row in zip(exact, prefiltered)]))
+
+    return results
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeats=3, library_sizes=DEFAULT_LIBRARY_SIZES):
+    """
+    Runs both pipelines' benchmarks at each scale, and the search benchmark at each library size.
+
+    :param scales: Numbers of points (or pace splits) to benchmark.
+    :param repeats: Number of times each stage is timed.
+    :param library_sizes: Numbers of routes in the libraries searched.
+    :return: A JSON-serialisable dict of metadata and results, keyed by pipeline (or 'search'), then scale, then stage.
+    """
+    results = {'elevation': {}, 'pace': {}, 'search': {}}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for n_points in scales:
+            for pipeline, benchmark in [('elevation', benchmark_elevation), ('pace', benchmark_pace)]:
+                stages = benchmark(n_points, work_dir, repeats)
+                stages['total'] = {
+                    'time': sum(stage['time'] for stage in stages.values()),
+                    'peak_memory': max(stage['peak_memory'] for stage in stages.values()),
+                }
+                results[pipeline][str(n_points)] = stages
+
+    for n_routes in library_sizes:
+        results['search'][str(n_routes)] = benchmark_search(n_routes, repeats)
+
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+def compare_to_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Finds the stages which have become slower than in a saved baseline.
+
+    :param current: Results from `run_benchmarks`.
+    :param baseline: Results from an earlier `run_benchmarks`, e.g. loaded from JSON.
+    :param tolerance: How many times slower than the baseline a stage may be.
+    :return: A list of (pipeline, scale, stage, baseline time, current time) for each regression.
+    """
+    regressions = []
+
+    for pipeline, scales in current['results'].items():
+        for scale, stages in scales.items():
+            baseline_stages = baseline['results'].get(pipeline, {}).get(scale, {})
+
+            for stage, measurement in stages.items():
+                if stage not in baseline_stages:
+                    continue
+
+                baseline_time = baseline_stages[stage]['time']
+                if max(baseline_time, measurement['time']) < NOISE_FLOOR:
+                    continue
+
+                if measurement['time'] > baseline_time * tolerance:
+                    regressions.append((pipeline, scale, stage, baseline_time, measurement['time']))
+
+    return regressions
+
+def print_results(report):
+    """
+    Prints a table of the time and peak memory of every stage.
+
+    :param report: Results from `run_benchmarks`.
+    """
+    for pipeline, scales in report['results'].items():
+        if pipeline == 'search':
+            continue
+        stage_names = ELEVATION_STAGES if pipeline == 'elevation' else PACE_STAGES
+
+        print(f'\n{pipeline} pipeline (time in ms / peak memory in MB)')
+        print(f"{'points':>10} " + ' '.join(f'{stage:>18}' for stage in stage_names + ['total']))
+
+        for scale, stages in scales.items():
+            cells = [f"{stages[stage]['time'] * 1000:9.2f} /{stages[stage]['peak_memory'] / 1e6:7.2f}"
+                     for stage in stage_names + ['total']]
+            print(f'{int(scale):>10} ' + ' '.join(f'{cell:>18}' for cell in cells))
+
+    if report['results'].get('search'):
+        print(f'\nprofile search, top {SEARCH_K} (index time in ms, query time in ms per query / peak memory in MB)')
+        print(f"{'routes':>10} " + ' '.join(f'{stage:>18}' for stage in SEARCH_STAGES) + f"{'recall':>10}")
+
+        for scale, stages in report['results']['search'].items():
+            cells = [f"{stages[stage]['time'] * 1000:9.3f} /{stages[stage]['peak_memory'] / 1e6:7.2f}" for stage in SEARCH_STAGES]
+            print(f'{int(scale):>10} ' + ' '.join(f'{cell:>18}' for cell in cells) + f"{stages['prefiltered']['recall']:>10.3f}")
+
+def import_time_test(module_name, budget):
+    """
+    Measure the import time of a module in a fresh interpreter using `python -X importtime`, and check it against a budget.
+
+    :param module_name: Name of the module to import.
+    :param budget: Maximum allowed import time in seconds.
+    :return: True if the import was within budget, and False if it was over budget or its time was not reported.
+    """
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                               cwd=this_dir, capture_output=True, text=True, check=True)
+
+    # Each line is 'import time: self [us] | cumulative | name', and the module itself is reported last
+    import_time = None
+    for line in completed.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module_name:
+            import_time = int(fields[1]) / 1e6
+
+    if import_time is None:
+        print(f'Import time of {module_name}: not reported by python -X importtime FAIL')
+        return False
+
+    within_budget = import_time <= budget
+    status = 'PASS' if within_budget else 'FAIL'
+    print(f'Import time of {module_name}: {import_time:.4f} seconds (budget {budget:.2f} seconds) {status}')
+
+    return within_budget
+
+def main(args=None):
+    """
+    Runs the benchmark suite from the command line. Returns 1 if a budget or baseline comparison fails.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the TrailSong pipelines.')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='numbers of points to benchmark')
+    parser.add_argument('--library-sizes', type=int, nargs='*', default=DEFAULT_LIBRARY_SIZES,
+                        help='numbers of routes in the libraries searched (none to skip the search benchmark)')
+    parser.add_argument('--repeats', type=int, default=3, help='number of times each stage is timed')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown against the baseline')
+    args = parser.parse_args(args)
+
+    # Make sure the pipeline modules can be imported from any directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    # Check the start-up cost of both scripts
+    passed = all([import_time_test(module_name, budget) for module_name, budget in IMPORT_TIME_BUDGETS.items()])
+
+    report = run_benchmarks(args.scales, args.repeats, args.library_sizes)
+    print_results(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for pipeline, scale, stage, baseline_time, current_time in regressions:
+            print(f'Regression in {pipeline} {stage} at {scale} points: '
+                  f'{baseline_time * 1000:.2f} ms -> {current_time * 1000:.2f} ms')
+
+        print(f'\n{len(regressions)} regressions against {args.baseline}')
+        passed = passed and not regressions
+
+    return 0 if passed else 1
 
 
 if __name__ == '__main__':
-    # Run performance tests for both scripts
-    performance_test(pace_wrapper)
-    performance_test(elev_wrapper)
+    raise SystemExit(main())
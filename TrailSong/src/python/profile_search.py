@@ -0,0 +1,320 @@
+"""
+Module name: Profile Search
+
+Description: Finds the routes in the route catalog whose elevation profiles sound most like a given route.
+
+Each route is described by a feature vector made of:
+- its profile, interpolated to PROFILE_LENGTH points with data_processing.interpolate_data, minus its mean elevation,
+  so routes with the same climbs at different altitudes match;
+- a histogram of its gradients, weighted by distance, so routes with the same mix of climbs and descents match;
+- its total ascent.
+
+Routes are compared by the Euclidean distance between their feature vectors. Queries are batched into NumPy matrix
+products, which are fast enough for a few thousand routes. For larger libraries, a coarse quantizer (an inverted file
+of k-means clusters) can be built, so each query only compares the routes in its `n_probe` nearest clusters.
+
+Usage:
+    python profile_search.py "Jesmond Dene parkrun" -k 5
+    python profile_search.py "Jesmond Dene parkrun" -k 5 --probe 8
+
+Classes:
+    - ProfileIndex(features, names): An index of route feature vectors.
+
+Functions:
+    - profile_features(distances, elevations, weights): Computes the feature vector of a route.
+    - main(): Command line interface to list the routes most like a catalogued route.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import numpy as np
+from data_processing import interpolate_data
+
+# Number of points each profile is interpolated to
+PROFILE_LENGTH = 64
+
+# Edges of the gradient histogram's bins, in percent
+GRADIENT_EDGES = np.array([-8.0, -4.0, -2.0, -1.0, 0.0, 1.0, 2.0, 4.0, 8.0])
+
+# Length of a feature vector: the profile, a histogram bin either side of each edge, and the total ascent
+FEATURE_WIDTH = PROFILE_LENGTH + len(GRADIENT_EDGES) + 2
+
+# Elevation differences (in metres) of the profile, and the total ascent, are divided by these
+RELIEF_SCALE = 20.0
+ASCENT_SCALE = 100.0
+
+# Weight of each part of the feature vector in the distance between routes
+FEATURE_WEIGHTS = {'profile': 1.0, 'gradients': 1.0, 'ascent': 1.0}
+
+def profile_features(distances, elevations, weights=None):
+    """
+    Computes the feature vector of a route.
+
+    Args:
+        distances (np.ndarray): The distances along the route, in km.
+        elevations (np.ndarray): The elevations at those distances, in metres.
+        weights (dict): Any FEATURE_WEIGHTS to override.
+
+    Returns:
+        np.ndarray: A float32 vector of PROFILE_LENGTH profile values, len(GRADIENT_EDGES) + 1 histogram values and the
+            total ascent.
+    """
+    weights = {**FEATURE_WEIGHTS, **(weights or {})}
+    distances = np.asarray(distances, dtype=float)
+    elevations = np.asarray(elevations, dtype=float)
+
+    # Dividing by the square root of the length keeps the profile's weight the same whatever PROFILE_LENGTH is
+    _, profile = interpolate_data(distances, elevations, PROFILE_LENGTH)
+    profile = (profile - profile.mean()) / (RELIEF_SCALE * np.sqrt(PROFILE_LENGTH))
+
+    steps = np.diff(distances) * 1000
+    climbs = np.diff(elevations)
+    gradients = np.divide(100 * climbs, steps, out=np.zeros_like(climbs), where=steps > 0)
+    histogram = np.bincount(np.digitize(gradients, GRADIENT_EDGES), weights=steps, minlength=len(GRADIENT_EDGES) + 1)
+    histogram /= max(steps.sum(), np.finfo(float).eps)
+
+    ascent = climbs[climbs > 0].sum() / ASCENT_SCALE
+
+    return np.concatenate([weights['profile'] * profile, weights['gradients'] * histogram,
+                           [weights['ascent'] * ascent]]).astype(np.float32)
+
+def _squared_distances(queries, query_norms, features, feature_norms):
+    """
+    Returns the squared Euclidean distance between every query and every feature vector, as a (queries, features) array.
+    """
+    squared_distances = query_norms[:, None] + feature_norms[None, :] - 2 * (queries @ features.T)
+    return np.maximum(squared_distances, 0, out=squared_distances)
+
+def _top_k(squared_distances, k):
+    """
+    Returns the columns of the k smallest values in each row, and the values, both sorted by value.
+    """
+    k = min(k, squared_distances.shape[1])
+    if k < squared_distances.shape[1]:
+        columns = np.argpartition(squared_distances, k - 1, axis=1)[:, :k]
+    else:
+        columns = np.broadcast_to(np.arange(k), squared_distances.shape).copy()
+
+    values = np.take_along_axis(squared_distances, columns, axis=1)
+    order = np.argsort(values, axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+class ProfileIndex:
+    """
+    An index of route feature vectors, for finding the routes most like another.
+
+    Args:
+        features (np.ndarray): A (routes, features) array of vectors from `profile_features`.
+        names (list): The name of each route.
+    """
+
+    def __init__(self, features, names):
+        self.features = np.ascontiguousarray(features, dtype=np.float32).reshape(len(names), FEATURE_WIDTH)
+        self.names = list(names)
+        self.norms = np.einsum('ij,ij->i', self.features, self.features)
+
+        # Set by build_quantizer
+        self.centroids = None
+        self.list_order = None
+        self.list_offsets = None
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_catalog(cls, catalog, weights=None):
+        """
+        Builds an index of the latest entry of every route in a route catalog.
+
+        Args:
+            catalog (route_catalog.RouteCatalog): The catalog.
+            weights (dict): Any FEATURE_WEIGHTS to override.
+        """
+        names, features = [], []
+
+        for name, total_distance, elevations in catalog.profiles():
+            names.append(name)
+            features.append(profile_features(np.linspace(0, total_distance, len(elevations)), elevations, weights))
+
+        return cls(np.array(features, dtype=np.float32).reshape(len(names), FEATURE_WIDTH), names)
+
+    def build_quantizer(self, n_lists=None, iterations=10, seed=0):
+        """
+        Clusters the feature vectors with k-means, so queries can be restricted to the routes in the nearest clusters.
+
+        Args:
+            n_lists (int): The number of clusters. Defaults to the square root of the number of routes.
+            iterations (int): The number of k-means iterations.
+            seed (int): Seed of the random choice of the initial centroids.
+        """
+        # An empty index has nothing to cluster, and is always searched exactly
+        if not len(self):
+            return
+
+        n_lists = min(n_lists or max(1, int(round(np.sqrt(len(self))))), len(self))
+        rng = np.random.default_rng(seed)
+        centroids = self.features[rng.choice(len(self), n_lists, replace=False)]
+
+        for iteration in range(iterations + 1):
+            assignments = self._nearest_centroids(centroids)
+            order = np.argsort(assignments, kind='stable')
+            offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+
+            if iteration == iterations:
+                break
+
+            # Each centroid moves to the mean of its cluster, and empty clusters keep their centroids
+            counts = np.diff(offsets)
+            filled = counts > 0
+            sums = np.add.reduceat(self.features[order], offsets[:-1][filled], axis=0)
+            centroids = centroids.copy()
+            centroids[filled] = sums / counts[filled, None]
+
+        self.centroids = centroids
+        self.list_order = order
+        self.list_offsets = offsets
+
+    def _nearest_centroids(self, centroids, batch_size=4096):
+        """
+        Returns the index of the nearest centroid to every feature vector.
+        """
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignments = np.empty(len(self), dtype=np.int64)
+
+        for start in range(0, len(self), batch_size):
+            batch = slice(start, start + batch_size)
+            squared_distances = _squared_distances(self.features[batch], self.norms[batch], centroids, centroid_norms)
+            assignments[batch] = squared_distances.argmin(axis=1)
+
+        return assignments
+
+    def query(self, queries, k=5, n_probe=None, batch_size=64):
+        """
+        Finds the k nearest routes to each query.
+
+        Args:
+            queries (np.ndarray): A feature vector, or a (queries, features) array of them.
+            k (int): The number of routes to find for each query.
+            n_probe (int): If given, and the quantizer has been built, only the routes in the n_probe nearest clusters
+                to each query are compared. Faster, but may miss some of the nearest routes.
+            batch_size (int): The number of queries compared with the index (or their probed clusters) at once, which
+                bounds the memory used.
+
+        Returns:
+            tuple: (queries, k) arrays of the indices of the nearest routes, and their distances, nearest first. If
+                fewer than k routes are compared, the rest of the row is filled with -1 and infinity.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        k = min(k, len(self))
+
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        squared_distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+
+        if n_probe is None or self.centroids is None:
+            for start in range(0, len(queries), batch_size):
+                batch = slice(start, start + batch_size)
+                indices[batch], squared_distances[batch] = _top_k(
+                    _squared_distances(queries[batch], query_norms[batch], self.features, self.norms), k)
+        else:
+            centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            probes, _ = _top_k(_squared_distances(queries, query_norms, self.centroids, centroid_norms), n_probe)
+
+            # Each query is compared with about n_probe / n_lists of the index, so more fit in the same memory
+            probe_batch_size = batch_size * max(1, len(self.centroids) // probes.shape[1])
+            for start in range(0, len(queries), probe_batch_size):
+                batch = slice(start, start + probe_batch_size)
+                batch_probes = probes[batch]
+
+                # Each query's candidates are the routes of its probed clusters, side by side in a row padded with
+                # infinity. The queries probing a cluster are compared with its routes at once.
+                sizes = self.list_offsets[batch_probes + 1] - self.list_offsets[batch_probes]
+                slot_starts = np.cumsum(sizes, axis=1) - sizes
+                width = sizes.sum(axis=1).max()
+                if width == 0:
+                    continue
+
+                candidates = np.full((len(batch_probes), width), -1, dtype=np.int64)
+                candidate_distances = np.full((len(batch_probes), width), np.inf, dtype=np.float32)
+
+                for cluster in np.unique(batch_probes):
+                    members = self.list_order[self.list_offsets[cluster]:self.list_offsets[cluster + 1]]
+                    if len(members) == 0:
+                        continue
+
+                    rows, slots = np.nonzero(batch_probes == cluster)
+                    columns = slot_starts[rows, slots][:, None] + np.arange(len(members))
+                    candidates[rows[:, None], columns] = members
+                    candidate_distances[rows[:, None], columns] = _squared_distances(
+                        queries[batch][rows], query_norms[batch][rows], self.features[members], self.norms[members])
+
+                columns, values = _top_k(candidate_distances, k)
+                indices[batch, :columns.shape[1]] = np.take_along_axis(candidates, columns, axis=1)
+                squared_distances[batch, :values.shape[1]] = values
+
+        return indices, np.sqrt(squared_distances)
+
+    def similar(self, name, k=5, n_probe=None):
+        """
+        Finds the routes most like a route in the index.
+
+        Args:
+            name (str): The name of the route, ignoring case.
+            k (int): The number of routes to find, not counting the route itself.
+            n_probe (int): As for `query`.
+
+        Returns:
+            list: (name, distance) of each route, nearest first.
+
+        Raises:
+            ValueError: If there is no route with that name in the index.
+        """
+        lower_names = [route_name.lower() for route_name in self.names]
+        if name.lower() not in lower_names:
+            raise ValueError(f"no route named '{name}' in the index")
+        row = lower_names.index(name.lower())
+
+        indices, distances = self.query(self.features[row], k + 1, n_probe)
+
+        return [(self.names[index], float(distance)) for index, distance in zip(indices[0], distances[0])
+                if index not in (row, -1)][:k]
+
+def main(args=None):
+    """
+    Command line interface to list the routes most like a catalogued route. Returns the process exit code.
+    """
+    from route_catalog import RouteCatalog
+    from ANSI_formats import error_msg
+
+    parser = argparse.ArgumentParser(description='Find the catalogued routes whose elevation profiles are most like a route.')
+    parser.add_argument('name', help='name of the route')
+    parser.add_argument('-k', type=int, default=5, help='number of routes to list (default: 5)')
+    parser.add_argument('--probe', type=int, default=None, help='only compare routes in this many of the nearest clusters')
+    parser.add_argument('--catalog', default=None, help='catalog file (default: TRAILSONG_CATALOG or ~/.cache/trailsong/catalog.sqlite)')
+    args = parser.parse_args(args)
+
+    with RouteCatalog(args.catalog) as catalog:
+        index = ProfileIndex.from_catalog(catalog)
+
+    if not len(index):
+        print(f'{error_msg} there are no routes in the catalog')
+        return 1
+
+    if args.probe is not None:
+        index.build_quantizer()
+
+    try:
+        matches = index.similar(args.name, args.k, args.probe)
+    except ValueError as e:
+        print(f'{error_msg} {e}')
+        return 1
+
+    for name, distance in matches:
+        print(f'{distance:8.4f}  {name}')
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""
+Module name: Profile Search Test
+
+Description: Unit tests for the `profile_search` module.
+
+Tests include:
+- `test_profile_features`: Checks that the features ignore the altitude of a route, but not its climbs.
+- `test_query`: Checks the exact and prefiltered nearest neighbours of a synthetic library of routes.
+- `test_from_catalog`: Builds an index from a route catalog, and finds the route most like another.
+- `test_empty_catalog`: Checks that an empty catalog gives an empty index, which the command line reports.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from profile_search import ProfileIndex, profile_features, PROFILE_LENGTH, GRADIENT_EDGES
+from route_catalog import RouteCatalog, catalog_entry
+
+def synthetic_profile(seed, n_points=501):
+    """
+    Returns the distances and elevations of a random 5 km route.
+    """
+    rng = np.random.default_rng(seed)
+    distances = np.linspace(0, 5, n_points)
+    elevations = 100 + np.cumsum(rng.normal(0, 0.3, n_points)) + 10 * np.sin(distances * rng.uniform(0.5, 3))
+    return distances, elevations
+
+class TestProfileSearch(unittest.TestCase):
+
+    def test_profile_features(self):
+        distances, elevations = synthetic_profile(0)
+        features = profile_features(distances, elevations)
+
+        self.assertEqual(features.shape, (PROFILE_LENGTH + len(GRADIENT_EDGES) + 2,))
+        self.assertEqual(features.dtype, np.float32)
+        self.assertAlmostEqual(features[PROFILE_LENGTH:-1].sum(), 1.0, places=5)
+
+        # The same route at a different altitude has the same features, but twice the climbs do not
+        np.testing.assert_allclose(profile_features(distances, elevations + 500), features, atol=1e-5)
+        self.assertGreater(profile_features(distances, 2 * elevations)[-1], features[-1])
+
+        # All of a flat route is in the bin from 0 to 1%, with no ascent
+        flat = profile_features(distances, np.full_like(elevations, 50))
+        self.assertEqual(flat[-1], 0)
+        self.assertAlmostEqual(flat[PROFILE_LENGTH + 5], 1.0)
+
+    def test_query(self):
+        names = [f'route {seed}' for seed in range(300)]
+        features = np.array([profile_features(*synthetic_profile(seed)) for seed in range(300)])
+        index = ProfileIndex(features, names)
+
+        indices, distances = index.query(features[:20], k=5)
+        self.assertEqual(indices.shape, (20, 5))
+        np.testing.assert_array_equal(indices[:, 0], np.arange(20))
+        self.assertTrue(np.all(np.diff(distances, axis=1) >= 0))
+
+        # Batches give the same answers as single queries
+        single_indices, _ = index.query(features[7], k=5)
+        np.testing.assert_array_equal(single_indices[0], indices[7])
+
+        # Probing every cluster gives the exact answers, and probing fewer finds the query itself
+        index.build_quantizer(n_lists=10)
+        self.assertEqual(index.list_offsets[-1], len(index))
+        np.testing.assert_array_equal(index.query(features[:20], k=5, n_probe=10)[0], indices)
+        np.testing.assert_array_equal(index.query(features[:20], k=5, n_probe=2)[0][:, 0], np.arange(20))
+
+        # Queries probing clusters of different sizes are batched together, and match the same queries one at a time
+        probed_indices, probed_distances = index.query(features[:20], k=5, n_probe=2, batch_size=4)
+        for row in range(20):
+            single_indices, single_distances = index.query(features[row], k=5, n_probe=2)
+            np.testing.assert_array_equal(single_indices[0], probed_indices[row])
+            np.testing.assert_allclose(single_distances[0], probed_distances[row], atol=1e-3)
+
+        similar = index.similar('ROUTE 3', k=4)
+        self.assertEqual([name for name, _ in similar], [names[i] for i in indices[3, 1:]])
+        with self.assertRaises(ValueError):
+            index.similar('route 300')
+
+    def test_from_catalog(self):
+        with tempfile.TemporaryDirectory() as temp_dir, RouteCatalog(os.path.join(temp_dir, 'catalog.sqlite')) as catalog:
+            entries = []
+            for name, seed, offset in [('Hilly', 0, 0), ('Hilly again', 0, 300), ('Other', 1, 0)]:
+                file_path = os.path.join(temp_dir, f'{name}.kml')
+                with open(file_path, 'w') as f:
+                    f.write(name)
+
+                distances, elevations = synthetic_profile(seed)
+                result = {'name': name, 'total_distance': distances[-1], 'resolution_in_m': 10, 'elevations': elevations + offset,
+                          'bounding_box': np.array([54.0, -2.0, 54.1, -1.9])}
+                entries.append(catalog_entry(file_path, result, {}))
+            catalog.add(entries)
+
+            index = ProfileIndex.from_catalog(catalog)
+
+        self.assertEqual(index.names, ['Hilly', 'Hilly again', 'Other'])
+        self.assertEqual(index.similar('Hilly', k=1)[0][0], 'Hilly again')
+
+    def test_empty_catalog(self):
+        from profile_search import main
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            catalog_path = os.path.join(temp_dir, 'catalog.sqlite')
+            with RouteCatalog(catalog_path) as catalog:
+                index = ProfileIndex.from_catalog(catalog)
+            index.build_quantizer()
+
+            self.assertEqual(main(['Hilly', '--catalog', catalog_path, '--probe', '2']), 1)
+
+        self.assertEqual((len(index), index.features.shape), (0, (0, PROFILE_LENGTH + len(GRADIENT_EDGES) + 2)))
+        with self.assertRaisesRegex(ValueError, "no route named 'Hilly'"):
+            index.similar('Hilly')
+
+if __name__ == '__main__':
+    unittest.main()
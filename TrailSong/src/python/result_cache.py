@@ -0,0 +1,224 @@
+"""
+Module name: Result Cache
+
+Description: A content-addressed, on-disk cache for the results of the elevation pipeline.
+
+Results are keyed by a SHA-256 hash of the input file's contents together with the processing parameters, so renaming
+or re-downloading an unchanged route still hits the cache, while any change to the route or the parameters misses it.
+Each result is stored as a .npz file. When the cache grows beyond its size limit, the least recently used results are
+evicted first. A stored result which cannot be read, e.g. after a crash or a full disk, is deleted and counted as a miss.
+
+The cache can be inspected or cleared from the command line:
+    python result_cache.py info
+    python result_cache.py clear
+
+Classes:
+    - ResultCache(cache_dir, max_bytes): The on-disk cache.
+
+Functions:
+    - default_cache_dir(): Returns the cache directory used when none is given.
+    - hash_file(file_path): Returns the SHA-256 hash of a file's contents.
+    - main(): Command line interface to inspect or clear the cache.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+from data_processing import write_atomically
+
+# Default size limit of the cache, in bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def default_cache_dir():
+    """
+    Returns the cache directory used when none is given: TRAILSONG_CACHE_DIR if set, otherwise ~/.cache/trailsong/results.
+    """
+    return os.environ.get('TRAILSONG_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'trailsong', 'results'))
+
+def hash_file(file_path):
+    """
+    Returns the SHA-256 hash of a file's contents, read a block at a time. More data, such as the parameters the file is
+    processed with, can be added to it with update() before taking its hexdigest().
+    """
+    digest = hashlib.sha256()
+
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+    return digest
+
+class ResultCache:
+    """
+    A size-bounded LRU cache of pipeline results, stored as .npz files in a directory.
+
+    Args:
+        cache_dir (str): The directory to store results in. Defaults to `default_cache_dir()`.
+        max_bytes (int): The maximum total size of the stored results.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, file_path, parameters):
+        """
+        Returns the cache key of a file processed with the given parameters.
+
+        Args:
+            file_path (str): The input file, whose contents are hashed.
+            parameters (dict): The processing parameters. Must be JSON serialisable.
+
+        Returns:
+            str: The hex digest of the key.
+        """
+        digest = hash_file(file_path)
+        digest.update(json.dumps(parameters, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, key):
+        """
+        Returns the result stored under the key, or None if there isn't one.
+
+        Args:
+            key (str): A key from `make_key`.
+
+        Returns:
+            dict: The stored result, with arrays as numpy ndarrays and scalars and strings as Python values.
+        """
+        path = self._path(key)
+
+        try:
+            with np.load(path) as data:
+                result = {name: data[name] for name in data.files}
+
+            # Mark the result as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            # A truncated or corrupt result is removed, so it is recomputed and stored again
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # Zero-dimensional arrays hold the scalars and strings of the result
+        return {name: value.item() if value.ndim == 0 else value for name, value in result.items()}
+
+    def put(self, key, result):
+        """
+        Stores a result under the key, then evicts the least recently used results if the cache is too large.
+
+        Args:
+            key (str): A key from `make_key`.
+            result (dict): Values which numpy can save, e.g. arrays, numbers and strings.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Other processes never see a partly written result
+        write_atomically(self._path(key), lambda f: np.savez(f, **result))
+
+        self.evict()
+
+    def _entries(self):
+        """
+        Returns (path, size, last used time) for each stored result.
+        """
+        entries = []
+
+        if not os.path.isdir(self.cache_dir):
+            return entries
+
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used results until the cache is within its size limit.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total_bytes = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process evicted it first
+                pass
+            total_bytes -= size
+
+    def info(self):
+        """
+        Reports the state of the cache.
+
+        Returns:
+            dict: The cache directory, number of entries, total and maximum size in bytes, and this instance's hits and misses.
+        """
+        entries = self._entries()
+
+        return {
+            'cache_dir': self.cache_dir,
+            'entries': len(entries),
+            'total_bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def clear(self):
+        """
+        Removes every stored result.
+        """
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def main(args=None):
+    """
+    Command line interface to inspect or clear the cache.
+    """
+    parser = argparse.ArgumentParser(description='Inspect or clear the TrailSong result cache.')
+    parser.add_argument('command', choices=['info', 'clear'])
+    parser.add_argument('--cache-dir', default=None, help='cache directory (default: TRAILSONG_CACHE_DIR or ~/.cache/trailsong/results)')
+    args = parser.parse_args(args)
+
+    cache = ResultCache(args.cache_dir)
+
+    if args.command == 'clear':
+        cache.clear()
+
+    info = cache.info()
+    print(f"Cache directory: {info['cache_dir']}")
+    print(f"Entries: {info['entries']}")
+    print(f"Size: {info['total_bytes'] / 1024 / 1024:.2f} MB of {info['max_bytes'] / 1024 / 1024:.0f} MB")
+
+if __name__ == '__main__':
+    main()
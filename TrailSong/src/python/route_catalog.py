@@ -0,0 +1,471 @@
+"""
+Module name: Route Catalog
+
+Description: An indexed SQLite catalog of processed routes, so known routes can be rendered without re-running the
+elevation pipeline.
+
+Each route is stored once per set of processing parameters, with its name, the SHA-256 hash of its file, its bounding
+box, total distance, resolution and elevation statistics, and its resampled elevation profile as a compact float32
+BLOB. Routes are indexed by name, and by bounding box with an R*Tree (or a plain index, if SQLite was built without the
+R*Tree module). Rendering a catalogued route is a single indexed read, after which the profile is mapped to the rates,
+pitches and graph data with elevation_MAIN.map_profile, so the sound parameters can still be changed.
+
+Directories of KML files are imported with a pool of worker processes, set up in the same way as batch_MAIN's, and the
+results are written to the catalog by the main process in one transaction.
+
+Usage:
+    python route_catalog.py import ../example_data/elevation --workers 4
+    python route_catalog.py render "Jesmond Dene parkrun"
+    python route_catalog.py list --bbox 54.9 -1.7 55.1 -1.5
+    python route_catalog.py info
+
+Classes:
+    - RouteCatalog(catalog_path): The SQLite catalog.
+
+Functions:
+    - default_catalog_path(): Returns the catalog file used when none is given.
+    - catalog_entry(file_path, result, parameters): Converts a result of elevation_MAIN.process_route to a catalog entry.
+    - result_from_entry(entry, parameters): Converts a catalog entry back to the result of elevation_MAIN.process_route.
+    - import_routes(kml_file_paths, catalog_path, workers, ...): Processes routes in a process pool and adds them to the catalog.
+    - render_route(catalog, name, output_dir, table_format, parameters): Writes the Pd inputs of a catalogued route.
+    - main(): Command line interface to import, render, list and inspect routes.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import batch_MAIN
+from simplify_processing import SIMPLIFICATION_METHODS
+from data_processing import TABLE_FORMATS
+from result_cache import hash_file
+from ANSI_formats import *
+
+# Columns of the routes table, other than its id. The elevations are a BLOB of little-endian float32 values
+ENTRY_COLUMNS = ('key', 'name', 'file_name', 'sha256', 'parameters', 'min_lat', 'min_lon', 'max_lat', 'max_lon',
+                 'total_distance', 'resolution_in_m', 'n_points', 'min_elevation', 'max_elevation', 'mean_elevation',
+                 'total_ascent', 'total_descent', 'elevations', 'updated')
+
+# Columns listed by RouteCatalog.search, which leaves out the profile
+SUMMARY_COLUMNS = tuple(column for column in ENTRY_COLUMNS if column not in ('key', 'parameters', 'elevations'))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    min_lat REAL NOT NULL,
+    min_lon REAL NOT NULL,
+    max_lat REAL NOT NULL,
+    max_lon REAL NOT NULL,
+    total_distance REAL NOT NULL,
+    resolution_in_m REAL NOT NULL,
+    n_points INTEGER NOT NULL,
+    min_elevation REAL,
+    max_elevation REAL,
+    mean_elevation REAL,
+    total_ascent REAL,
+    total_descent REAL,
+    elevations BLOB NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS routes_name ON routes (name COLLATE NOCASE, updated);
+CREATE INDEX IF NOT EXISTS routes_sha256 ON routes (sha256);
+"""
+
+def default_catalog_path():
+    """
+    Returns the catalog file used when none is given: TRAILSONG_CATALOG, or catalog.sqlite in ~/.cache/trailsong.
+    """
+    return os.environ.get('TRAILSONG_CATALOG', os.path.join(os.path.expanduser('~'), '.cache', 'trailsong', 'catalog.sqlite'))
+
+def catalog_entry(file_path, result, parameters):
+    """
+    Converts a result of elevation_MAIN.process_route to a catalog entry.
+
+    Args:
+        file_path (str): The route's file, which is hashed.
+        result (dict): The result of process_route.
+        parameters (dict): Everything the profile depends on: the SONIFICATION_PARAMETERS, elevation backend and
+            simplification. Must be JSON serialisable.
+
+    Returns:
+        dict: A value for each of ENTRY_COLUMNS.
+    """
+    sha256 = hash_file(file_path).hexdigest()
+
+    parameters_json = json.dumps(parameters, sort_keys=True)
+    elevations = np.asarray(result['elevations'], dtype='<f4')
+    climbs = np.diff(elevations.astype(float))
+    file_name = os.path.basename(file_path)
+    min_lat, min_lon, max_lat, max_lon = (float(value) for value in result['bounding_box'])
+
+    return {
+        'key': hashlib.sha256(f'{sha256}\n{parameters_json}'.encode()).hexdigest(),
+        'name': result['name'] or os.path.splitext(file_name)[0],
+        'file_name': file_name,
+        'sha256': sha256,
+        'parameters': parameters_json,
+        'min_lat': min_lat,
+        'min_lon': min_lon,
+        'max_lat': max_lat,
+        'max_lon': max_lon,
+        'total_distance': float(result['total_distance']),
+        'resolution_in_m': float(result['resolution_in_m']),
+        'n_points': len(elevations),
+        'min_elevation': float(elevations.min()),
+        'max_elevation': float(elevations.max()),
+        'mean_elevation': float(elevations.mean()),
+        'total_ascent': float(climbs[climbs > 0].sum()),
+        'total_descent': float(-climbs[climbs < 0].sum()),
+        'elevations': elevations.tobytes(),
+        'updated': time.time(),
+    }
+
+def result_from_entry(entry, parameters=None):
+    """
+    Converts a catalog entry back to the result of elevation_MAIN.process_route, mapping its profile to sound again.
+
+    Args:
+        entry (dict): An entry returned by `RouteCatalog.get`.
+        parameters (dict): Any SONIFICATION_PARAMETERS of the mapping to override, e.g. the pitch range. Each point
+            plays for the step_ms the route was imported with, unless it is overridden too.
+
+    Returns:
+        dict: The same keys as the result of process_route.
+    """
+    from elevation_MAIN import SONIFICATION_PARAMETERS, map_profile
+
+    elevations = np.frombuffer(entry['elevations'], dtype='<f4').astype(float)
+    imported_step_ms = json.loads(entry['parameters']).get('step_ms', SONIFICATION_PARAMETERS['step_ms'])
+    step_ms = (parameters or {}).get('step_ms', imported_step_ms)
+
+    return {
+        'name': entry['name'],
+        'total_distance': entry['total_distance'],
+        'resolution_in_m': entry['resolution_in_m'],
+        'step_ms': step_ms,
+        'bounding_box': np.array([entry['min_lat'], entry['min_lon'], entry['max_lat'], entry['max_lon']]),
+        'distances': np.linspace(0, entry['total_distance'], len(elevations)),
+        'elevations': elevations,
+        **map_profile(elevations, parameters),
+    }
+
+class RouteCatalog:
+    """
+    An SQLite catalog of processed routes, indexed by name and bounding box.
+
+    Args:
+        catalog_path (str): The SQLite file, which is created if needed. Defaults to `default_catalog_path()`.
+    """
+
+    def __init__(self, catalog_path=None):
+        self.catalog_path = catalog_path or default_catalog_path()
+        if self.catalog_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.catalog_path)), exist_ok=True)
+
+        self.connection = sqlite3.connect(self.catalog_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(_SCHEMA)
+
+        # Bounding boxes are indexed with an R*Tree where SQLite has one, and a plain index on the routes otherwise
+        try:
+            self.connection.execute('CREATE VIRTUAL TABLE IF NOT EXISTS route_boxes USING rtree(id, min_lat, max_lat, min_lon, max_lon)')
+            self.has_rtree = True
+        except sqlite3.OperationalError:
+            self.connection.execute('CREATE INDEX IF NOT EXISTS routes_box ON routes (min_lat, max_lat, min_lon, max_lon)')
+            self.has_rtree = False
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, entries):
+        """
+        Adds entries to the catalog in one transaction, replacing any with the same file contents and parameters.
+
+        Args:
+            entries (iterable): Entries from `catalog_entry`.
+
+        Returns:
+            int: The number of entries added.
+        """
+        columns = ', '.join(ENTRY_COLUMNS)
+        placeholders = ', '.join(f':{column}' for column in ENTRY_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in ENTRY_COLUMNS if column != 'key')
+        n_entries = 0
+
+        with self.connection:
+            for entry in entries:
+                self.connection.execute(f'INSERT INTO routes ({columns}) VALUES ({placeholders}) '
+                                        f'ON CONFLICT (key) DO UPDATE SET {updates}', entry)
+                if self.has_rtree:
+                    route_id = self.connection.execute('SELECT id FROM routes WHERE key = ?', (entry['key'],)).fetchone()[0]
+                    self.connection.execute('INSERT OR REPLACE INTO route_boxes VALUES (?, ?, ?, ?, ?)',
+                                            (route_id, entry['min_lat'], entry['max_lat'], entry['min_lon'], entry['max_lon']))
+                n_entries += 1
+
+        return n_entries
+
+    def get(self, name):
+        """
+        Returns the most recently updated entry of a route, with a single indexed read.
+
+        Args:
+            name (str): The name of the route, ignoring case.
+
+        Returns:
+            dict: The entry, with its 'id', or None if there is no route with that name.
+        """
+        row = self.connection.execute('SELECT * FROM routes WHERE name = ? COLLATE NOCASE ORDER BY updated DESC LIMIT 1',
+                                      (name,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def search(self, name=None, bounding_box=None, limit=None):
+        """
+        Lists the routes whose names match a pattern and whose bounding boxes overlap an area, without their profiles.
+
+        Args:
+            name (str): A SQL LIKE pattern the name must match, ignoring case, e.g. '%parkrun'.
+            bounding_box (tuple): (min lat, min lon, max lat, max lon) of the area.
+            limit (int): The most routes to return.
+
+        Returns:
+            list: A dict of the SUMMARY_COLUMNS and 'id' of each route, sorted by name.
+        """
+        conditions, arguments = [], []
+
+        if name is not None:
+            conditions.append('name LIKE ?')
+            arguments.append(name)
+
+        if bounding_box is not None:
+            min_lat, min_lon, max_lat, max_lon = bounding_box
+            overlap = 'max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?'
+            if self.has_rtree:
+                # The R*Tree stores 32-bit boxes which are rounded outwards, so the exact boxes are checked as well
+                conditions.append(f'id IN (SELECT id FROM route_boxes WHERE {overlap})')
+                arguments += [min_lat, max_lat, min_lon, max_lon]
+            conditions.append(overlap)
+            arguments += [min_lat, max_lat, min_lon, max_lon]
+
+        query = f"SELECT id, {', '.join(SUMMARY_COLUMNS)} FROM routes"
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY name COLLATE NOCASE, updated DESC'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+
+        return [dict(row) for row in self.connection.execute(query, arguments)]
+
+    def profiles(self):
+        """
+        Reads the elevation profile of the most recently updated entry of every route, e.g. to build a search index.
+
+        Yields:
+            tuple: The name, total distance in km, and elevations of each route, sorted by name.
+        """
+        query = ('SELECT name, total_distance, elevations FROM routes AS route WHERE updated = '
+                 '(SELECT MAX(updated) FROM routes WHERE name = route.name COLLATE NOCASE) ORDER BY name COLLATE NOCASE')
+
+        for name, total_distance, elevations in self.connection.execute(query):
+            yield name, total_distance, np.frombuffer(elevations, dtype='<f4').astype(float)
+
+    def info(self):
+        """
+        Reports the state of the catalog.
+
+        Returns:
+            dict: The catalog path, the number of entries and distinct route names, and the size of the file in bytes.
+        """
+        entries, names = self.connection.execute('SELECT COUNT(*), COUNT(DISTINCT name COLLATE NOCASE) FROM routes').fetchone()
+
+        return {
+            'catalog_path': self.catalog_path,
+            'entries': entries,
+            'names': names,
+            'total_bytes': os.path.getsize(self.catalog_path) if os.path.exists(self.catalog_path) else 0,
+        }
+
+def _import_file(kml_file_path):
+    """
+    Processes one route in a worker process and converts it to a catalog entry.
+
+    Returns:
+        dict: The file, whether it succeeded, the error message if not, the time taken in seconds, and the 'entry'.
+    """
+    from elevation_MAIN import SONIFICATION_PARAMETERS, process_route
+
+    start_time = time.perf_counter()
+    entry, error = None, None
+
+    try:
+        result = process_route(kml_file_path, cache=batch_MAIN._worker_cache,
+                               simplification=batch_MAIN._worker_simplification, parameters=batch_MAIN._worker_parameters)
+        parameters = {**SONIFICATION_PARAMETERS, **(batch_MAIN._worker_parameters or {}),
+                      'elevation_backend': batch_MAIN._worker_memo.name, 'simplification': batch_MAIN._worker_simplification}
+        entry = catalog_entry(kml_file_path, result, parameters)
+    except Exception as e:
+        error = str(e)
+    finally:
+        batch_MAIN._worker_memo.checkpoint()
+
+    return {
+        'file': kml_file_path,
+        'success': error is None,
+        'error': error,
+        'time': time.perf_counter() - start_time,
+        'entry': entry,
+    }
+
+def import_routes(kml_file_paths, catalog_path=None, workers=None, hgt_dir=None, cache_dir=None, simplification=None,
+                  memo_file=None, parameters=None):
+    """
+    Processes routes in a pool of worker processes and adds them to the catalog, which only the calling process writes to.
+
+    Args:
+        kml_file_paths (list): The KML files to import.
+        catalog_path (str): The catalog file. Defaults to `default_catalog_path()`.
+        workers, hgt_dir, cache_dir, simplification, memo_file, parameters: As for batch_MAIN.run_batch.
+
+    Returns:
+        list: One result dict per file (see `_import_file`, without the entry), in the same order as kml_file_paths.
+    """
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=batch_MAIN._init_worker,
+                             initargs=(hgt_dir, cache_dir, simplification, memo_file, parameters)) as executor:
+        futures = [executor.submit(_import_file, kml_file_path) for kml_file_path in kml_file_paths]
+
+        def entries():
+            # Each entry is added as soon as its route is processed
+            for future in as_completed(futures):
+                result = future.result()
+                results[future] = result
+                entry = result.pop('entry')
+                if entry is not None:
+                    yield entry
+
+        with RouteCatalog(catalog_path) as catalog:
+            catalog.add(entries())
+
+    return [results[future] for future in futures]
+
+def render_route(catalog, name, output_dir=None, table_format=None, parameters=None):
+    """
+    Writes the Pd inputs of a catalogued route, without parsing its file or looking up any elevations.
+
+    Args:
+        catalog (RouteCatalog): The catalog.
+        name (str): The name of the route, ignoring case.
+        output_dir (str): The directory to write to. Defaults to the pd/inputs directory.
+        table_format (str): If given, 'wav' or 'raw', to also write the Pd inputs as float32 tables.
+        parameters (dict): Any SONIFICATION_PARAMETERS of the mapping to override.
+
+    Returns:
+        dict: The result, as from elevation_MAIN.process_route.
+
+    Raises:
+        ValueError: If there is no route with that name in the catalog.
+    """
+    from elevation_MAIN import write_outputs
+
+    entry = catalog.get(name)
+    if entry is None:
+        raise ValueError(f"no route named '{name}' in the catalog")
+
+    result = result_from_entry(entry, parameters)
+    write_outputs(result, output_dir, table_format)
+    return result
+
+def main(args=None):
+    """
+    Command line interface to import, render, list and inspect routes. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description='Import processed routes into the TrailSong route catalog, and render them.')
+    parser.add_argument('--catalog', default=None, help='catalog file (default: TRAILSONG_CATALOG or ~/.cache/trailsong/catalog.sqlite)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help='process KML files and add them to the catalog')
+    import_parser.add_argument('inputs', nargs='+', help='directories or glob patterns of KML files')
+    import_parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    import_parser.add_argument('--hgt-dir', default=os.environ.get('TRAILSONG_HGT_DIR'), help='local directory of SRTM .hgt tiles')
+    import_parser.add_argument('--cache-dir', help='cache results in this directory, so unchanged routes are not reprocessed')
+    import_parser.add_argument('--simplify', choices=SIMPLIFICATION_METHODS, help='simplify dense routes with this method')
+    import_parser.add_argument('--tolerance', type=float, default=2.0, help='simplification tolerance in metres (default: 2)')
+    import_parser.add_argument('--elevation-memo', help='load and save the elevation memo in this .npz file')
+    batch_MAIN.add_route_arguments(import_parser)
+
+    render_parser = commands.add_parser('render', help='write the Pd inputs of a catalogued route')
+    render_parser.add_argument('name', help='name of the route')
+    render_parser.add_argument('-o', '--output-dir', default=None, help='directory to write to (default: pd/inputs)')
+    render_parser.add_argument('--tables', choices=TABLE_FORMATS, help='also write the Pd inputs as float32 tables in this format')
+
+    list_parser = commands.add_parser('list', help='list the catalogued routes')
+    list_parser.add_argument('--name', help="SQL LIKE pattern of the names, e.g. '%%parkrun'")
+    list_parser.add_argument('--bbox', type=float, nargs=4, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                             help='only list routes overlapping this area')
+
+    commands.add_parser('info', help='show the size of the catalog')
+    args = parser.parse_args(args)
+
+    if args.command == 'import':
+        from elevation_MAIN import route_parameters
+        try:
+            parameters = route_parameters(args.distance, args.resolution, args.duration)
+        except ValueError as e:
+            parser.error(str(e))
+
+        kml_file_paths = batch_MAIN.find_route_files(args.inputs)
+        if not kml_file_paths:
+            print(f'{error_msg} No KML files found.')
+            return 1
+
+        start_time = time.perf_counter()
+        results = import_routes(kml_file_paths, args.catalog, args.workers, args.hgt_dir, args.cache_dir,
+                                (args.simplify, args.tolerance) if args.simplify else None, args.elevation_memo, parameters)
+        batch_MAIN.print_summary(results, time.perf_counter() - start_time)
+        return 0 if all(result['success'] for result in results) else 1
+
+    with RouteCatalog(args.catalog) as catalog:
+        if args.command == 'render':
+            start_time = time.perf_counter()
+            try:
+                result = render_route(catalog, args.name, args.output_dir, args.tables)
+            except ValueError as e:
+                print(f'{error_msg} {e}')
+                return 1
+            print(f"Rendered {GREEN}{result['name']}{RESET} ({result['total_distance']:.4f} km, "
+                  f"{len(result['pitches'])} points) from the catalog in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+        elif args.command == 'list':
+            for route in catalog.search(args.name, args.bbox):
+                print(f"{route['name']:40s} {route['total_distance']:8.3f} km  {route['min_elevation']:6.1f} - "
+                      f"{route['max_elevation']:6.1f} m  ascent {route['total_ascent']:6.1f} m  {route['file_name']}")
+
+        else:
+            info = catalog.info()
+            print(f"Catalog: {info['catalog_path']}")
+            print(f"Routes: {info['names']} ({info['entries']} entries)")
+            print(f"Size: {info['total_bytes'] / 1024 / 1024:.2f} MB")
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
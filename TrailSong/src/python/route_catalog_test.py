@@ -0,0 +1,80 @@
+"""
+Module name: Route Catalog Test
+
+Description: Unit tests for the `route_catalog` module.
+
+Tests include:
+- `test_import_and_render`: Imports the example routes with synthetic offline tiles, checks that importing them again
+  replaces their entries, and that a rendered route matches processing it from its file.
+- `test_search`: Checks that routes are found by name and bounding box.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from route_catalog import RouteCatalog, import_routes, render_route
+from batch_MAIN import find_route_files
+from geo_processing import set_elevation_backend
+from hgt_processing import HGTTileStore, write_synthetic_tile
+from elevation_MAIN import process_route
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), '../example_data/elevation')
+
+class TestRouteCatalog(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.hgt_dir = os.path.join(cls.temp_dir.name, 'hgt')
+        for lat, lon in [(54, -2), (55, -2), (53, -3), (52, -5)]:
+            write_synthetic_tile(cls.hgt_dir, lat, lon)
+
+        cls.catalog_path = os.path.join(cls.temp_dir.name, 'catalog.sqlite')
+        cls.kml_file_paths = find_route_files([EXAMPLE_DIR])
+        cls.results = import_routes(cls.kml_file_paths, cls.catalog_path, workers=2, hgt_dir=cls.hgt_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
+    def test_import_and_render(self):
+        self.assertTrue(all(result['success'] for result in self.results))
+        self.assertEqual(import_routes(self.kml_file_paths[:1], self.catalog_path, workers=1, hgt_dir=self.hgt_dir)[0]['file'],
+                         self.kml_file_paths[0])
+
+        with RouteCatalog(self.catalog_path) as catalog:
+            self.assertEqual(catalog.info()['entries'], len(self.kml_file_paths))
+            rendered = render_route(catalog, 'jesmond dene PARKRUN', os.path.join(self.temp_dir.name, 'out'))
+            with self.assertRaises(ValueError):
+                render_route(catalog, 'Nowhere parkrun')
+
+        set_elevation_backend(HGTTileStore(self.hgt_dir))
+        try:
+            expected = process_route(os.path.join(EXAMPLE_DIR, 'Jesmond Dene parkrun.kml'))
+        finally:
+            set_elevation_backend(None)
+
+        self.assertEqual((rendered['name'], rendered['step_ms']), (expected['name'], expected['step_ms']))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.temp_dir.name, 'out'))),
+                         ['graph_data.txt', 'parkrun_name.txt', 'pitches.txt', 'playback.txt', 'rates.txt'])
+        for key in ('distances', 'elevations', 'rates', 'pitches', 'graph_data', 'bounding_box'):
+            np.testing.assert_allclose(rendered[key], expected[key], atol=1e-3)
+
+    def test_search(self):
+        with RouteCatalog(self.catalog_path) as catalog:
+            self.assertEqual([route['name'] for route in catalog.search()],
+                             ['Jesmond Dene parkrun', 'Llanerchaeron parkrun', 'Tawd Valley parkrun'])
+            self.assertEqual([route['name'] for route in catalog.search(bounding_box=(54.9, -1.7, 55.1, -1.5))],
+                             ['Jesmond Dene parkrun'])
+            self.assertEqual(catalog.search(name='%Valley%', bounding_box=(54.9, -1.7, 55.1, -1.5)), [])
+            self.assertEqual(len(catalog.search(name='%PARKRUN', limit=2)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
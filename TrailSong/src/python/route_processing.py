@@ -0,0 +1,111 @@
+"""
+Module name: Route Processing
+
+Description: A compact, array-backed model of a route, which is passed through the elevation pipeline.
+
+A Route holds every point in one NumPy structured array with 'lat', 'lon', 'ele' (m) and 'dist' (cumulative km)
+columns, 32 bytes per point, together with the route's name and a dict of metadata. kml_processing.read_route fills in
+the coordinates, geo_processing.fill_elevations and fill_distances fill in the other columns in place, and
+data_processing.interpolate_route resamples the profile, so no lists of points or extra copies are made along the way.
+Columns and the coordinates are views of the array, so writing to them changes the route.
+
+Classes:
+    - Route(points, name, metadata): A route's points, name and metadata.
+
+Functions:
+    - empty_points(n_points): Returns a structured array for n points, with missing elevations and distances.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+# One point of a route: its coordinates, elevation in metres and cumulative distance along the route in km
+POINT_DTYPE = np.dtype([('lat', 'f8'), ('lon', 'f8'), ('ele', 'f8'), ('dist', 'f8')])
+
+def empty_points(n_points):
+    """
+    Returns a structured array for n points, with missing (NaN) elevations and distances.
+
+    Args:
+        n_points (int): The number of points.
+
+    Returns:
+        np.ndarray: An array of POINT_DTYPE, with uninitialised coordinates.
+    """
+    points = np.empty(n_points, dtype=POINT_DTYPE)
+    points['ele'] = np.nan
+    points['dist'] = np.nan
+    return points
+
+class Route:
+    """
+    A route's points, name and metadata.
+
+    Args:
+        points (np.ndarray): A structured array of POINT_DTYPE.
+        name (str): The name of the route, if known.
+        metadata (dict): Anything else known about the route, e.g. its 'source' file.
+    """
+
+    __slots__ = ('points', 'name', 'metadata')
+
+    def __init__(self, points, name=None, metadata=None):
+        self.points = points
+        self.name = name
+        self.metadata = metadata if metadata is not None else {}
+
+    @classmethod
+    def from_coordinates(cls, coordinates, name=None, metadata=None):
+        """
+        Creates a route from an (n, 2) array of latitudes and longitudes.
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        points = empty_points(len(coordinates))
+        points['lat'] = coordinates[:, 0]
+        points['lon'] = coordinates[:, 1]
+        return cls(points, name, metadata)
+
+    @property
+    def lats(self):
+        return self.points['lat']
+
+    @property
+    def lons(self):
+        return self.points['lon']
+
+    @property
+    def elevations(self):
+        return self.points['ele']
+
+    @property
+    def distances(self):
+        return self.points['dist']
+
+    @property
+    def coordinates(self):
+        """
+        The (n, 2) latitudes and longitudes of the points, as a view of the route's array.
+        """
+        return structured_to_unstructured(self.points[['lat', 'lon']], copy=False)
+
+    @property
+    def total_distance(self):
+        """
+        The length of the route in km, or NaN if the distances have not been filled in.
+        """
+        return float(self.points['dist'][-1]) if len(self.points) else 0.0
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        """
+        Returns a route of the points selected by a slice, index array or boolean mask, with the same name and metadata.
+        """
+        return Route(np.atleast_1d(self.points[index]), self.name, dict(self.metadata))
+
+    def __repr__(self):
+        return f'Route({self.name!r}, {len(self)} points)'
@@ -0,0 +1,138 @@
+"""
+Module name: Route Test
+
+Description: Unit tests for the `route_processing` module, and the functions which produce and consume routes.
+
+Tests include:
+- `test_route`: Checks the columns, coordinate view, selection and size of a route.
+- `test_read_route`: Checks that KML and GPX files are read into the same coordinates and name as `stream_data`.
+- `test_fill_route`: Checks that filled in elevations and distances match the array functions, and the resampled profile.
+- `test_race_distances`: Processes a 10k of two laps, with fixed and adaptive resolutions and the point budget, and
+  checks that playback.txt sends Pd the step_ms the route was processed with, and times each km with it.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from route_processing import Route, POINT_DTYPE
+from kml_processing import read_route, stream_data
+from geo_processing import fill_elevations, fill_distances, calculate_distances
+from data_processing import resample_route, distance_grid
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+
+class TestRoute(unittest.TestCase):
+
+    def test_route(self):
+        route = Route.from_coordinates([[54.0, -1.5], [54.001, -1.5], [54.002, -1.501]], 'Test', {'source': 'test.kml'})
+
+        self.assertEqual(len(route), 3)
+        self.assertEqual(POINT_DTYPE.itemsize, 32)
+        np.testing.assert_array_equal(route.lats, [54.0, 54.001, 54.002])
+        self.assertTrue(np.isnan(route.elevations).all() and np.isnan(route.distances).all())
+
+        # The coordinates are a view, so writing to them changes the route
+        route.coordinates[0, 1] = -1.6
+        self.assertEqual(route.lons[0], -1.6)
+
+        selected = route[np.array([True, False, True])]
+        self.assertEqual((len(selected), selected.name, selected.metadata), (2, 'Test', {'source': 'test.kml'}))
+        np.testing.assert_array_equal(selected.lats, [54.0, 54.002])
+        self.assertEqual(len(route[1]), 1)
+
+    def test_read_route(self):
+        route = read_route(EXAMPLE_FILE)
+        coordinates, name = stream_data(EXAMPLE_FILE)
+
+        np.testing.assert_array_equal(route.coordinates, coordinates)
+        self.assertEqual(route.name, name)
+        self.assertEqual(route.metadata['source'], os.path.abspath(EXAMPLE_FILE))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gpx_file = os.path.join(temp_dir, 'route.gpx')
+            with open(gpx_file, 'w') as f:
+                f.write('<gpx><trk><name>GPX route</name><trkseg>')
+                f.writelines(f'<trkpt lat="{lat}" lon="{lon}"/>' for lat, lon in coordinates)
+                f.write('</trkseg></trk></gpx>')
+
+            # Small chunks, so the route is filled from many of them
+            gpx_route = read_route(gpx_file, chunk_size=100)
+
+        np.testing.assert_array_equal(gpx_route.coordinates, coordinates)
+        self.assertEqual(gpx_route.name, 'GPX route')
+
+    def test_fill_route(self):
+        route = read_route(EXAMPLE_FILE)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tile(temp_dir, 54, -2)
+            write_synthetic_tile(temp_dir, 55, -2)
+            backend = HGTTileStore(temp_dir)
+
+            fill_elevations(route, backend)
+            elevations = backend.get_elevations(route.lats, route.lons)
+
+        fill_distances(route)
+        _, distances = calculate_distances(route.lats, route.lons)
+
+        np.testing.assert_array_equal(route.elevations, elevations)
+        np.testing.assert_allclose(route.distances, distances)
+        self.assertEqual(route.total_distance, route.distances[-1])
+
+        grid, columns = resample_route(route, 10, ('ele', 'lat'))
+        np.testing.assert_array_equal(grid, distance_grid(route.total_distance, 10))
+        np.testing.assert_allclose(columns['ele'], np.interp(grid, distances, elevations))
+        np.testing.assert_allclose(columns['lat'], np.interp(grid, distances, route.lats))
+
+    def test_race_distances(self):
+        from elevation_MAIN import process_route, route_parameters, write_outputs
+        from data_processing import read_playback
+
+        coordinates, _ = stream_data(EXAMPLE_FILE)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tile(temp_dir, 54, -2)
+            write_synthetic_tile(temp_dir, 55, -2)
+            backend = HGTTileStore(temp_dir)
+
+            # Two laps of the 5k make a 10k
+            gpx_file = os.path.join(temp_dir, 'two_laps.gpx')
+            with open(gpx_file, 'w') as f:
+                f.write('<gpx><trk><name>Two laps</name><trkseg>')
+                f.writelines(f'<trkpt lat="{lat}" lon="{lon}"/>' for lat, lon in np.concatenate([coordinates, coordinates]))
+                f.write('</trkseg></trk></gpx>')
+
+            with self.assertRaisesRegex(ValueError, 'invalid for a 5 km race'):
+                process_route(gpx_file, backend)
+
+            ten_k = process_route(gpx_file, backend, parameters=route_parameters('10k'))
+            two_minutes = process_route(gpx_file, backend, parameters=route_parameters('any', duration=120))
+
+            with self.assertRaisesRegex(ValueError, 'more than 1000 points'):
+                process_route(gpx_file, backend, parameters={**route_parameters('10k', 5), 'max_points': 1000})
+
+            # A km is 100 points at 10 m per point, which the readers' [metro]s step through every 50 ms
+            fast = process_route(gpx_file, backend, parameters={**route_parameters('10k'), 'step_ms': 50})
+            write_outputs(fast, os.path.join(temp_dir, 'fast'))
+            playback = read_playback(os.path.join(temp_dir, 'fast'))
+
+        self.assertAlmostEqual(ten_k['total_distance'], 10, delta=1)
+        self.assertEqual((ten_k['resolution_in_m'], len(ten_k['pitches'])), (10, round(ten_k['total_distance'] * 100) + 1))
+
+        # Two minutes at 100 ms per point, over the same distance
+        self.assertEqual(len(two_minutes['pitches']), 1200)
+        self.assertAlmostEqual(two_minutes['distances'][-1], ten_k['total_distance'])
+
+        self.assertEqual(fast['step_ms'], 50)
+        self.assertEqual(playback, (len(fast['pitches']), 5000, 50))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,489 @@
+"""
+Module name: Service MAIN
+
+Description: A long-running local HTTP service, which sonifies uploaded routes and pace files.
+
+The front end is a small HTTP/1.1 server built on asyncio, which keeps connections alive between requests. The
+CPU-bound work is handed to a pool of worker processes, set up in the same way as batch_MAIN's, so each worker keeps its
+elevation tiles, elevation memo and result cache warm for every request it serves, and the pool is started and warmed up
+before the first request arrives. Responses are encoded in the workers too, so the event loop only moves bytes.
+
+Requests are rejected with 503 once more than max_queue of them are waiting for or being processed by a worker. The
+latency of each endpoint, the time requests wait for a worker, the queue depth and the workers' cache hits are reported
+by GET /stats.
+
+Endpoints:
+    POST /elevation    A KML or GPX file, returning the pipeline output of elevation_MAIN.process_route.
+    POST /pace         A pace file or log (see pace_processing.read_pace_log), returning the BPM of each split.
+    GET /stats         The service statistics, as JSON.
+    GET /health        {"status": "ok"}, once the service is ready.
+
+The output is chosen with ?format=: 'json' (the default), 'npz' (the arrays, in NumPy's binary format) or 'wav' (the
+pulse voice or drum track, rendered by audio_processing). ?seed= makes the random drum fills repeatable. ?distance=
+sets the race distance (e.g. 10k or marathon) of either endpoint, and ?resolution= and ?duration= the resolution of the
+elevation profile (see elevation_MAIN.route_parameters).
+
+Usage:
+    python service_MAIN.py --port 8765 --workers 4
+    curl --data-binary @"../example_data/elevation/Jesmond Dene parkrun.kml" "http://127.0.0.1:8765/elevation?format=wav" -o route.wav
+
+Classes:
+- SonificationService(workers, hgt_dir, cache_dir, memo_file, max_queue, max_body_bytes): The HTTP front end and its worker pool.
+
+Functions:
+- main(): Parses the command line arguments and runs the service until it is interrupted.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+import batch_MAIN
+from elevation_MAIN import route_parameters
+from pace_processing import TABLE_DISTANCE
+from live_processing import LatencyTracker
+from ANSI_formats import *
+
+# Output formats of the sonification endpoints
+OUTPUT_FORMATS = ('json', 'npz', 'wav')
+
+CONTENT_TYPES = {'json': 'application/json', 'npz': 'application/octet-stream', 'wav': 'audio/wav'}
+
+# How many requests may be waiting for or being processed by a worker before new ones are rejected
+DEFAULT_MAX_QUEUE = 64
+
+# The largest upload accepted, in bytes
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# How long an idle connection is kept open, in seconds
+KEEP_ALIVE_TIMEOUT = 15
+
+class HTTPError(Exception):
+    """
+    An error which is sent to the client as a JSON response with the given status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _upload_path(data, suffix):
+    """
+    Writes an upload to a temporary file in a worker, so it can be read like any other input file.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return path
+
+def _encode(arrays, output_format, samples=None):
+    """
+    Encodes a job's output as JSON or NPZ, or encodes its rendered samples as a WAV file.
+    """
+    if output_format == 'wav':
+        from audio_processing import write_wav
+        buffer = io.BytesIO()
+        write_wav(buffer, samples)
+        return buffer.getvalue()
+
+    if output_format == 'npz':
+        import numpy as np
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    return json.dumps({name: _to_json(value) for name, value in arrays.items()}, allow_nan=False).encode()
+
+def _to_json(value):
+    """
+    Converts an output to plain Python values, with NaNs (e.g. the elevations of SRTM voids) as None, since JSON has no NaN.
+    """
+    if hasattr(value, 'tolist'):
+        value = value.tolist()
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+def _worker_info():
+    """
+    Returns the process ID and cumulative cache statistics of the current worker.
+    """
+    info = {'pid': os.getpid()}
+
+    if batch_MAIN._worker_cache is not None:
+        info['cache_hits'] = batch_MAIN._worker_cache.hits
+        info['cache_misses'] = batch_MAIN._worker_cache.misses
+
+    if batch_MAIN._worker_memo is not None:
+        memo_info = batch_MAIN._worker_memo.info()
+        info['memo_hits'] = memo_info['hits']
+        info['memo_misses'] = memo_info['misses']
+
+    return info
+
+def _warm_up():
+    """
+    Imports the pipelines in a worker, so the first request it serves does not pay for it.
+    """
+    import elevation_MAIN, pace_processing, audio_processing
+    return os.getpid()
+
+def _elevation_job(data, output_format, options, submitted_at):
+    """
+    Runs the elevation pipeline on an uploaded KML or GPX file in a worker process.
+
+    Returns:
+        tuple: The encoded response body, the time the job waited for a worker in seconds, and the worker's info.
+    """
+    wait = time.time() - submitted_at
+    from elevation_MAIN import process_route
+
+    path = _upload_path(data, '.kml')
+    try:
+        result = process_route(path, cache=batch_MAIN._worker_cache, parameters=options['parameters'])
+    finally:
+        os.remove(path)
+        if batch_MAIN._worker_memo is not None:
+            batch_MAIN._worker_memo.checkpoint()
+
+    samples = None
+    if output_format == 'wav':
+        from audio_processing import render_pulses
+        samples = render_pulses(result['pitches'], result['rates'], step_ms=result['step_ms'])
+
+    return _encode(result, output_format, samples), wait, _worker_info()
+
+def _pace_job(data, output_format, options, submitted_at):
+    """
+    Converts an uploaded pace file or log to BPM in a worker process.
+
+    Returns:
+        tuple: The encoded response body, the time the job waited for a worker in seconds, and the worker's info.
+    """
+    wait = time.time() - submitted_at
+    import numpy as np
+    from pace_processing import read_pace_log, pace_to_bpm
+
+    path = _upload_path(data, '.txt')
+    try:
+        log = read_pace_log(path)
+    finally:
+        os.remove(path)
+
+    if not log['age'].isdigit():
+        raise ValueError(f"invalid age '{log['age']}'")
+    if len(log['paces']) < 5:
+        raise ValueError('incomplete data in file')
+
+    bpms = pace_to_bpm(log['gender'], log['ability'], log['age'], log['paces'], options['race_distance'])
+    result = {**log, 'age': int(log['age']), 'bpms': np.asarray(bpms)}
+
+    samples = None
+    if output_format == 'wav':
+        from audio_processing import render_drums
+        samples = render_drums(result['bpms'], seed=options['seed'])
+
+    return _encode(result, output_format, samples), wait, _worker_info()
+
+# The worker job of each sonification endpoint
+JOBS = {'/elevation': _elevation_job, '/pace': _pace_job}
+
+class SonificationService:
+    """
+    The HTTP front end of the service and the pool of worker processes it hands requests to.
+
+    Args:
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        hgt_dir (str): A local directory of .hgt tiles to use instead of downloading SRTM data.
+        cache_dir (str): If given, results are cached in this directory, so repeated uploads are not reprocessed.
+        memo_file (str): If given, a file the workers' elevation memos are loaded from and saved to.
+        max_queue (int): How many requests may be waiting for or being processed by a worker before new ones are
+            rejected with 503.
+        max_body_bytes (int): The largest upload accepted.
+    """
+
+    def __init__(self, workers=None, hgt_dir=None, cache_dir=None, memo_file=None, max_queue=DEFAULT_MAX_QUEUE,
+                 max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool_args = (hgt_dir, cache_dir, None, memo_file)
+        self.max_queue = max_queue
+        self.max_body_bytes = max_body_bytes
+
+        self.executor = None
+        self.server = None
+        self.start_time = None
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = Counter()
+        self.latencies = {}
+        self.queue_wait = LatencyTracker()
+        self.worker_stats = {}
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Starts and warms up the worker pool, then starts listening for connections.
+
+        Returns:
+            asyncio.Server: The server, whose sockets give the address it is listening on.
+        """
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=batch_MAIN._init_worker,
+                                            initargs=self.pool_args)
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up) for _ in range(self.workers)))
+
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        self.start_time = time.perf_counter()
+        return self.server
+
+    async def close(self):
+        """
+        Stops listening for connections and shuts down the worker pool.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    def stats(self):
+        """
+        Returns the service statistics.
+
+        Returns:
+            dict: The uptime, the number of workers, the requests 'in_flight' and 'queued' for a worker (and the most
+            ever in flight), the count of responses by status, a latency summary of each endpoint (see
+            live_processing.LatencyTracker), how long requests waited for a worker, and the workers' cache hits as of
+            each worker's last successful job.
+        """
+        caches = Counter()
+        for info in self.worker_stats.values():
+            caches.update({name: value for name, value in info.items() if name != 'pid'})
+
+        return {
+            'uptime_s': time.perf_counter() - self.start_time if self.start_time is not None else 0.0,
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'queued': max(0, self.in_flight - self.workers),
+            'max_in_flight': self.max_in_flight,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'latency': {path: tracker.summary() for path, tracker in sorted(self.latencies.items())},
+            'queue_wait': self.queue_wait.summary(),
+            'caches': dict(caches),
+        }
+
+    async def handle(self, method, target, body):
+        """
+        Handles one request.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The path and query string.
+            body (bytes): The request body.
+
+        Returns:
+            tuple: The response status, content type and body.
+        """
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == '/health' and method == 'GET':
+            return HTTPStatus.OK, CONTENT_TYPES['json'], b'{"status": "ok"}'
+
+        if url.path == '/stats' and method == 'GET':
+            return HTTPStatus.OK, CONTENT_TYPES['json'], json.dumps(self.stats()).encode()
+
+        if url.path not in JOBS:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f'no such endpoint: {url.path}')
+        if method != 'POST':
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f'{url.path} only accepts POST')
+
+        output_format = query.get('format', 'json')
+        if output_format not in OUTPUT_FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+        try:
+            seed = int(query['seed']) if 'seed' in query else None
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"invalid seed '{query['seed']}'")
+        try:
+            parameters = route_parameters(query.get('distance'), query.get('resolution'), query.get('duration'))
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+        race_distance = parameters.get('race_distance') or TABLE_DISTANCE * 1000
+        options = {'seed': seed, 'parameters': parameters, 'race_distance': race_distance / 1000}
+
+        if not body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'no file uploaded')
+
+        # Shed load rather than let the queue grow without bound
+        if self.in_flight >= self.max_queue:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, 'too many requests queued, please retry')
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            response, wait, info = await asyncio.get_running_loop().run_in_executor(
+                self.executor, JOBS[url.path], body, output_format, options, time.time())
+        except ValueError as e:
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+        finally:
+            self.in_flight -= 1
+
+        self.queue_wait.record(max(wait, 0.0))
+        self.worker_stats[info['pid']] = info
+        return HTTPStatus.OK, CONTENT_TYPES[output_format], response
+
+    async def _read_request(self, reader, writer):
+        """
+        Reads the next request on a connection.
+
+        Returns:
+            tuple: The method, target, body and whether to keep the connection open, or None if the client closed it.
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'request headers are too large')
+
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid request line')
+
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, 'uploads must have a Content-Length')
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length')
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'invalid Content-Length')
+        if length > self.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'uploads are limited to {self.max_body_bytes} bytes')
+
+        # curl waits for this before sending large uploads
+        if length and headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+
+        body = await reader.readexactly(length) if length else b''
+        return method, target, body, keep_alive
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Serves the requests on one connection until the client closes it or asks for it to be closed.
+        """
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request = await self._read_request(reader, writer)
+                except HTTPError as e:
+                    # The rest of the request can't be trusted, so the connection is closed after replying
+                    request, keep_alive = None, False
+                    await self._respond(writer, e.status, CONTENT_TYPES['json'], json.dumps({'error': str(e)}).encode(), False)
+                if request is None:
+                    break
+
+                method, target, body, keep_alive = request
+                start_time = time.perf_counter()
+
+                try:
+                    status, content_type, response = await self.handle(method, target, body)
+                except HTTPError as e:
+                    status, content_type, response = e.status, CONTENT_TYPES['json'], json.dumps({'error': str(e)}).encode()
+                except Exception as e:
+                    status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, CONTENT_TYPES['json']
+                    response = json.dumps({'error': f'{type(e).__name__}: {e}'}).encode()
+
+                await self._respond(writer, status, content_type, response, keep_alive)
+
+                path = urlsplit(target).path
+                self.statuses[int(status)] += 1
+                if path in JOBS:
+                    self.latencies.setdefault(path, LatencyTracker()).record(time.perf_counter() - start_time)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, body, keep_alive):
+        """
+        Writes a response and waits until it has been sent.
+        """
+        status = HTTPStatus(status)
+        head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head += 'Retry-After: 1\r\n'
+
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+async def _serve(service, host, port):
+    """
+    Runs the service until it is cancelled.
+    """
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f'Serving on {GREEN}http://{address[0]}:{address[1]}{RESET} with {service.workers} workers, press Ctrl+C to stop')
+
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(args=None):
+    """
+    Parses the command line arguments and runs the service until it is interrupted.
+    """
+    from result_cache import default_cache_dir
+
+    parser = argparse.ArgumentParser(description='Serve the elevation and pace sonifications over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='port to listen on (default: 8765)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--hgt-dir', default=os.environ.get('TRAILSONG_HGT_DIR'), help='local directory of SRTM .hgt tiles')
+    parser.add_argument('--cache-dir', default=default_cache_dir(), help='directory of the result cache')
+    parser.add_argument('--no-cache', action='store_true', help='do not cache results')
+    parser.add_argument('--elevation-memo', help='load and save the elevation memo in this .npz file')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f'requests waiting for a worker before new ones are rejected (default: {DEFAULT_MAX_QUEUE})')
+    args = parser.parse_args(args)
+
+    service = SonificationService(args.workers, args.hgt_dir, None if args.no_cache else args.cache_dir,
+                                  args.elevation_memo, args.max_queue)
+    try:
+        asyncio.run(_serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        print('\nStopped.')
+
+    return 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
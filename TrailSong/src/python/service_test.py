@@ -0,0 +1,175 @@
+"""
+Module name: Service Test
+
+Description: Unit tests for the `service_MAIN` module.
+
+Tests include:
+- `test_sonify`: Uploads a route and a pace file over one kept-alive connection, and checks the JSON, NPZ and WAV
+  outputs against the pipelines, the errors returned for bad requests, and the latency, queue and cache statistics.
+- `test_voids`: Checks that the NaN elevations of a route over SRTM voids are returned as JSON nulls.
+- `test_max_queue`: Checks that requests are rejected with 503 when the queue is full.
+- `test_invalid_content_length`: Checks that negative and non-numeric Content-Lengths are rejected with 400.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import asyncio
+import http.client
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import numpy as np
+from service_MAIN import SonificationService
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_ROUTE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+EXAMPLE_PACES = os.path.join(os.path.dirname(__file__), '../example_data/pace/example_1.txt')
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.hgt_dir = os.path.join(self.temp_dir.name, 'hgt')
+        write_synthetic_tile(self.hgt_dir, 54, -2)
+        write_synthetic_tile(self.hgt_dir, 55, -2)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def start(self, **kwargs):
+        # Runs the service's event loop in a background thread, so it can be called with http.client
+        self.loop = asyncio.new_event_loop()
+        self.service = SonificationService(workers=1, hgt_dir=self.hgt_dir, **kwargs)
+        server = self.loop.run_until_complete(self.service.start('127.0.0.1', 0))
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        return http.client.HTTPConnection('127.0.0.1', server.sockets[0].getsockname()[1], timeout=30)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.run_until_complete(self.service.close())
+        self.loop.close()
+
+    def request(self, connection, method, target, body=None):
+        connection.request(method, target, body)
+        response = connection.getresponse()
+        return response.status, response.getheader('Content-Type'), response.read()
+
+    def test_sonify(self):
+        from elevation_MAIN import process_route
+        from pace_processing import extract_data_from_file, pace_to_bpm
+
+        with open(EXAMPLE_ROUTE, 'rb') as f:
+            route_data = f.read()
+        with open(EXAMPLE_PACES, 'rb') as f:
+            pace_data = f.read()
+
+        connection = self.start(cache_dir=os.path.join(self.temp_dir.name, 'cache'))
+        try:
+            status, _, body = self.request(connection, 'GET', '/health')
+            self.assertEqual((status, json.loads(body)), (200, {'status': 'ok'}))
+
+            status, content_type, body = self.request(connection, 'POST', '/elevation', route_data)
+            result = json.loads(body)
+            status_npz, _, body_npz = self.request(connection, 'POST', '/elevation?format=npz', route_data)
+            status_wav, content_type_wav, body_wav = self.request(connection, 'POST', '/elevation?format=wav', route_data)
+
+            status_pace, _, body_pace = self.request(connection, 'POST', '/pace', pace_data)
+            pace_result = json.loads(body_pace)
+
+            errors = [self.request(connection, 'POST', '/elevation', b'not a route')[0],
+                      self.request(connection, 'POST', '/pace', b'30 Novice X 5:00 5:00 5:00 5:00 5:00')[0],
+                      self.request(connection, 'POST', '/elevation?format=mp3', route_data)[0],
+                      self.request(connection, 'GET', '/elevation')[0],
+                      self.request(connection, 'GET', '/missing')[0]]
+
+            stats = json.loads(self.request(connection, 'GET', '/stats')[2])
+        finally:
+            connection.close()
+            self.stop()
+
+        expected = process_route(EXAMPLE_ROUTE, HGTTileStore(self.hgt_dir))
+        self.assertEqual((status, content_type), (200, 'application/json'))
+        self.assertEqual(result['name'], expected['name'])
+        np.testing.assert_allclose(result['pitches'], expected['pitches'])
+        np.testing.assert_allclose(result['rates'], expected['rates'])
+
+        self.assertEqual(status_npz, 200)
+        with np.load(io.BytesIO(body_npz)) as arrays:
+            np.testing.assert_array_equal(arrays['elevations'], expected['elevations'])
+
+        self.assertEqual((status_wav, content_type_wav, body_wav[:4]), (200, 'audio/wav', b'RIFF'))
+
+        gender, ability, age, paces = extract_data_from_file(EXAMPLE_PACES)
+        self.assertEqual(status_pace, 200)
+        self.assertEqual((pace_result['gender'], pace_result['ability'], pace_result['age']), (gender, ability, int(age)))
+        np.testing.assert_allclose(pace_result['bpms'], pace_to_bpm(gender, ability, age, paces))
+
+        self.assertEqual(errors, [422, 422, 400, 405, 404])
+
+        # The repeated uploads of the route are served from the worker's warm cache, as of its last successful job
+        self.assertEqual(stats['latency']['/elevation']['updates'], 6)
+        self.assertEqual(stats['latency']['/pace']['updates'], 2)
+        self.assertEqual(stats['queue_wait']['updates'], 4)
+        self.assertEqual((stats['in_flight'], stats['queued'], stats['max_in_flight']), (0, 0, 1))
+        self.assertEqual((stats['caches']['cache_hits'], stats['caches']['cache_misses']), (2, 1))
+        self.assertEqual(stats['statuses'], {'200': 5, '400': 1, '404': 1, '405': 1, '422': 2})
+
+    def test_voids(self):
+        for lat, lon in [(54, -2), (55, -2)]:
+            write_synthetic_tile(self.hgt_dir, lat, lon, elevation_function=lambda lats, lons: np.full(lats.shape, -32768))
+
+        with open(EXAMPLE_ROUTE, 'rb') as f:
+            route_data = f.read()
+
+        connection = self.start()
+        try:
+            status, _, body = self.request(connection, 'POST', '/elevation', route_data)
+        finally:
+            connection.close()
+            self.stop()
+
+        # Parsing fails on the NaN, Infinity and -Infinity constants, which aren't valid JSON
+        result = json.loads(body, parse_constant=lambda constant: self.fail(f'{constant} in JSON'))
+        self.assertEqual(status, 200)
+        self.assertTrue(result['pitches'] and all(pitch is None for pitch in result['pitches']))
+        self.assertGreater(result['total_distance'], 0)
+
+    def test_max_queue(self):
+        connection = self.start(max_queue=0)
+        try:
+            connection.request('POST', '/pace', b'30 Novice M 5:00 5:00 5:00 5:00 5:00')
+            response = connection.getresponse()
+            response.read()
+        finally:
+            connection.close()
+            self.stop()
+
+        self.assertEqual((response.status, response.getheader('Retry-After')), (503, '1'))
+
+    def test_invalid_content_length(self):
+        statuses = []
+        for length in ['-5', 'five']:
+            connection = self.start()
+            try:
+                connection.putrequest('POST', '/pace')
+                connection.putheader('Content-Length', length)
+                connection.endheaders()
+                response = connection.getresponse()
+                statuses.append((response.status, json.loads(response.read())['error']))
+            finally:
+                connection.close()
+                self.stop()
+
+        self.assertEqual(statuses, [(400, 'invalid Content-Length')] * 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,320 @@
+"""
+Module name: Simplify Processing
+
+Description: Route simplification, to drop points which add little to a route before any elevation lookups or geodesics.
+
+Exported KML and GPX tracks are often far denser than the 10 m resolution the elevation pipeline interpolates to, and
+every point costs an elevation lookup and a geodesic. Three methods are available, each with a tolerance in metres:
+    - 'rdp': Ramer-Douglas-Peucker. No dropped point is further than the tolerance from the simplified line.
+    - 'visvalingam': Visvalingam-Whyatt. Points are dropped, smallest first, while the triangle each forms with its
+      neighbours has an area below the tolerance squared. Points are dropped in rounds of non-adjacent local minima, so
+      each round is a single set of array operations, which closely approximates dropping them one at a time. Once the
+      rounds stop making progress, the remaining points are dropped exactly, one at a time.
+    - 'decimate': Keeps the first point in every `tolerance` metres along the route.
+
+Points are projected onto a local flat plane in metres, which is accurate to well under 1% for routes of a few km.
+
+Usage:
+    python simplify_processing.py route.kml --method rdp --tolerance 2
+
+Functions:
+    - project_to_metres(lats, lons): Projects coordinates onto a local flat plane in metres.
+    - rdp_mask(x, y, tolerance): Returns which points Ramer-Douglas-Peucker keeps.
+    - visvalingam_mask(x, y, tolerance): Returns which points Visvalingam-Whyatt keeps.
+    - decimate_mask(x, y, tolerance): Returns which points distance-based decimation keeps.
+    - simplify_route(coordinates, method, tolerance): Simplifies a route and reports the points dropped.
+    - measure_simplification_error(coordinates, keep, elevation_backend): Measures the distance and elevation error.
+    - main(): Command line interface to report the effect of simplifying a route.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import heapq
+import numpy as np
+from geo_processing import EARTH_RADIUS
+
+SIMPLIFICATION_METHODS = ('rdp', 'visvalingam', 'decimate')
+
+def project_to_metres(lats, lons):
+    """
+    Projects coordinates onto a flat plane in metres, centred on the middle of the route.
+
+    Args:
+        lats (np.ndarray): The latitudes of the points.
+        lons (np.ndarray): The longitudes of the points.
+
+    Returns:
+        tuple: The x (east) and y (north) position of each point in metres.
+    """
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lons = np.radians(np.asarray(lons, dtype=float))
+
+    lat_centre = (lats.min() + lats.max()) / 2
+    lon_centre = (lons.min() + lons.max()) / 2
+    radius = EARTH_RADIUS * 1000
+
+    return radius * (lons - lon_centre) * np.cos(lat_centre), radius * (lats - lat_centre)
+
+def rdp_mask(x, y, tolerance):
+    """
+    Returns which points the Ramer-Douglas-Peucker algorithm keeps.
+
+    Each section of the route is replaced by a straight line if no point in between is further than the tolerance
+    from it; otherwise it is split at the furthest point. The distances of each section are computed in one go.
+
+    Args:
+        x (np.ndarray): The x positions of the points in metres.
+        y (np.ndarray): The y positions of the points in metres.
+        tolerance (float): The furthest a dropped point may be from the simplified route, in metres.
+
+    Returns:
+        np.ndarray: A boolean mask of the points kept, which always includes the first and last points.
+    """
+    n_points = len(x)
+    keep = np.zeros(n_points, dtype=bool)
+    keep[[0, -1]] = True
+
+    sections = [(0, n_points - 1)]
+    while sections:
+        start, end = sections.pop()
+        if end - start < 2:
+            continue
+
+        line_x, line_y = x[end] - x[start], y[end] - y[start]
+        point_x, point_y = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+
+        # Distance from the segment between the ends, so points beyond either end, e.g. where the route doubles back,
+        # are measured from that end. A closed loop is measured from its start.
+        squared_length = line_x ** 2 + line_y ** 2
+        if squared_length > 0:
+            t = np.clip((point_x * line_x + point_y * line_y) / squared_length, 0, 1)
+        else:
+            t = np.zeros_like(point_x)
+        distances = np.hypot(point_x - t * line_x, point_y - t * line_y)
+
+        furthest = int(np.argmax(distances))
+        if distances[furthest] > tolerance:
+            split = start + 1 + furthest
+            keep[split] = True
+            sections.append((start, split))
+            sections.append((split, end))
+
+    return keep
+
+def _triangle_areas(x, y, previous, current, following):
+    """
+    Returns the area of the triangle each point forms with its neighbours.
+    """
+    return 0.5 * np.abs((x[current] - x[previous]) * (y[following] - y[previous]) -
+                        (x[following] - x[previous]) * (y[current] - y[previous]))
+
+def _visvalingam_sequential(x, y, indices, threshold):
+    """
+    Drops points one at a time, always the one with the smallest triangle, updating its neighbours' triangles each time.
+
+    Returns:
+        np.ndarray: The indices kept.
+    """
+    x, y, indices = x.tolist(), y.tolist(), indices.tolist()
+    n = len(indices)
+    previous, following = list(range(-1, n - 1)), list(range(1, n + 1))
+    removed = [False] * n
+
+    def area(i):
+        p, c, f = indices[previous[i]], indices[i], indices[following[i]]
+        return 0.5 * abs((x[c] - x[p]) * (y[f] - y[p]) - (x[f] - x[p]) * (y[c] - y[p]))
+
+    areas = [np.inf] + [area(i) for i in range(1, n - 1)] + [np.inf]
+    heap = [(areas[i], i) for i in range(1, n - 1) if areas[i] < threshold]
+    heapq.heapify(heap)
+
+    while heap:
+        point_area, i = heapq.heappop(heap)
+
+        # Entries for removed points, or made stale by a neighbour's removal, are skipped
+        if removed[i] or point_area != areas[i]:
+            continue
+
+        removed[i] = True
+        p, f = previous[i], following[i]
+        following[p], previous[f] = f, p
+
+        for neighbour in (p, f):
+            if 0 < neighbour < n - 1:
+                areas[neighbour] = area(neighbour)
+                if areas[neighbour] < threshold:
+                    heapq.heappush(heap, (areas[neighbour], neighbour))
+
+    return np.array([index for index, is_removed in zip(indices, removed) if not is_removed], dtype=np.int64)
+
+def visvalingam_mask(x, y, tolerance):
+    """
+    Returns which points the Visvalingam-Whyatt algorithm keeps.
+
+    Points are dropped, smallest first, while the triangle each forms with its neighbours has an area below the
+    tolerance squared. Rather than dropping one point at a time, each round drops every point whose area is below the
+    threshold and smaller than its neighbours', as none of them are next to each other. This is an approximation: a
+    point dropped in the same round as a nearby smaller one is judged by its area before that one was dropped. Once a
+    round drops fewer than an eighth of the points below the threshold, e.g. along steadily tightening bends, the rest
+    are dropped exactly, one at a time.
+
+    Args:
+        x (np.ndarray): The x positions of the points in metres.
+        y (np.ndarray): The y positions of the points in metres.
+        tolerance (float): The square root of the smallest triangle area kept, in metres.
+
+    Returns:
+        np.ndarray: A boolean mask of the points kept, which always includes the first and last points.
+    """
+    threshold = tolerance ** 2
+    indices = np.arange(len(x))
+
+    while len(indices) > 2:
+        areas = _triangle_areas(x, y, indices[:-2], indices[1:-1], indices[2:])
+
+        small = areas < threshold
+        if not small.any():
+            break
+
+        # Local minima are never next to each other, so they can all be dropped at once. Ties, e.g. along a straight
+        # line, go to every other point
+        left_areas = np.concatenate(([np.inf], areas[:-1]))
+        right_areas = np.concatenate((areas[1:], [np.inf]))
+        even = np.arange(len(areas)) % 2 == 0
+        drop = (small & ((areas < left_areas) | ((areas == left_areas) & even)) &
+                ((areas < right_areas) | ((areas == right_areas) & even)))
+
+        # Rounds which drop few points would take one round per point, so those are finished off one at a time
+        if drop.sum() * 8 < small.sum():
+            indices = _visvalingam_sequential(x, y, indices, threshold)
+            break
+
+        indices = indices[np.concatenate(([True], ~drop, [True]))]
+
+    keep = np.zeros(len(x), dtype=bool)
+    keep[indices] = True
+    return keep
+
+def decimate_mask(x, y, tolerance):
+    """
+    Returns which points distance-based decimation keeps: the first point in every `tolerance` metres along the route.
+
+    Args:
+        x (np.ndarray): The x positions of the points in metres.
+        y (np.ndarray): The y positions of the points in metres.
+        tolerance (float): The spacing of the points kept, in metres.
+
+    Returns:
+        np.ndarray: A boolean mask of the points kept, which always includes the first and last points.
+    """
+    distances = np.concatenate(([0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+    bins = np.floor(distances / tolerance).astype(np.int64)
+
+    keep = np.concatenate(([True], bins[1:] != bins[:-1]))
+    keep[-1] = True
+    return keep
+
+def simplify_route(coordinates, method='rdp', tolerance=2.0):
+    """
+    Simplifies a route, dropping the points which add least to its shape.
+
+    Args:
+        coordinates (np.ndarray): The (n, 2) latitudes and longitudes of the route.
+        method (str): One of 'rdp', 'visvalingam' or 'decimate'.
+        tolerance (float): The tolerance of the method, in metres.
+
+    Returns:
+        tuple: The (m, 2) coordinates kept, and a dict reporting the 'method', 'tolerance', number of 'points', the
+        number 'kept' and 'dropped', the boolean mask of the points kept ('keep'), and the 'distance_error' (m) of the
+        simplified route's length on the local flat plane.
+
+    Raises:
+        ValueError: If the method is unknown or the tolerance is not positive.
+    """
+    if method not in SIMPLIFICATION_METHODS:
+        raise ValueError(f"unknown simplification method '{method}', expected one of {', '.join(SIMPLIFICATION_METHODS)}")
+    if tolerance <= 0:
+        raise ValueError('the simplification tolerance must be positive')
+
+    coordinates = np.asarray(coordinates, dtype=float)
+
+    if len(coordinates) < 3:
+        keep = np.ones(len(coordinates), dtype=bool)
+        distance_error = 0.0
+    else:
+        x, y = project_to_metres(coordinates[:, 0], coordinates[:, 1])
+        mask_function = {'rdp': rdp_mask, 'visvalingam': visvalingam_mask, 'decimate': decimate_mask}[method]
+        keep = mask_function(x, y, tolerance)
+        distance_error = _path_length(x[keep], y[keep]) - _path_length(x, y)
+
+    report = {
+        'method': method,
+        'tolerance': tolerance,
+        'points': len(coordinates),
+        'kept': int(keep.sum()),
+        'dropped': int(len(keep) - keep.sum()),
+        'keep': keep,
+        'distance_error': float(distance_error),
+    }
+
+    return coordinates[keep], report
+
+def _path_length(x, y):
+    return np.hypot(np.diff(x), np.diff(y)).sum()
+
+def measure_simplification_error(coordinates, keep, elevation_backend=None):
+    """
+    Measures how much a simplification changes a route's geodesic length and elevation profile.
+
+    This looks up the elevation of every original point, so it costs as much as processing the unsimplified route.
+
+    Args:
+        coordinates (np.ndarray): The (n, 2) latitudes and longitudes of the original route.
+        keep (np.ndarray): The boolean mask of the points kept, from `simplify_route`.
+        elevation_backend (object): Where elevations come from. Defaults to geo_processing's default backend.
+
+    Returns:
+        dict: The 'distance_error' (m, simplified minus original length), and the 'max_elevation_error' and
+        'mean_elevation_error' (m) of the simplified profile at each original point's distance along the route.
+    """
+    from geo_processing import calculate_distances, get_elevations
+
+    lats, lons = coordinates[:, 0], coordinates[:, 1]
+    _, distances = calculate_distances(lats, lons)
+    _, simplified_distances = calculate_distances(lats[keep], lons[keep])
+
+    # Compare the profiles at each original point's distance along the original route
+    elevations = get_elevations(lats, lons, elevation_backend)
+    simplified_profile = np.interp(distances, distances[keep], elevations[keep])
+    elevation_errors = np.abs(simplified_profile - elevations)
+
+    return {
+        'distance_error': float((simplified_distances[-1] - distances[-1]) * 1000),
+        'max_elevation_error': float(np.nanmax(elevation_errors)),
+        'mean_elevation_error': float(np.nanmean(elevation_errors)),
+    }
+
+def main(args=None):
+    """
+    Command line interface to report the effect of simplifying a route.
+    """
+    from kml_processing import stream_data
+
+    parser = argparse.ArgumentParser(description='Report how simplifying a KML route changes its length and elevation profile.')
+    parser.add_argument('kml_file', help='the route to simplify')
+    parser.add_argument('-m', '--method', choices=SIMPLIFICATION_METHODS, default='rdp')
+    parser.add_argument('-t', '--tolerance', type=float, default=2.0, help='tolerance in metres (default: 2)')
+    args = parser.parse_args(args)
+
+    coordinates, _ = stream_data(args.kml_file)
+    _, report = simplify_route(coordinates, args.method, args.tolerance)
+    errors = measure_simplification_error(coordinates, report['keep'])
+
+    print(f"Dropped {report['dropped']} of {report['points']} points ({report['dropped'] / report['points']:.1%})")
+    print(f"Distance error: {errors['distance_error']:.2f} m")
+    print(f"Elevation error: max {errors['max_elevation_error']:.2f} m, mean {errors['mean_elevation_error']:.2f} m")
+
+if __name__ == '__main__':
+    main()
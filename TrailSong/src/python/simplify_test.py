@@ -0,0 +1,155 @@
+"""
+Module name: Simplify Test
+
+Description: Unit tests for the `simplify_processing` module.
+
+Tests include:
+- `test_rdp_mask`: Checks that no dropped point is further than the tolerance from the simplified route, including
+  where it doubles back.
+- `test_visvalingam_mask`: Checks that straight sections are dropped, larger tolerances drop more points, and the points
+  kept match a one-point-at-a-time reference implementation.
+- `test_decimate_mask`: Checks the spacing of the points kept.
+- `test_simplify_route`: Checks the report of the points dropped, and that bad arguments are rejected.
+- `test_process_route`: Checks that a simplified example route keeps its length and elevation profile.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from simplify_processing import rdp_mask, visvalingam_mask, decimate_mask, simplify_route, measure_simplification_error
+from hgt_processing import HGTTileStore, write_synthetic_tile
+
+EXAMPLE_FILE = os.path.join(os.path.dirname(__file__), '../example_data/elevation/Jesmond Dene parkrun.kml')
+
+def distances_to_polyline(x, y, line_x, line_y):
+    """
+    Returns the distance from each point to the nearest segment of a polyline.
+    """
+    start_x, start_y = line_x[:-1, None], line_y[:-1, None]
+    segment_x, segment_y = np.diff(line_x)[:, None], np.diff(line_y)[:, None]
+
+    lengths = np.maximum(segment_x**2 + segment_y**2, 1e-12)
+    t = np.clip(((x - start_x) * segment_x + (y - start_y) * segment_y) / lengths, 0, 1)
+    return np.hypot(x - start_x - t * segment_x, y - start_y - t * segment_y).min(axis=0)
+
+def reference_visvalingam_mask(x, y, tolerance):
+    """
+    Visvalingam-Whyatt as first described: repeatedly drops the point with the smallest triangle while it is below the
+    tolerance squared, recalculating every triangle each time.
+    """
+    indices = list(range(len(x)))
+
+    while len(indices) > 2:
+        previous, current, following = (np.array(indices[start:len(indices) - 2 + start]) for start in range(3))
+        areas = 0.5 * np.abs((x[current] - x[previous]) * (y[following] - y[previous]) -
+                             (x[following] - x[previous]) * (y[current] - y[previous]))
+        if areas.min() >= tolerance ** 2:
+            break
+        del indices[areas.argmin() + 1]
+
+    keep = np.zeros(len(x), dtype=bool)
+    keep[indices] = True
+    return keep
+
+class TestSimplifyProcessing(unittest.TestCase):
+
+    def setUp(self):
+        # A random walk of 2000 steps of about 1 m
+        rng = np.random.default_rng(0)
+        self.x = np.cumsum(rng.normal(1, 1, 2000))
+        self.y = np.cumsum(rng.normal(0, 1, 2000))
+
+    def test_rdp_mask(self):
+        keep = rdp_mask(self.x, self.y, 2)
+
+        self.assertTrue(keep[0] and keep[-1])
+        self.assertLess(keep.sum(), len(keep) / 2)
+        self.assertLessEqual(distances_to_polyline(self.x, self.y, self.x[keep], self.y[keep]).max(), 2 + 1e-9)
+
+        # A straight line only needs its ends
+        line = np.arange(100.0)
+        self.assertEqual(rdp_mask(line, 2 * line, 0.1).sum(), 2)
+
+        # A route which doubles back keeps its turning point
+        out_and_back = np.concatenate([np.arange(0, 2001, 10.0), np.arange(1990, 999, -10.0)])
+        keep = rdp_mask(out_and_back, np.zeros_like(out_and_back), 2)
+        np.testing.assert_array_equal(out_and_back[keep], [0, 2000, 1000])
+
+    def test_visvalingam_mask(self):
+        line = np.arange(100.0)
+        self.assertEqual(visvalingam_mask(line, 2 * line, 0.1).sum(), 2)
+
+        kept = [visvalingam_mask(self.x, self.y, tolerance).sum() for tolerance in [0.5, 2, 8]]
+        self.assertTrue(kept[0] > kept[1] > kept[2] >= 2)
+
+        # The points kept still follow the route
+        keep = visvalingam_mask(self.x, self.y, 2)
+        self.assertLess(np.median(distances_to_polyline(self.x, self.y, self.x[keep], self.y[keep])), 2)
+
+        # Dropping several points a round closely matches dropping them one at a time
+        x, y = self.x[:400], self.y[:400]
+        for tolerance in [0.5, 2, 8]:
+            keep, expected = visvalingam_mask(x, y, tolerance), reference_visvalingam_mask(x, y, tolerance)
+            self.assertLessEqual(abs(keep.sum() - expected.sum()), max(3, 0.05 * expected.sum()))
+            self.assertGreater(np.mean(keep == expected), 0.95)
+
+        # A steadily tightening spiral is simplified one point at a time, exactly as the reference does
+        angles = np.linspace(0, 6 * np.pi, 400) ** 1.5
+        spiral_x, spiral_y = angles * np.cos(angles), angles * np.sin(angles)
+        np.testing.assert_array_equal(visvalingam_mask(spiral_x, spiral_y, 1), reference_visvalingam_mask(spiral_x, spiral_y, 1))
+
+    def test_decimate_mask(self):
+        line = np.arange(0, 100, 0.5)
+        keep = decimate_mask(line, np.zeros_like(line), 10)
+
+        np.testing.assert_array_equal(line[keep], [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 99.5])
+
+    def test_simplify_route(self):
+        coordinates = np.column_stack([54 + np.arange(50) * 1e-5, np.full(50, -1.6)])
+        simplified, report = simplify_route(coordinates, 'rdp', 1)
+
+        np.testing.assert_array_equal(simplified, coordinates[[0, -1]])
+        self.assertEqual((report['points'], report['kept'], report['dropped']), (50, 2, 48))
+        self.assertAlmostEqual(report['distance_error'], 0, places=6)
+
+        with self.assertRaises(ValueError):
+            simplify_route(coordinates, 'smooth', 1)
+        with self.assertRaises(ValueError):
+            simplify_route(coordinates, 'rdp', 0)
+
+    def test_process_route(self):
+        from elevation_MAIN import process_route
+        from kml_processing import stream_data
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            write_synthetic_tile(temp_dir, 54, -2)
+            write_synthetic_tile(temp_dir, 55, -2)
+            backend = HGTTileStore(temp_dir)
+
+            result = process_route(EXAMPLE_FILE, backend)
+            simplified_result = process_route(EXAMPLE_FILE, backend, simplification=('rdp', 3))
+
+            coordinates, _ = stream_data(EXAMPLE_FILE)
+            _, report = simplify_route(coordinates, 'rdp', 3)
+            errors = measure_simplification_error(coordinates, report['keep'], backend)
+
+        self.assertNotIn('points_dropped', result)
+        self.assertEqual(simplified_result['points_dropped'], report['dropped'])
+        self.assertGreater(report['dropped'], len(coordinates) / 4)
+
+        # Cutting corners by up to 3 m shortens the route a little, and barely changes its profile
+        self.assertLess(abs(errors['distance_error']), 0.01 * result['total_distance'] * 1000)
+        self.assertLess(errors['max_elevation_error'], 5)
+        # The simplified route is a little shorter, so its profile has a few less points
+        simplified_profile = np.interp(result['distances'], simplified_result['distances'], simplified_result['elevations'])
+        self.assertLess(np.abs(simplified_profile - result['elevations']).max(), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Module name: Startup Test
+
+Description: Checks that the MAIN scripts start without importing their heavy dependencies.
+
+Tests include:
+- `test_lazy_imports`: Imports both MAIN scripts in a fresh interpreter, and checks that matplotlib, scipy, tkinter,
+  SRTM.py and geopy have not been loaded.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+# Modules which should only be imported when they are actually used
+HEAVY_MODULES = ['matplotlib', 'scipy', 'tkinter', 'srtm', 'geopy']
+
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_imports(self):
+        code = ('import sys, elevation_MAIN, pace_MAIN, batch_MAIN\n'
+                f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+
+        completed = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   capture_output=True, text=True, check=True)
+
+        self.assertEqual(completed.stdout.strip(), '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,388 @@
+"""
+Module name: Watch MAIN
+
+Description: Watch-folder daemon, which keeps the sonified outputs of a folder of routes up to date.
+
+The input directory is polled for KML and GPX files. Polling only stats the files, so a library of thousands of routes
+costs a directory listing per poll. A file whose size or modification time has changed is only picked up once it has
+stayed the same for the settle time, so a burst of writes while an editor saves it is processed once. Its contents are
+then hashed, and files whose hash has not changed (e.g. when they are touched or copied over with the same contents)
+are skipped. Routes which fail are retried when they change, or when the daemon is restarted.
+
+Changed files are scheduled onto a bounded pool of worker processes, set up in the same way as batch_MAIN's, so elevation
+tiles, the elevation memo and the result cache stay warm between routes. Each route's outputs are written to a staging
+directory, then swapped into place, so other programs never see a mix of old and new outputs, though the directory is
+missing for a moment during the swap. If a worker process crashes, the pool is restarted and its routes are retried. Outputs are named after
+the whole file name, e.g. 'route.kml', so routes with the same name and different extensions are kept apart. The hash
+of every processed file is kept in a state file in the output directory, so restarting the daemon does not reprocess the whole library.
+
+Usage:
+    python watch_MAIN.py ../shared_routes --output-dir ../library --workers 4
+    python watch_MAIN.py ../shared_routes --output-dir ../library --once
+
+Classes:
+- RouteWatcher(input_dir, output_dir, settle, state_file): Finds the route files which have changed since they were last processed.
+
+Functions:
+- watch(input_dir, output_dir, workers, hgt_dir, cache_dir, render_audio, simplification, memo_file, table_format, parameters, interval, settle, once): Runs the daemon.
+- main(): Parses the command line arguments and runs the daemon.
+
+Author: George Caselton
+Last updated: 17/10/2026
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+import batch_MAIN
+from simplify_processing import SIMPLIFICATION_METHODS
+from data_processing import TABLE_FORMATS, write_atomically
+from result_cache import hash_file
+from ANSI_formats import *
+
+# Files which are treated as routes
+ROUTE_EXTENSIONS = ('.kml', '.gpx')
+
+# How often the input directory is polled, and how long a changed file must stay the same before it is processed, in seconds
+DEFAULT_INTERVAL = 2.0
+DEFAULT_SETTLE = 1.0
+
+# How many times a route is processed in a pool which breaks, e.g. because a worker was killed, before it is failed
+MAX_WORKER_CRASHES = 2
+
+# Name of the state file, which is kept in the output directory
+STATE_FILE_NAME = '.watch_state.json'
+
+def _replace_directory(new_dir, target_dir):
+    """
+    Moves a fully written directory into place, replacing the one already there with two renames. A directory can't
+    be renamed over one which is not empty, so for the moment between the renames there is no directory there at all,
+    though there is never a mix of old and new files. A symlink could be swapped in one rename, but needs extra
+    privileges on Windows.
+    """
+    if not os.path.exists(target_dir):
+        os.rename(new_dir, target_dir)
+        return
+
+    old_dir = tempfile.mkdtemp(dir=os.path.dirname(target_dir), prefix='.old-')
+    os.rename(target_dir, os.path.join(old_dir, 'route'))
+    os.rename(new_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def _process_changed_file(route_file_path, output_dir, render_audio=False, table_format=None):
+    """
+    Processes one route in a worker process, writing its outputs to a staging directory and swapping it into place.
+    The outputs are named after the whole file name, so 'route.kml' and 'route.gpx' do not overwrite each other.
+
+    Returns:
+        dict: The result of batch_MAIN._process_file.
+    """
+    staging_dir = tempfile.mkdtemp(dir=output_dir, prefix='.staging-')
+    try:
+        route_name = os.path.basename(route_file_path)
+        result = batch_MAIN._process_file(route_file_path, staging_dir, render_audio, table_format, route_name)
+        if result['success']:
+            _replace_directory(os.path.join(staging_dir, route_name), os.path.join(output_dir, route_name))
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    return result
+
+class RouteWatcher:
+    """
+    Finds the route files in a directory which have changed since they were last processed.
+
+    Args:
+        input_dir (str): The directory of route files.
+        output_dir (str): The directory the outputs are written to.
+        settle (float): How long a changed file must keep the same size and modification time before it is processed,
+            in seconds.
+        state_file (str): Where the hash of every processed file is kept. Defaults to a file in the output directory.
+    """
+
+    def __init__(self, input_dir, output_dir, settle=DEFAULT_SETTLE, state_file=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.settle = settle
+        self.state_file = state_file or os.path.join(output_dir, STATE_FILE_NAME)
+
+        # The size, modification time and hash of each successfully processed file, by file name
+        self.state = {}
+        self.dirty = False
+
+        # The size and modification time of each file which failed, so it is not retried until it changes. These are
+        # not saved, so failures are retried when the daemon is restarted.
+        self.failed = {}
+
+        # The size and modification time of each changed file, and when they were first seen, by file name
+        self.pending = {}
+
+        # Files being processed, which are not looked at again until they are finished
+        self.in_progress = set()
+
+        self.load()
+
+    def load(self):
+        """
+        Loads the state file, if there is one.
+        """
+        try:
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def save(self):
+        """
+        Writes the state file atomically, if anything has changed since it was last saved.
+        """
+        if not self.dirty:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        write_atomically(self.state_file, json.dumps(self.state).encode())
+        self.dirty = False
+
+    def scan(self):
+        """
+        Returns the (size, modification time in ns) of every route file in the input directory, by file name.
+        """
+        files = {}
+
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(ROUTE_EXTENSIONS) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+        return files
+
+    def poll(self, now=None):
+        """
+        Scans the input directory once.
+
+        Args:
+            now (float): The current time.monotonic(), which can be given to test the settle time.
+
+        Returns:
+            list: (file name, (size, modification time), hash) of every file which has settled with new contents.
+        """
+        now = time.monotonic() if now is None else now
+        files = self.scan()
+        changed = []
+
+        # Forget deleted files, leaving their outputs in place
+        for name in set(self.state) - set(files):
+            del self.state[name]
+            self.dirty = True
+        for name in set(self.pending) - set(files):
+            del self.pending[name]
+        for name in set(self.failed) - set(files):
+            del self.failed[name]
+
+        for name, stat in files.items():
+            known = self.state.get(name)
+            up_to_date = known is not None and (known['size'], known['mtime_ns']) == stat
+            if name in self.in_progress or up_to_date or self.failed.get(name) == stat:
+                continue
+
+            # Each new write restarts the settle time
+            if self.pending.get(name, (None,))[0] != stat:
+                self.pending[name] = (stat, now)
+            if now - self.pending[name][1] < self.settle:
+                continue
+            del self.pending[name]
+
+            try:
+                digest = hash_file(os.path.join(self.input_dir, name)).hexdigest()
+            except OSError:
+                continue
+
+            # Touched or rewritten with the same contents, so only the stat is updated
+            if known is not None and known['sha256'] == digest:
+                self.state[name] = {**known, 'size': stat[0], 'mtime_ns': stat[1]}
+                self.dirty = True
+                continue
+
+            changed.append((name, stat, digest))
+
+        return changed
+
+    def start(self, name):
+        """
+        Marks a file as queued or being processed.
+        """
+        self.in_progress.add(name)
+
+    def finish(self, name, stat, digest, success):
+        """
+        Records the stat and hash of a processed file, so it is skipped until its contents change. A file which failed
+        is only skipped until it is written to again, or the daemon is restarted.
+        """
+        self.in_progress.discard(name)
+
+        if not success:
+            self.failed[name] = stat
+            return
+
+        self.failed.pop(name, None)
+        self.state[name] = {'size': stat[0], 'mtime_ns': stat[1], 'sha256': digest}
+        self.dirty = True
+
+def _print_result(result):
+    """
+    Prints one line for a processed route, in the format of batch_MAIN.print_summary.
+    """
+    status = f'{GREEN}OK{RESET}  ' if result['success'] else f'{BOLD_RED}FAIL{RESET}'
+    details = f" - {result['error']}" if result['error'] else ''
+    print(f"{status} {result['time']:8.3f} s  {os.path.basename(result['file'])}{details}")
+
+def watch(input_dir, output_dir, workers=None, hgt_dir=None, cache_dir=None, render_audio=False, simplification=None,
+          memo_file=None, table_format=None, parameters=None, interval=DEFAULT_INTERVAL, settle=DEFAULT_SETTLE, once=False):
+    """
+    Keeps the outputs of a directory of routes up to date, until interrupted.
+
+    Args:
+        input_dir (str): The directory of KML and GPX files to watch.
+        output_dir (str): The directory in which each route gets its own output directory.
+        workers (int): The number of worker processes. Defaults to the number of CPUs.
+        hgt_dir, cache_dir, render_audio, simplification, memo_file, table_format, parameters: As for batch_MAIN.run_batch.
+        interval (float): How often the input directory is polled, in seconds.
+        settle (float): How long a changed file must stay the same before it is processed, in seconds.
+        once (bool): Whether to process the files which have changed since the last run and return, without waiting
+            for them to settle.
+
+    Returns:
+        list: The result of every route processed (see batch_MAIN._process_file).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watcher = RouteWatcher(input_dir, output_dir, 0 if once else settle)
+    workers = workers or os.cpu_count() or 1
+    results = []
+
+    # Changed files wait here, so at most two per worker are queued in the pool at once
+    queue = {}
+    futures = {}
+
+    # How many pools each file has been in when a worker crashed
+    crashes = {}
+
+    def start_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=batch_MAIN._init_worker,
+                                   initargs=(hgt_dir, cache_dir, simplification, memo_file, parameters))
+
+    def finish(name, stat, digest, result):
+        watcher.finish(name, stat, digest, result['success'])
+        results.append(result)
+        _print_result(result)
+
+    executor = start_pool()
+    try:
+        while True:
+            for name, stat, digest in watcher.poll():
+                watcher.start(name)
+                queue[name] = (stat, digest)
+
+            while queue and len(futures) < 2 * workers:
+                name, (stat, digest) = next(iter(queue.items()))
+                del queue[name]
+                future = executor.submit(_process_changed_file, os.path.join(input_dir, name), output_dir,
+                                         render_audio, table_format)
+                futures[future] = (name, stat, digest)
+
+            if once and not futures:
+                break
+
+            # Wait for routes to finish until the next poll is due
+            if not futures:
+                watcher.save()
+                time.sleep(interval)
+                continue
+
+            done, _ = wait(futures, timeout=None if once else interval, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                name, stat, digest = futures.pop(future)
+                try:
+                    finish(name, stat, digest, future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    futures[future] = (name, stat, digest)
+                except Exception as e:
+                    finish(name, stat, digest, {'file': os.path.join(input_dir, name), 'success': False,
+                                                'error': str(e), 'time': 0.0})
+
+            # A worker died, e.g. killed for running out of memory, which breaks the whole pool. Its routes are
+            # retried in a new pool, unless they have been in too many pools which broke.
+            if broken:
+                executor.shutdown(wait=False, cancel_futures=True)
+                for name, stat, digest in futures.values():
+                    crashes[name] = crashes.get(name, 0) + 1
+                    if crashes[name] < MAX_WORKER_CRASHES:
+                        queue[name] = (stat, digest)
+                    else:
+                        finish(name, stat, digest, {'file': os.path.join(input_dir, name), 'success': False,
+                                                    'error': 'a worker process crashed', 'time': 0.0})
+                futures.clear()
+                executor = start_pool()
+
+            watcher.save()
+    finally:
+        watcher.save()
+        executor.shutdown(cancel_futures=True)
+
+    return results
+
+def main(args=None):
+    """
+    Parses the command line arguments and runs the daemon. Returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(description='Keep the sonified outputs of a folder of KML and GPX routes up to date.')
+    parser.add_argument('input_dir', help='directory of KML and GPX files to watch')
+    parser.add_argument('-o', '--output-dir', required=True, help='directory in which each route gets its own output directory')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--hgt-dir', default=os.environ.get('TRAILSONG_HGT_DIR'), help='local directory of SRTM .hgt tiles')
+    parser.add_argument('--cache-dir', help='cache results in this directory, so reverted routes are not reprocessed')
+    parser.add_argument('--audio', action='store_true', help="also render each route's pulse voice to elevation.wav")
+    parser.add_argument('--tables', choices=TABLE_FORMATS, help='also write the Pd inputs as float32 tables in this format')
+    parser.add_argument('--simplify', choices=SIMPLIFICATION_METHODS, help='simplify dense routes with this method')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='simplification tolerance in metres (default: 2)')
+    parser.add_argument('--elevation-memo', help='load and save the elevation memo in this .npz file')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'seconds between polls of the input directory (default: {DEFAULT_INTERVAL:g})')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help=f'seconds a changed file must stay the same before it is processed (default: {DEFAULT_SETTLE:g})')
+    parser.add_argument('--once', action='store_true', help='process the files changed since the last run, then exit')
+    batch_MAIN.add_route_arguments(parser)
+    args = parser.parse_args(args)
+
+    from elevation_MAIN import route_parameters
+    try:
+        parameters = route_parameters(args.distance, args.resolution, args.duration)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if not os.path.isdir(args.input_dir):
+        print(f'{error_msg} {args.input_dir} is not a directory.')
+        return 1
+
+    if not args.once:
+        print(f'Watching {GREEN}{args.input_dir}{RESET} for changed routes, press Ctrl+C to stop')
+
+    try:
+        results = watch(args.input_dir, args.output_dir, args.workers, args.hgt_dir, args.cache_dir, args.audio,
+                        (args.simplify, args.tolerance) if args.simplify else None, args.elevation_memo, args.tables,
+                        parameters, args.interval, args.settle, args.once)
+    except KeyboardInterrupt:
+        print('\nStopped.')
+        return 0
+
+    return 0 if all(result['success'] for result in results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
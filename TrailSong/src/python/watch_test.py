@@ -0,0 +1,143 @@
+"""
+Module name: Watch Test
+
+Description: Unit tests for the `watch_MAIN` module.
+
+Tests include:
+- `test_poll`: Checks that changed files are only picked up once they have settled, that files touched or
+  rewritten with the same contents are skipped, and that failed files are retried once they change or on a restart.
+- `test_watch`: Processes a folder of routes with synthetic offline tiles, and checks that only the changed route is
+  reprocessed by a later run, with its outputs swapped into place, and that routes with the same name are kept apart.
+- `test_watch_worker_crash`: Checks that the routes in a pool whose worker crashes are processed in a new pool.
+
+Author: George Caselton
+Last updated: 17/10/2026
+
+Test status as of 17/10/2026: PASS
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import watch_MAIN
+from watch_MAIN import RouteWatcher, watch
+from hgt_processing import write_synthetic_tile
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), '../example_data/elevation')
+
+# Set by the test, and seen by the worker processes it starts
+_crash_marker = None
+_process_changed_file = watch_MAIN._process_changed_file
+
+def _crash_once(*args):
+    """
+    Kills the worker process the first time it is called, as if it ran out of memory.
+    """
+    if not os.path.exists(_crash_marker):
+        open(_crash_marker, 'w').close()
+        os._exit(1)
+    return _process_changed_file(*args)
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.temp_dir.name, 'routes')
+        self.output_dir = os.path.join(self.temp_dir.name, 'library')
+        shutil.copytree(EXAMPLE_DIR, self.input_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_poll(self):
+        watcher = RouteWatcher(self.input_dir, self.output_dir, settle=1.0)
+        route_path = os.path.join(self.input_dir, 'Jesmond Dene parkrun.kml')
+
+        # New files wait for the settle time
+        self.assertEqual(watcher.poll(now=0.0), [])
+        changed = watcher.poll(now=1.0)
+        self.assertEqual(len(changed), 3)
+
+        for name, stat, digest in changed:
+            watcher.start(name)
+            watcher.finish(name, stat, digest, True)
+        self.assertEqual(watcher.poll(now=2.0), [])
+
+        # Each write restarts the settle time
+        with open(route_path, 'a') as f:
+            f.write('\n')
+        self.assertEqual(watcher.poll(now=3.0), [])
+        os.utime(route_path, ns=(0, 10**18))
+        self.assertEqual(watcher.poll(now=3.5), [])
+        self.assertEqual(watcher.poll(now=4.0), [])
+        changed = watcher.poll(now=4.5)
+        self.assertEqual([name for name, _, _ in changed], ['Jesmond Dene parkrun.kml'])
+        watcher.start(changed[0][0])
+
+        # Touching a file without changing its contents only updates its stat
+        touched_path = os.path.join(self.input_dir, 'Tawd Valley parkrun.kml')
+        os.utime(touched_path, ns=(0, 10**18))
+        self.assertEqual(watcher.poll(now=5.0) + watcher.poll(now=6.0), [])
+        self.assertEqual(watcher.state['Tawd Valley parkrun.kml']['mtime_ns'], 10**18)
+
+        # A failed file is retried once it is written to again, and is not saved as up to date
+        watcher.finish(*changed[0], False)
+        self.assertEqual(watcher.poll(now=7.0), [])
+        os.utime(route_path, ns=(0, 2 * 10**18))
+        self.assertEqual(watcher.poll(now=8.0), [])
+        self.assertEqual([name for name, _, _ in watcher.poll(now=9.0)], ['Jesmond Dene parkrun.kml'])
+        self.assertNotEqual(watcher.state['Jesmond Dene parkrun.kml']['sha256'], changed[0][2])
+
+        # The state is kept between runs, so a restart retries the failed file
+        watcher.save()
+        restarted = RouteWatcher(self.input_dir, self.output_dir, settle=0)
+        self.assertEqual(restarted.state, watcher.state)
+        self.assertEqual([name for name, _, _ in restarted.poll()], ['Jesmond Dene parkrun.kml'])
+
+    def test_watch(self):
+        hgt_dir = os.path.join(self.temp_dir.name, 'hgt')
+        for lat, lon in [(54, -2), (55, -2), (53, -3), (52, -5)]:
+            write_synthetic_tile(hgt_dir, lat, lon)
+
+        # A GPX route with the same name as a KML route gets its own outputs
+        shutil.copy(os.path.join(self.input_dir, 'Jesmond Dene parkrun.kml'), os.path.join(self.input_dir, 'Tawd Valley parkrun.gpx'))
+        results = watch(self.input_dir, self.output_dir, workers=2, hgt_dir=hgt_dir, render_audio=True, once=True)
+        self.assertEqual(sorted(os.path.basename(result['file']) for result in results), sorted(os.listdir(self.input_dir)))
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(sorted(name for name in os.listdir(self.output_dir) if not name.startswith('.')),
+                         sorted(os.listdir(self.input_dir)))
+
+        # Nothing has changed
+        self.assertEqual(watch(self.input_dir, self.output_dir, workers=2, hgt_dir=hgt_dir, once=True), [])
+
+        # A rewritten route is swapped in whole, without the audio of the first run
+        route_path = os.path.join(self.input_dir, 'Jesmond Dene parkrun.kml')
+        with open(route_path, 'a') as f:
+            f.write('\n')
+        results = watch(self.input_dir, self.output_dir, workers=2, hgt_dir=hgt_dir, once=True)
+
+        self.assertEqual([result['file'] for result in results], [route_path])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output_dir, 'Jesmond Dene parkrun.kml'))),
+                         ['graph_data.txt', 'parkrun_name.txt', 'pitches.txt', 'playback.txt', 'rates.txt'])
+        self.assertEqual(sorted(name for name in os.listdir(self.output_dir) if name.startswith('.')), ['.watch_state.json'])
+
+    def test_watch_worker_crash(self):
+        global _crash_marker
+        _crash_marker = os.path.join(self.temp_dir.name, 'crashed')
+
+        hgt_dir = os.path.join(self.temp_dir.name, 'hgt')
+        for lat, lon in [(54, -2), (55, -2), (53, -3), (52, -5)]:
+            write_synthetic_tile(hgt_dir, lat, lon)
+
+        with mock.patch('watch_MAIN._process_changed_file', _crash_once):
+            results = watch(self.input_dir, self.output_dir, workers=2, hgt_dir=hgt_dir, once=True)
+
+        self.assertTrue(os.path.exists(_crash_marker))
+        self.assertEqual(sorted(os.path.basename(result['file']) for result in results), sorted(os.listdir(self.input_dir)))
+        self.assertTrue(all(result['success'] for result in results))
+
+if __name__ == '__main__':
+    unittest.main()